@@ -23,6 +23,8 @@ import bpy
 from bpy.types import PropertyGroup, Panel
 from bpy.props import BoolProperty, FloatProperty, IntProperty, PointerProperty
 from . import constants
+from . import freeze_guides
+from . import object_registry
 
 
 class FFFGenGeneralPanel(Panel):
@@ -70,7 +72,21 @@ class FFFGenGeneralPanel(Panel):
                 if bpy.context.window.workspace.name == constants.WORKSPACE_POSITIONING and not len(bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE].objects):
                     box = layout.box()
                     box.label(text="Update settings")
-                    box.prop(properties, "update_rate")
+                    box.prop(properties, "quality_profile")
+                    row = box.row()
+                    row.enabled = properties.quality_profile == "INTERACTIVE"
+                    row.prop(properties, "proxy_face_count")
+                    box.prop(properties, "segment_cut_method")
+                    row = box.row()
+                    row.enabled = properties.segment_cut_method == "HALF_SPACE"
+                    row.prop(properties, "update_in_background")
+                    box.prop(properties, "update_rate_auto")
+                    if properties.update_rate_auto:
+                        box.prop(properties, "update_cpu_budget")
+                        box.label(text="Update delay: " + str(round(properties.update_rate_current * 1000)) + " ms")
+                    else:
+                        box.prop(properties, "update_rate")
+                    box.label(text="Update time: " + str(round(properties.update_cost * 1000)) + " ms")
                     label = "Auto update is ON" if properties.auto_update_toggle else "Auto update is OFF"
                     box.prop(properties, "auto_update_toggle", text=label, toggle=True)
                     box.operator("fff_gen.update", text="update bone fragments")
@@ -90,6 +106,7 @@ class FFFGenGuidesPanel(Panel):
     def draw(self, context):
         layout = self.layout
         properties = context.scene.FFFGenPropertyGroup
+        is_frozen = len(freeze_guides.get_frozen_guides()) > 0
 
         if properties.is_initialized and bpy.context.window.workspace.name == constants.WORKSPACE_POSITIONING:
             if not len(bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE].objects) and len(bpy.data.collections[constants.COLLECTION_FFF_GEN_FIBULA].objects):
@@ -111,6 +128,8 @@ class FFFGenGuidesPanel(Panel):
             if not len(bpy.data.collections[constants.COLLECTION_GUIDE_FIBULA].objects):
                 if len(bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_FIBULA].objects):
                     box.operator("fff_gen.create_fibula_guide", text="Generate Fibula guide")
+            elif is_frozen:
+                box.label(text="Thaw guides to edit them")
             else:
                 box.operator("fff_gen.create_fibula_screw", text="Create Fibula guide screw")
 
@@ -121,23 +140,34 @@ class FFFGenGuidesPanel(Panel):
             if not len(bpy.data.collections[constants.COLLECTION_GUIDE_MANDIBLE].objects):
                 if len(bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE].objects):
                     box.operator("fff_gen.create_mandible_guides", text="Create Mandible Guides")
+            elif is_frozen:
+                box.label(text="Thaw guides to edit them")
             else:
                 box.operator("fff_gen.create_mandible_start_screw", text="Create Mandible Start Screw")
                 box.operator("fff_gen.create_mandible_end_screw", text="Create Mandible End Screw")
                 if properties.positioning_aid_toggle == "GUIDE":
-                    if not "joined_mandible_guide" in bpy.data.objects.keys():
+                    if object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_JOINED) is None:
                         box.operator("fff_gen.join_mandible_guides", text="Join mandible guides")
                 else:
                     # try to find the positioning aid object
                     # if found - it is initialized
                     # otherwise - it is not initialized and show the button to do so.
-                    if not "positioning_aid_mesh" in bpy.data.objects.keys():
+                    if object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH) is None:
                         box.operator("fff_gen.create_mandible_positioning_aid", text="Create positioning aid")
                     else:
                         # Property to adjust scale/thickness
                         box.prop(properties, "positioning_aid_size_x")
                         box.prop(properties, "positioning_aid_size_z")
 
+        if properties.is_initialized and (bpy.context.window.workspace.name == constants.WORKSPACE_MANDIBLE_GUIDES or bpy.context.window.workspace.name == constants.WORKSPACE_FIBULA_GUIDES):
+            if len(freeze_guides.get_guides()):
+                box = layout.box()
+                box.label(text="Freeze:")
+                if is_frozen:
+                    box.operator("fff_gen.thaw_guides", text="Thaw guides")
+                else:
+                    box.operator("fff_gen.freeze_guides", text="Freeze guides")
+
 
 class FFFGenDangerPanel(Panel):
     bl_idname = "FFF_GEN_PT_danger"
@@ -161,7 +191,7 @@ class FFFGenDangerPanel(Panel):
                 if len(bpy.data.collections[constants.COLLECTION_GUIDE_MANDIBLE].objects):
                     col.operator("fff_gen.clear_mandible_guides", text="Clear Mandible Guides")
             else:
-                if "positioning_aid_mesh" in bpy.data.objects.keys():
+                if object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH) is not None:
                     col.operator("fff_gen.clear_mandible_positioning_aid", text="Clear positioning aid")
         
         if properties.is_initialized and (bpy.context.window.workspace.name == constants.WORKSPACE_POSITIONING):
@@ -183,10 +213,10 @@ class FFFGenColorPanel(Panel):
         layout = self.layout
         obj = bpy.context.active_object
         if obj is not None:
-            if hasattr(obj.data, "materials"):
-                if len(obj.data.materials):
-                    row = layout.row()
-                    row.prop(obj.data.materials[0], "diffuse_color")
+            # material slots also cover materials linked to the object, eg. fibula segments sharing one mesh
+            if len(obj.material_slots) and obj.material_slots[0].material is not None:
+                row = layout.row()
+                row.prop(obj.material_slots[0].material, "diffuse_color")
 
 
 class FFFGenExportPanel(Panel):
@@ -203,15 +233,15 @@ class FFFGenExportPanel(Panel):
         
         if properties.is_initialized:
             sub = layout.row() # fibula guide checkbox
-            sub.enabled = ("fibula_guide" in bpy.data.objects.keys())
+            sub.enabled = (object_registry.get_object(constants.ROLE_FIBULA_GUIDE) is not None)
             sub.prop(properties, "export_toggle_fibula_guide")
             
             sub = layout.row() # mandible guide checkbox
-            sub.enabled = ("joined_mandible_guide" in bpy.data.objects.keys())
+            sub.enabled = (object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_JOINED) is not None)
             sub.prop(properties, "export_toggle_mandible_guide")
             
             sub = layout.row() # mandible positioning aid checkbox
-            sub.enabled = ("positioning_aid_mesh" in bpy.data.objects.keys())
+            sub.enabled = (object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH) is not None)
             sub.prop(properties, "export_toggle_mandible_aid")
 
             sub = layout.row() # mandible positioning aid checkbox
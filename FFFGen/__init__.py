@@ -33,6 +33,8 @@ from . import load_handler
 from . import export_guides
 from . import screenshot
 from . import bevel_worldspace
+from . import bone_roi
+from . import freeze_guides
 
 
 bl_info = {
@@ -50,12 +52,12 @@ bl_info = {
 
 
 def register():
+    bpy.utils.register_class(property_group.FFFGenObjectRole)
     bpy.utils.register_class(property_group.FFFGenPropertyGroup)
     bpy.types.Scene.FFFGenPropertyGroup = bpy.props.PointerProperty(type=property_group.FFFGenPropertyGroup)
     bpy.utils.register_class(initialize_addon.InitializeAddon)
     bpy.utils.register_class(initialize_rig.InitializeRig)
     bpy.utils.register_class(update.Update)
-    bpy.utils.register_class(update.AutoUpdateOperator)
     bpy.utils.register_class(cutting_planes.InitializeCuttingPlanes)
     bpy.utils.register_class(fibula_guides.CreateFibulaGuide)
     bpy.utils.register_class(fibula_guides.CreateFibulaScrew)
@@ -65,6 +67,8 @@ def register():
     bpy.utils.register_class(mandible_guides.JoinMandibleGuides)
     bpy.utils.register_class(mandible_guides.CreateMandiblePositioningAid)
     bpy.utils.register_class(export_guides.ExportGuides)
+    bpy.utils.register_class(freeze_guides.FreezeGuides)
+    bpy.utils.register_class(freeze_guides.ThawGuides)
     bpy.utils.register_class(clear.ClearMandibleGuides)
     bpy.utils.register_class(clear.ClearFibulaGuides)
     bpy.utils.register_class(clear.ClearCuttingPlanes)
@@ -79,16 +83,23 @@ def register():
     bpy.utils.register_class(screenshot.FFFGenScreenshotPanel)
     bpy.utils.register_class(bevel_worldspace.FFFGenBevelPanel)
     bpy.app.handlers.load_post.append(load_handler.on_load_post_handler)
+    bpy.app.handlers.depsgraph_update_post.append(update.on_depsgraph_update_post)
+    bpy.app.handlers.depsgraph_update_post.append(bone_roi.on_depsgraph_update_post)
 
 
 def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(bone_roi.on_depsgraph_update_post)
+    if bpy.app.timers.is_registered(bone_roi.refresh_roi_crops):
+        bpy.app.timers.unregister(bone_roi.refresh_roi_crops)
+    bpy.app.handlers.depsgraph_update_post.remove(update.on_depsgraph_update_post)
+    update.stop_background_update()
     bpy.app.handlers.load_post.remove(load_handler.on_load_post_handler)
     del bpy.types.Scene.FFFGenPropertyGroup
     bpy.utils.unregister_class(property_group.FFFGenPropertyGroup)
+    bpy.utils.unregister_class(property_group.FFFGenObjectRole)
     bpy.utils.unregister_class(initialize_addon.InitializeAddon)
     bpy.utils.unregister_class(initialize_rig.InitializeRig)
     bpy.utils.unregister_class(update.Update)
-    bpy.utils.unregister_class(update.AutoUpdateOperator)
     bpy.utils.unregister_class(cutting_planes.InitializeCuttingPlanes)
     bpy.utils.unregister_class(fibula_guides.CreateFibulaGuide)
     bpy.utils.unregister_class(fibula_guides.CreateFibulaScrew)
@@ -98,6 +109,8 @@ def unregister():
     bpy.utils.unregister_class(mandible_guides.JoinMandibleGuides)
     bpy.utils.unregister_class(mandible_guides.CreateMandiblePositioningAid)
     bpy.utils.unregister_class(export_guides.ExportGuides)
+    bpy.utils.unregister_class(freeze_guides.FreezeGuides)
+    bpy.utils.unregister_class(freeze_guides.ThawGuides)
     bpy.utils.unregister_class(clear.ClearMandibleGuides)
     bpy.utils.unregister_class(clear.ClearFibulaGuides)
     bpy.utils.unregister_class(clear.ClearCuttingPlanes)
@@ -0,0 +1,227 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+import json
+import os
+import time
+import tomllib
+from .initialize_addon import initialize_addon
+from .initialize_rig import initialize_rig
+from .cutting_planes import initialize_cutting_planes
+from .fibula_guides import create_fibula_guide, create_fibula_screw
+from .mandible_guides import create_mandible_guides, create_mandible_start_screw, create_mandible_end_screw, join_mandible_guides, create_mandible_positioning_aid
+from . import bone_roi
+from . import constants
+from . import object_registry
+from . import reconstructed_mandible
+from . import update
+
+
+# runs the whole planning workflow from a case spec, without the user interface.
+# used by run_case.py, eg. blender -b --python run_case.py -- case.json
+#
+# the case spec is a json or toml file, paths are relative to the spec file:
+# mandible, fibula - mesh files (.stl, .obj, .ply), required
+# output_dir - directory for the stl files and the timing report, defaults to the spec directory
+# segment_count - number of fibula segments
+# parameters - values of FFFGenPropertyGroup properties, eg. cutting_plane_thickness, screw_hole_diameter
+# bones - pose of the armature bones by bone name (bone.0, bone.1, ...): location, rotation_quaternion, rotation_euler, scale
+# objects - transforms of the created objects by role key (eg. fibula_guide, mandible_guide_start_union):
+#   location, rotation_euler, scale. applied after each step, once the object exists
+# fibula_screws, mandible_start_screws, mandible_end_screws - lists of screw hole locations
+# positioning_aid - create the mandible positioning aid
+# join_mandible_guides - join the start and end mandible guides, defaults to true
+# export - artefacts to export: fibula_guide, mandible_guide, positioning_aid, reconstructed_mandible
+# save_blend - optional path to save the planned case to
+
+TIMING_REPORT_NAME = "fffgen_timing_report.json"
+
+# export artefact : property toggling its export
+EXPORT_TOGGLES = {
+    "fibula_guide": "export_toggle_fibula_guide",
+    "mandible_guide": "export_toggle_mandible_guide",
+    "positioning_aid": "export_toggle_mandible_aid",
+    "reconstructed_mandible": "export_toggle_reconstructed_mandible"
+}
+
+# mesh file extension : import operator
+MESH_IMPORTERS = {
+    ".stl": lambda file_path: bpy.ops.wm.stl_import(filepath=file_path),
+    ".obj": lambda file_path: bpy.ops.wm.obj_import(filepath=file_path),
+    ".ply": lambda file_path: bpy.ops.wm.ply_import(filepath=file_path)
+}
+
+TRANSFORM_KEYS = ["location", "rotation_quaternion", "rotation_euler", "scale"]
+
+
+def load_case_spec(file_path):
+    if file_path.lower().endswith(".toml"):
+        with open(file_path, "rb") as file:
+            spec = tomllib.load(file)
+    else:
+        with open(file_path, "r") as file:
+            spec = json.load(file)
+    for key in ["mandible", "fibula"]:
+        if key not in spec:
+            raise ValueError("Case spec " + file_path + " has no " + key + " mesh")
+    return spec
+
+
+def import_mesh(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in MESH_IMPORTERS:
+        raise ValueError("Unsupported mesh file " + file_path)
+    if not os.path.exists(file_path):
+        raise ValueError("Mesh file " + file_path + " does not exist")
+    objects_old = set(bpy.data.objects)
+    MESH_IMPORTERS[extension](file_path)
+    objects_new = [obj for obj in bpy.data.objects if obj not in objects_old and obj.type == "MESH"]
+    if len(objects_new) != 1:
+        raise ValueError("Mesh file " + file_path + " should contain exactly one mesh")
+    return objects_new[0]
+
+
+def set_transform(target, transform):
+    # changing the rotation mode converts the current rotation, so the mode is set before the values
+    if "rotation_quaternion" in transform:
+        target.rotation_mode = "QUATERNION"
+    elif "rotation_euler" in transform:
+        target.rotation_mode = "XYZ"
+    for key in TRANSFORM_KEYS:
+        if key in transform:
+            setattr(target, key, transform[key])
+
+
+def set_bone_poses(bones):
+    armature = object_registry.get_object(constants.ROLE_ARMATURE)
+    for bone_name, transform in bones.items():
+        if bone_name not in armature.pose.bones.keys():
+            raise ValueError("The armature has no bone " + bone_name)
+        set_transform(armature.pose.bones[bone_name], transform)
+
+
+def set_object_transforms(objects):
+    # only the objects created so far, the rest is set after a later step
+    registry = object_registry.get_registry()
+    for role_key, transform in objects.items():
+        entry = registry.get(role_key)
+        if entry is not None and object_registry.is_valid(entry.obj):
+            set_transform(entry.obj, transform)
+    # timers do not run in background mode, crops of moved guides are refreshed here
+    bpy.context.view_layer.update()
+    bone_roi.refresh_roi_crops()
+
+
+def create_screws(create_screw, locations):
+    for location in locations:
+        obj_screw_hole = create_screw(bpy.context)
+        obj_screw_hole.location = location
+
+
+def clear_caches():
+    # caches are keyed by mesh pointers, which can be reused by the next case
+    bone_roi.bone_arrays.clear()
+    update.background_state["mesh_arrays"].clear()
+    reconstructed_mandible.clear_cache()
+
+
+def run_case(spec, spec_dir):
+    # runs the workflow, returns the timing report
+    context = bpy.context
+    properties = context.scene.FFFGenPropertyGroup
+    output_dir = os.path.join(spec_dir, spec.get("output_dir", ""))
+    os.makedirs(output_dir, exist_ok=True)
+    objects = spec.get("objects", dict())
+    timings = list()
+
+    def run_step(name, function, *args):
+        time_start = time.perf_counter()
+        result = function(*args)
+        # matrices of moved and created objects, for the next step
+        context.view_layer.update()
+        timings.append({"step": name, "seconds": time.perf_counter() - time_start})
+        return result
+
+    def setup_case():
+        clear_caches()
+        initialize_addon(context)
+        properties.mandible_object = import_mesh(os.path.join(spec_dir, spec["mandible"]))
+        properties.fibula_object = import_mesh(os.path.join(spec_dir, spec["fibula"]))
+        if "segment_count" in spec:
+            properties.segment_count = spec["segment_count"]
+        for name, value in spec.get("parameters", dict()).items():
+            if not hasattr(properties, name):
+                raise ValueError("Unknown parameter " + name)
+            setattr(properties, name, value)
+
+    def pose_bones():
+        set_bone_poses(spec.get("bones", dict()))
+        context.view_layer.update()
+        update.modal_invoke(context)
+
+    def export():
+        properties.export_dir_path = output_dir
+        artefacts = spec.get("export", list(EXPORT_TOGGLES.keys()))
+        for name, toggle in EXPORT_TOGGLES.items():
+            setattr(properties, toggle, name in artefacts)
+        # without a window the operator exports directly
+        bpy.ops.fff_gen.export_guides("EXEC_DEFAULT")
+
+    time_start = time.perf_counter()
+    run_step("setup", setup_case)
+    run_step("initialize_rig", initialize_rig, context)
+    run_step("pose_bones", pose_bones)
+    run_step("cutting_planes", initialize_cutting_planes, context)
+    run_step("fibula_guide", create_fibula_guide, context)
+    set_object_transforms(objects)
+    run_step("fibula_screws", create_screws, create_fibula_screw, spec.get("fibula_screws", list()))
+    run_step("mandible_guides", create_mandible_guides, context)
+    set_object_transforms(objects)
+    run_step("mandible_start_screws", create_screws, create_mandible_start_screw, spec.get("mandible_start_screws", list()))
+    run_step("mandible_end_screws", create_screws, create_mandible_end_screw, spec.get("mandible_end_screws", list()))
+    if spec.get("positioning_aid", False):
+        run_step("positioning_aid", create_mandible_positioning_aid, context)
+        set_object_transforms(objects)
+    if spec.get("join_mandible_guides", True):
+        run_step("join_mandible_guides", join_mandible_guides, context)
+        set_object_transforms(objects)
+    run_step("export", export)
+    if "save_blend" in spec:
+        file_path = os.path.join(spec_dir, spec["save_blend"])
+        run_step("save_blend", lambda: bpy.ops.wm.save_as_mainfile(filepath=file_path))
+
+    report = {
+        "output_dir": output_dir,
+        "steps": timings,
+        "total_seconds": time.perf_counter() - time_start
+    }
+    with open(os.path.join(output_dir, TIMING_REPORT_NAME), "w") as file:
+        json.dump(report, file, indent=2)
+    return report
+
+
+def run_case_file(file_path):
+    file_path = os.path.abspath(file_path)
+    spec = load_case_spec(file_path)
+    report = run_case(spec, os.path.dirname(file_path))
+    report["case"] = file_path
+    return report
@@ -18,9 +18,8 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-import bpy
-import os
 from bpy.types import Panel
+from .external_loading import get_node_group
 
 
 # a helper function to create a world-space bevel setup 
@@ -28,29 +27,9 @@ from bpy.types import Panel
 # a bit hacky, but works well enough. 
 # modifier_name should be passed as the hooks on the property will search for modifiers with the name that follow a specific pattern.
 def create_bevel_modifier(obj, modifier_name, segments, width):
-    nodegroup_objtoworld = None
-    nodegroup_worldtoobj = None
-
-    # no need to load/append from file if the node group is already in the current document...
-    if "geonode_object_to_world" in bpy.data.node_groups.keys():
-        nodegroup_objtoworld = bpy.data.node_groups["geonode_object_to_world"]
-    if "geonode_world_to_object" in bpy.data.node_groups.keys():
-        nodegroup_worldtoobj = bpy.data.node_groups["geonode_world_to_object"]
-
-    # load node groups if not already loaded...
-    if nodegroup_objtoworld is None:
-        directory = os.path.dirname(os.path.realpath(__file__))
-        file_path = os.path.join(directory, "geonodes_world_space_bevel.blend")
-        with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-            data_to.node_groups = [name for name in data_from.node_groups if name == "geonode_object_to_world"]
-        nodegroup_objtoworld = data_to.node_groups[0]
-    # load node groups if not already loaded...
-    if nodegroup_worldtoobj is None:
-        directory = os.path.dirname(os.path.realpath(__file__))
-        file_path = os.path.join(directory, "geonodes_world_space_bevel.blend")
-        with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-            data_to.node_groups = [name for name in data_from.node_groups if name == "geonode_world_to_object"]
-        nodegroup_worldtoobj = data_to.node_groups[0]
+    # the node groups are loaded from file once, if not already in the current document...
+    nodegroup_objtoworld = get_node_group("geonode_object_to_world")
+    nodegroup_worldtoobj = get_node_group("geonode_world_to_object")
 
     # create the geo node modifier. first we add object to world.
     mod_objtoworld = obj.modifiers.new(
@@ -87,5 +66,8 @@ class FFFGenBevelPanel(Panel):
         layout = self.layout
         properties = context.scene.FFFGenPropertyGroup
         
+        # bevels are only shown in the export quality
+        layout.prop(properties, "quality_profile")
         layout.prop(properties, "bevel_segmentcount")
         layout.prop(properties, "bevel_width")
+        layout.prop(properties, "roi_margin")
@@ -0,0 +1,259 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+import numpy
+from bpy.app.handlers import persistent
+from .half_space_clipping import clip_mesh, get_mesh_arrays, set_mesh_arrays
+from .move_object_to_collection import move_object_to_collection
+from . import constants
+from . import object_registry
+
+
+# guides only touch a small part of the bone, so instead of subtracting the whole bone mesh
+# each guide subtracts a crop of the bone - the part inside the bounding box of the guide objects, plus a margin.
+# the crop is the bone clipped with the 6 box planes (see half_space_clipping.py), so it stays a closed mesh.
+# crops are stored in world space, with the box they were built for in a custom property.
+# they are rebuilt only when the guide leaves that box, the box is built with an extra margin so small moves do not rebuild.
+# the box covers what the guide evaluates to: its own mesh and the operands of its union booleans, padded by its bevels.
+
+# custom properties of the crop objects
+PROP_BONE = "fffgen_roi_bone"
+PROP_BOUNDS = "fffgen_roi_bounds."
+PROP_BOX = "fffgen_roi_box"
+PROP_MATRICES = "fffgen_roi_matrices"
+
+# world space bone arrays, keyed by mesh and object matrix. the bones do not move while guides are created.
+# only the latest arrays of each mesh are kept, and at most BONE_ARRAYS_SIZE meshes (full and proxy of both bones)
+bone_arrays = dict()
+BONE_ARRAYS_SIZE = 4
+
+
+def get_bone_arrays(obj_bone):
+    mesh = obj_bone.data
+    key = (mesh.as_pointer(), len(mesh.vertices), len(mesh.polygons), tuple(tuple(row) for row in obj_bone.matrix_world))
+    if key not in bone_arrays:
+        # only keep the latest arrays of each mesh
+        for key_old in [key_old for key_old in bone_arrays.keys() if key_old[0] == key[0]]:
+            del bone_arrays[key_old]
+        # the dictionary keeps insertion order, the oldest arrays are dropped first
+        while len(bone_arrays) >= BONE_ARRAYS_SIZE:
+            del bone_arrays[next(iter(bone_arrays))]
+        co, tris = get_mesh_arrays(mesh)
+        matrix = numpy.array(obj_bone.matrix_world)
+        co = co @ matrix[:3, :3].T + matrix[:3, 3]
+        bone_arrays[key] = (co, tris, co.min(axis=0), co.max(axis=0))
+    return bone_arrays[key]
+
+
+def get_bound_objects(objects):
+    # the objects and, recursively, the operands of their union booleans, which add geometry to the evaluated guide
+    objects_bound = list()
+    objects_pending = list(objects)
+    while len(objects_pending):
+        obj = objects_pending.pop()
+        if obj is None or obj in objects_bound:
+            continue
+        objects_bound.append(obj)
+        for modifier in obj.modifiers:
+            if modifier.type != "BOOLEAN" or modifier.operation != "UNION":
+                continue
+            if modifier.operand_type == "OBJECT":
+                objects_pending.append(modifier.object)
+            elif modifier.collection is not None:
+                objects_pending.extend(modifier.collection.all_objects)
+    return objects_bound
+
+
+def get_bevel_width(objects):
+    # bevels are done in world space (see bevel_worldspace.py), their width pads the box
+    width = 0.0
+    for obj in objects:
+        for modifier in obj.modifiers:
+            if modifier.type == "BEVEL":
+                width = max(width, modifier.width)
+    return width
+
+
+def get_bounds(objects):
+    # world space bounding box of what the objects evaluate to, None if there are no meshes.
+    # the meshes are read without modifiers, so the guide is not evaluated against the bone it is cropping
+    objects = get_bound_objects(objects)
+    box_min = None
+    box_max = None
+    for obj in objects:
+        if obj.type != "MESH" or not len(obj.data.vertices):
+            continue
+        co = numpy.empty(len(obj.data.vertices) * 3, dtype=numpy.float32)
+        obj.data.vertices.foreach_get("co", co)
+        matrix = numpy.array(obj.matrix_world)
+        co = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        if box_min is None:
+            box_min = co.min(axis=0)
+            box_max = co.max(axis=0)
+        else:
+            box_min = numpy.minimum(box_min, co.min(axis=0))
+            box_max = numpy.maximum(box_max, co.max(axis=0))
+    if box_min is None:
+        return None
+    width = get_bevel_width(objects)
+    return box_min - width, box_max + width
+
+
+def get_matrices_state(obj_crop):
+    # flat world matrices of everything the box of the crop depends on, cheap to compare in the depsgraph handler
+    state = list()
+    for obj in get_bound_objects(get_roi_bounds(obj_crop)):
+        for row in obj.matrix_world:
+            state.extend(row)
+    return state
+
+
+def crop_bone(obj_bone, box_min, box_max):
+    # bone geometry inside the box, in world space
+    co, tris, bone_min, bone_max = get_bone_arrays(obj_bone)
+    if numpy.any(bone_min > box_max) or numpy.any(bone_max < box_min):
+        return numpy.empty((0, 3)), numpy.empty((0, 3), dtype=numpy.int64)
+
+    planes = list()
+    for axis in range(0, 3):
+        normal = numpy.zeros(3)
+        normal[axis] = 1.0
+        planes.append((box_min, normal))
+        planes.append((box_max, -normal))
+    # bounding box prefilter - clip the planes that remove most of the vertices first,
+    # so only the first clip works on the full resolution mesh
+    planes.sort(key=lambda plane: numpy.count_nonzero((co - plane[0]) @ plane[1] >= 0.0))
+    return clip_mesh(co, tris, planes)
+
+
+def get_roi_bounds(obj_crop):
+    # the objects defining the box of the crop, deleted objects are skipped
+    objects = list()
+    for key in obj_crop.keys():
+        if key.startswith(PROP_BOUNDS) and obj_crop[key] is not None:
+            objects.append(obj_crop[key])
+    return objects
+
+
+def get_required_box(obj_crop, margin):
+    obj_bone = obj_crop.get(PROP_BONE)
+    bounds = get_bounds(get_roi_bounds(obj_crop))
+    if bounds is None:
+        # nothing to limit the crop, use the whole bone
+        co, tris, bone_min, bone_max = get_bone_arrays(obj_bone)
+        return bone_min - margin, bone_max + margin
+    return bounds[0] - margin, bounds[1] + margin
+
+
+def needs_refresh(obj_crop, margin):
+    if obj_crop.get(PROP_BONE) is None:
+        return False
+    box = obj_crop.get(PROP_BOX)
+    if box is None:
+        return True
+    box = numpy.array(box)
+    required_min, required_max = get_required_box(obj_crop, margin)
+    return bool(numpy.any(required_min < box[:3]) or numpy.any(required_max > box[3:]))
+
+
+def refresh_roi_crop(obj_crop, margin, force=False):
+    if not force and not needs_refresh(obj_crop, margin):
+        return False
+    obj_bone = obj_crop.get(PROP_BONE)
+    if obj_bone is None:
+        return False
+    required_min, required_max = get_required_box(obj_crop, margin)
+    box_min = required_min - margin
+    box_max = required_max + margin
+    co, tris = crop_bone(obj_bone, box_min, box_max)
+    set_mesh_arrays(obj_crop.data, co, tris)
+    obj_crop[PROP_BOX] = numpy.concatenate((box_min, box_max)).tolist()
+    obj_crop[PROP_MATRICES] = get_matrices_state(obj_crop)
+    return True
+
+
+def create_roi_crop(obj_bone, objects_bounds, crop_name, collection_name):
+    # creates the crop of obj_bone for the guide made of objects_bounds, to be used instead of obj_bone in booleans
+    # matrices of newly created or moved objects are only valid after the view layer update
+    bpy.context.view_layer.update()
+    mesh = bpy.data.meshes.new(crop_name)
+    obj_crop = bpy.data.objects.new(crop_name, mesh)
+    move_object_to_collection(
+        obj_to_move=obj_crop,
+        collection_name=collection_name,
+        remove_from_current=True
+    )
+    obj_crop.display_type = "WIRE"
+    obj_crop.hide_render = True
+    obj_crop[PROP_BONE] = obj_bone
+    for index, obj in enumerate(objects_bounds):
+        obj_crop[PROP_BOUNDS + str(index)] = obj
+    object_registry.register_object(constants.ROLE_BONE_ROI, obj_crop, object_registry.get_next_index(constants.ROLE_BONE_ROI))
+    refresh_roi_crop(obj_crop, bpy.context.scene.FFFGenPropertyGroup.roi_margin, force=True)
+    obj_crop.hide_set(True)
+    return obj_crop
+
+
+def get_roi_crops(scene):
+    return object_registry.get_registered_objects(scene, [constants.ROLE_BONE_ROI])
+
+
+def get_roi_crops_for(scene, objects):
+    # crops whose box depends on any of the objects
+    objects = set(objects)
+    crops = list()
+    for obj_crop in get_roi_crops(scene):
+        if objects.intersection(get_roi_bounds(obj_crop)):
+            crops.append(obj_crop)
+    return crops
+
+
+def refresh_roi_crops(force=False):
+    # rebuild crops whose guides left their box, also used as a timer callback
+    scene = bpy.context.scene
+    margin = scene.FFFGenPropertyGroup.roi_margin
+    for obj_crop in get_roi_crops(scene):
+        if not refresh_roi_crop(obj_crop, margin, force):
+            # checked against the current matrices, the handler waits for the next move
+            obj_crop[PROP_MATRICES] = get_matrices_state(obj_crop)
+    return None
+
+
+def is_moved(obj_crop):
+    matrices = obj_crop.get(PROP_MATRICES)
+    if matrices is None:
+        return True
+    return list(matrices) != get_matrices_state(obj_crop)
+
+
+@persistent
+def on_depsgraph_update_post(scene, depsgraph):
+    # the crops can not be rebuilt inside the handler, a timer does it once the update is done
+    if not depsgraph.id_type_updated("OBJECT"):
+        return
+    if bpy.app.timers.is_registered(refresh_roi_crops):
+        return
+    # only matrices are compared here, the meshes are read by the timer
+    for obj_crop in get_roi_crops(scene):
+        if is_moved(obj_crop):
+            bpy.app.timers.register(refresh_roi_crops, first_interval=0.0)
+            return
@@ -20,8 +20,11 @@
 
 
 import bpy
+from . import bone_roi
 from . import constants
-from .move_object_to_collection import move_object_to_collection
+from . import object_registry
+from . import reconstructed_mandible
+from . import update
 
 
 class ClearFibulaGuides(bpy.types.Operator):
@@ -34,6 +37,7 @@ class ClearFibulaGuides(bpy.types.Operator):
 
     def execute(self, context):
         clear_fibula_guides(context)
+        object_registry.remove_stale_entries()
         return {"FINISHED"}
 
 
@@ -47,6 +51,7 @@ class ClearMandibleGuides(bpy.types.Operator):
     
     def execute(self, context):
         clear_mandible_guides(context)
+        object_registry.remove_stale_entries()
         return {"FINISHED"}
 
 
@@ -60,6 +65,7 @@ class ClearMandiblePositioningAid(bpy.types.Operator):
     
     def execute(self, context):
         clear_mandible_positioning_aid(context)
+        object_registry.remove_stale_entries()
         return {"FINISHED"}
 
 
@@ -75,6 +81,7 @@ class ClearCuttingPlanes(bpy.types.Operator):
         clear_fibula_guides(context)
         clear_mandible_guides(context)
         clear_cutting_planes(context)
+        object_registry.remove_stale_entries()
         return {"FINISHED"}
 
 
@@ -92,107 +99,116 @@ class ClearAll(bpy.types.Operator):
         clear_mandible_positioning_aid(context)
         clear_cutting_planes(context)
         clear_fff_gen_objects(context)
+        clear_proxy_meshes(context)
         reset_collections()
+        object_registry.clear_registry()
+        # cached arrays of removed meshes
+        bone_roi.bone_arrays.clear()
+        update.background_state["mesh_arrays"].clear()
+        reconstructed_mandible.clear_cache()
         return {"FINISHED"}
 
 
+# objects are removed through the data api in one batch, followed by the datablocks only they used.
+# object removal leaves meshes, materials and node groups without users in bpy.data,
+# they would pile up with every cleared and re-planned case and be written to the .blend file.
+# only datablocks without users are removed, so meshes shared with the original bones are never touched.
+
+
+def get_object_datablocks(objects):
+    # datablocks used by the objects, candidates for removal once the objects are gone
+    datablocks = set()
+    for obj in objects:
+        if obj.data is not None:
+            datablocks.add(obj.data)
+        # live mesh of a frozen guide, see freeze_guides.py
+        mesh_live = obj.get(constants.PROP_LIVE_MESH)
+        if mesh_live is not None:
+            datablocks.add(mesh_live)
+        for slot in obj.material_slots:
+            if slot.link == "OBJECT" and slot.material is not None:
+                datablocks.add(slot.material)
+        for modifier in obj.modifiers:
+            if modifier.type == "NODES" and modifier.node_group is not None:
+                datablocks.add(modifier.node_group)
+    return datablocks
+
+
+def purge_orphans(datablocks):
+    # removes the datablocks without users, then the materials which were only used by the removed meshes and curves
+    datablocks = set(datablocks)
+    while len(datablocks):
+        orphans = [datablock for datablock in datablocks if datablock.users == 0]
+        datablocks = set()
+        for datablock in orphans:
+            if isinstance(datablock, (bpy.types.Mesh, bpy.types.Curve)):
+                datablocks.update(material for material in datablock.materials if material is not None)
+        bpy.data.batch_remove(orphans)
+
+
+def remove_objects(objects):
+    objects = set(objects)
+    if not len(objects):
+        return
+    datablocks = get_object_datablocks(objects)
+    bpy.data.batch_remove(objects)
+    purge_orphans(datablocks)
+
+
 def clear_mandible_guides(context):
-    # deselect all selected objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    # get the collections, craete override context using collection objects
-    collection = bpy.data.collections[constants.COLLECTION_GUIDE_MANDIBLE]
-    override_context = {
-        "selected_objects":collection.objects
-    }
-    # delete using override context
-    with context.temp_override(**override_context):
-        bpy.ops.object.delete()
+    remove_objects(bpy.data.collections[constants.COLLECTION_GUIDE_MANDIBLE].objects)
     # set cutting plane visibility back
     bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE].hide_viewport = False
 
 
 def clear_mandible_positioning_aid(context):
-    # deselect all selected objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-
-    # select all positioning aid specific objects.
     objects = []
-    positioning_aid_object_names = [
-        "positioning_aid_curve",
-        "positioning_aid_curve_handle_start",
-        "positioning_aid_curve_handle_end",
-        "positioning_aid_start",
-        "positioning_aid_end",
-        "positioning_aid_mesh"
+    positioning_aid_roles = [
+        constants.ROLE_POSITIONING_AID_CURVE,
+        constants.ROLE_POSITIONING_AID_CURVE_HANDLE_START,
+        constants.ROLE_POSITIONING_AID_CURVE_HANDLE_END,
+        constants.ROLE_POSITIONING_AID_START,
+        constants.ROLE_POSITIONING_AID_END,
+        constants.ROLE_POSITIONING_AID_MESH
     ]
-    for obj_name in positioning_aid_object_names:
-        if obj_name in bpy.data.objects.keys():
-            objects.append(bpy.data.objects[obj_name])
-    override_context = {
-        "selected_objects":objects
-    }
-
-    # delete using override context
-    with context.temp_override(**override_context):
-        bpy.ops.object.delete()
+    for role in positioning_aid_roles:
+        obj = object_registry.get_object(role)
+        if obj is not None:
+            objects.append(obj)
+    # bone crops of the positioning aid
+    objects.extend(bone_roi.get_roi_crops_for(context.scene, objects))
+    remove_objects(objects)
 
 
 def clear_fibula_guides(context):
-    # deselect all selected objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    # get the collections, craete override context using collection objects
-    collection = bpy.data.collections[constants.COLLECTION_GUIDE_FIBULA]
-    override_context = {
-        "selected_objects":collection.objects
-    }
-    # delete using override context
-    with context.temp_override(**override_context):
-        bpy.ops.object.delete()
+    remove_objects(bpy.data.collections[constants.COLLECTION_GUIDE_FIBULA].objects)
     # set cutting plane visibility back
     bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_FIBULA].hide_viewport = False
 
 
 def clear_cutting_planes(context):
-    # deselect all selected objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    # get the collections, craete override context using collection objects
-    collection_mandible = bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE]
-    collection_fibula = bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_FIBULA]
     objects = []
-    for obj in collection_mandible.objects:
-        objects.append(obj)
-    for obj in collection_fibula.objects:
-        objects.append(obj)
-    override_context = {
-        "selected_objects":objects
-    }
-    # delete using override context
-    with context.temp_override(**override_context):
-        bpy.ops.object.delete()
+    objects.extend(bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE].objects)
+    objects.extend(bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_FIBULA].objects)
+    remove_objects(objects)
 
 
 def clear_fff_gen_objects(context):
-    # deselect all selected objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    # get the collections, craete override context using collection objects
-    collection_fibula = bpy.data.collections[constants.COLLECTION_FFF_GEN_FIBULA]
-    collection_mandible = bpy.data.collections[constants.COLLECTION_FFF_GEN_MANDIBLE]
     objects = []
-    for obj in collection_mandible.objects:
-        objects.append(obj)
-    for obj in collection_fibula.objects:
-        objects.append(obj)
-    override_context = {
-        "selected_objects":objects
-    }
-    # delete using override context
-    with context.temp_override(**override_context):
-        bpy.ops.object.delete()
+    objects.extend(bpy.data.collections[constants.COLLECTION_FFF_GEN_MANDIBLE].objects)
+    objects.extend(bpy.data.collections[constants.COLLECTION_FFF_GEN_FIBULA].objects)
+    remove_objects(objects)
+
+
+def clear_proxy_meshes(context):
+    # the proxy meshes are only used through the property group, the full meshes belong to the original objects
+    properties = context.scene.FFFGenPropertyGroup
+    meshes = [properties.mandible_mesh_proxy, properties.fibula_mesh_proxy]
+    properties.mandible_mesh_full = None
+    properties.mandible_mesh_proxy = None
+    properties.fibula_mesh_full = None
+    properties.fibula_mesh_proxy = None
+    purge_orphans(mesh for mesh in meshes if mesh is not None)
 
 
 def reset_collections():
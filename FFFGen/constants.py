@@ -26,7 +26,56 @@ COLLECTION_GUIDE_MANDIBLE = "guide_mandible"
 COLLECTION_CUTTING_PLANES_MANDIBLE = "cutting_planes_mandible"
 COLLECTION_GUIDE_FIBULA = "guide_fibula"
 COLLECTION_CUTTING_PLANES_FIBULA = "cutting_planes_fibula"
+# not linked to the scene, holds the template objects loaded from the add-on .blend files
+COLLECTION_TEMPLATES = "fffgen_templates"
 
 WORKSPACE_POSITIONING = "Positioning"
 WORKSPACE_MANDIBLE_GUIDES = "Mandible Guides"
 WORKSPACE_FIBULA_GUIDES = "Fibula Guides"
+
+# vertex group marking the regions where the proxy meshes keep more detail
+VERTEX_GROUP_DETAIL = "fffgen_detail"
+
+# boolean modifier of the resected mandible, its operand is the joined resection cutter
+MODIFIER_MANDIBLE_RESECTION = "fffgen_mandible_resection"
+
+# custom properties of frozen guides, see freeze_guides.py
+PROP_LIVE_MESH = "fffgen_live_mesh"
+PROP_FROZEN_MODIFIERS = "fffgen_frozen_modifiers"
+
+# object roles, used as keys in the object registry
+# for objects created by older versions, the role key (role, or role.index) is also the object name
+ROLE_ARMATURE = "Armature"
+ROLE_FIBULA_COPY = "fibula_copy"
+ROLE_MANDIBLE_COPY = "mandible_copy"
+ROLE_MANDIBLE_RESECTED = "mandible_resected"
+ROLE_MANDIBLE_VISUALISATION = "mandible_visualisation"
+ROLE_MANDIBLE_RESECTED_VISUALISATION = "mandible_resected_visualisation"
+ROLE_BOOLEAN_CUBE = "boolean_cube"
+ROLE_MANDIBLE_BOOLEAN_CUBE = "mandible_boolean_cube"
+ROLE_MANDIBLE_RESECTION_CUTTER = "mandible_resection_cutter"
+ROLE_VECTOR = "vector"
+ROLE_FIBULA_SEGMENT = "fibula_object"
+ROLE_FIBULA_DUPLI = "fibula_dupli"
+ROLE_CUTTING_PLANE_FIBULA_START = "cutting_plane_fibula_start"
+ROLE_CUTTING_PLANE_FIBULA_END = "cutting_plane_fibula_end"
+ROLE_CUTTING_PLANE_MANDIBLE_START = "cutting_plane_mandible_start"
+ROLE_CUTTING_PLANE_MANDIBLE_END = "cutting_plane_mandible_end"
+ROLE_FIBULA_GUIDE = "fibula_guide"
+ROLE_FIBULA_GUIDE_SCREW_HOLE = "fibula_guide_screw_hole"
+ROLE_MANDIBLE_GUIDE_START = "mandible_guide_start"
+ROLE_MANDIBLE_GUIDE_END = "mandible_guide_end"
+ROLE_MANDIBLE_GUIDE_START_DIFFERENCE = "mandible_guide_start_difference"
+ROLE_MANDIBLE_GUIDE_END_DIFFERENCE = "mandible_guide_end_difference"
+ROLE_MANDIBLE_GUIDE_START_UNION = "mandible_guide_start_union"
+ROLE_MANDIBLE_GUIDE_END_UNION = "mandible_guide_end_union"
+ROLE_MANDIBLE_GUIDE_START_SCREW_HOLE = "mandible_guide_start_screw_hole"
+ROLE_MANDIBLE_GUIDE_END_SCREW_HOLE = "mandible_guide_end_screw_hole"
+ROLE_MANDIBLE_GUIDE_JOINED = "joined_mandible_guide"
+ROLE_POSITIONING_AID_CURVE = "positioning_aid_curve"
+ROLE_POSITIONING_AID_CURVE_HANDLE_START = "positioning_aid_curve_handle_start"
+ROLE_POSITIONING_AID_CURVE_HANDLE_END = "positioning_aid_curve_handle_end"
+ROLE_POSITIONING_AID_START = "positioning_aid_start"
+ROLE_POSITIONING_AID_END = "positioning_aid_end"
+ROLE_POSITIONING_AID_MESH = "positioning_aid_mesh"
+ROLE_BONE_ROI = "bone_roi"
@@ -20,9 +20,12 @@
 
 
 import bpy
+import mathutils
 from .move_object_to_collection import move_object_to_collection
+from .quality_profile import apply_quality_profile
 from . import constants
-from .external_loading import load_cutting_planes
+from . import object_registry
+from .external_loading import load_cutting_planes, copy_template_object
 import os
 
 
@@ -32,49 +35,36 @@ class InitializeCuttingPlanes(bpy.types.Operator):
     bl_description = "Creates cutting planes, and displays them in appropriate workspaces"
 
     def invoke(self, context, event):
-        # get the armature
-        armature = bpy.data.objects["Armature"]
-
-        # load cutting planes from the external file...
-        loaded_planes = load_cutting_planes()
-        cutting_plane_start_orig = loaded_planes[0]
-        cutting_plane_end_orig = loaded_planes[1]
-
-        # crate duplicates of loaded cutting planes at correct, apply their transforms
-        # and move them to proper location in relation to the fibula.
-        objects_cutting_planes = setup_cutting_planes(
-            cutting_plane_start_orig, 
-            cutting_plane_end_orig, 
-            armature
-        )
-        apply_cutting_plane_transforms(objects_cutting_planes.values())
-        set_cutting_plane_positions(objects_cutting_planes)
-
-        # remove original cutting planes, and move the duplicates to proper layers.
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        cutting_plane_start_orig.select_set(True)
-        cutting_plane_end_orig.select_set(True)
-        bpy.ops.object.delete()
-        move_cutting_planes_to_layers(objects_cutting_planes.values())
+        initialize_cutting_planes(context)
         return {"FINISHED"}
 
 
-def apply_cutting_plane_transforms(cutting_planes):
-    # apply visual transform for all cutting planes, and remove the constraints one applied
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    for cutting_plane_dupli in cutting_planes:
-        cutting_plane_dupli.select_set(True)
-        bpy.context.view_layer.objects.active = cutting_plane_dupli
-        bpy.ops.object.visual_transform_apply()
-        bpy.ops.object.constraints_clear()
-        cutting_plane_dupli.select_set(False)
+def initialize_cutting_planes(context):
+    # get the armature
+    armature = object_registry.get_object(constants.ROLE_ARMATURE)
+
+    # cutting plane templates, loaded from the external file on first use
+    loaded_planes = load_cutting_planes()
+    cutting_plane_start_orig = loaded_planes[0]
+    cutting_plane_end_orig = loaded_planes[1]
+
+    # create copies of loaded cutting planes, placed directly at their final transforms
+    objects_cutting_planes = setup_cutting_planes(
+        cutting_plane_start_orig, 
+        cutting_plane_end_orig, 
+        armature
+    )
+
+    # the loaded cutting planes are the cached templates, only move the copies to proper layers.
+    move_cutting_planes_to_layers(objects_cutting_planes.values())
+    apply_quality_profile(context.scene)
 
 
 def move_cutting_planes_to_layers(cutting_planes):
+    objects_fibula_planes = set(object_registry.get_indexed_objects(constants.ROLE_CUTTING_PLANE_FIBULA_START).values())
+    objects_fibula_planes.update(object_registry.get_indexed_objects(constants.ROLE_CUTTING_PLANE_FIBULA_END).values())
     for obj in cutting_planes:
-        if obj.name.startswith("cutting_plane_fibula_"):
+        if obj in objects_fibula_planes:
             move_object_to_collection(
                 obj_to_move=obj,
                 collection_name=constants.COLLECTION_CUTTING_PLANES_FIBULA,
@@ -88,127 +78,80 @@ def move_cutting_planes_to_layers(cutting_planes):
             )
 
 
-def set_cutting_plane_positions(objects_cutting_planes):
-    # TODO: find a better way to do this
-    # perhaps using matrix world to copy transformations
-    # duplicates the fibula dupli object, applies its constraints and visual transforms
-    # parents the cutting plane to the fibula object
-    # then resets the location and rotation of the fibula object...
-
-    # get fibula graft objects
-    objects_fibula = dict()
-    for obj in bpy.data.objects:
-        if obj.name.startswith("fibula_object"):
-            objects_fibula[obj.name] = obj
-
-    if "fibula_copy" in bpy.data.objects.keys():
-        fibula_orig = bpy.data.objects["fibula_copy"]
+def get_fibula_plane_matrix(obj_fibula, fibula_orig):
+    # maps a plane placed on the mandible side (relative to the posed fibula segment)
+    # to the fibula side, where the segment is displayed at the location and rotation of the fibula copy
+    if fibula_orig is not None:
+        matrix_fibula = mathutils.Matrix.LocRotScale(fibula_orig.location, fibula_orig.rotation_euler, obj_fibula.scale)
     else:
-        fibula_orig = None
-
-
-    for obj_fibula in objects_fibula.values():
-        # duplicate the fibula object
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        obj_fibula.select_set(True)
-        bpy.ops.object.duplicate()
-        obj_fibula_dupli = bpy.context.selected_objects[0]
-        obj_fibula.select_set(False)
-
-        # assign ob_dupli as parent (use keep transform)
-        index = obj_fibula.name[14:]
-        obj_plane_start = objects_cutting_planes["cutting_plane_fibula_start." + index]
-        obj_plane_end = objects_cutting_planes["cutting_plane_fibula_end." + index]
-        obj_plane_start.select_set(True)
-        obj_plane_end.select_set(True)
-        bpy.context.view_layer.objects.active = obj_fibula_dupli
-        bpy.ops.object.parent_set(
-            type="OBJECT",
-            keep_transform=True
-        )
-
-        # reset the location of fibula dupli by clearing the constraints and setting the location and rotation to 0
-        obj_plane_start.select_set(False)
-        obj_plane_end.select_set(False)
-        bpy.context.view_layer.objects.active = obj_fibula_dupli
-        bpy.ops.object.constraints_clear()
-
-        if fibula_orig is not None:
-            obj_fibula_dupli.location = fibula_orig.location
-            obj_fibula_dupli.rotation_euler = fibula_orig.rotation_euler
-        else:
-            obj_fibula_dupli.location = (0.0, 0.0, 0.0)
-            obj_fibula_dupli.rotation_euler = (0.0, 0.0, 0.0)
+        matrix_fibula = mathutils.Matrix.LocRotScale(None, None, obj_fibula.scale)
+    return matrix_fibula @ obj_fibula.matrix_world.inverted()
 
-        # clear the parent relationship, but keep the transformations to keep planes in place
-        obj_fibula_dupli.select_set(False)
-        obj_plane_start.select_set(True)
-        obj_plane_end.select_set(True)
-        bpy.ops.object.parent_clear(
-            type='CLEAR_KEEP_TRANSFORM'
-        )
 
-        # delete duplicated fibula object...
-        obj_plane_start.select_set(False)
-        obj_plane_end.select_set(False)
-        obj_fibula_dupli.select_set(True)
-        bpy.ops.object.delete()
+def create_cutting_plane(cutting_plane_orig, thickness_sf):
+    # copy of the loaded plane, the scale (with the plane thickness on y) is applied to its own copy of the mesh
+    cutting_plane = copy_template_object(cutting_plane_orig)
+    scale = cutting_plane_orig.scale.copy()
+    scale[1] = thickness_sf
+    cutting_plane.data.transform(mathutils.Matrix.Diagonal(scale).to_4x4())
+    cutting_plane.constraints.clear()
+    return cutting_plane
 
 
 def setup_cutting_planes(cutting_plane_start_orig, cutting_plane_end_orig, armature):
-    # iterate over armature bones, duplicate cutting planes and move them to bone positions...
+    # for each armature bone create a start and end cutting plane and compute their world matrices directly.
+    # the plane sits on the bone: W = armature world @ pose bone @ plane location/rotation.
+    # planes of the fibula segments are then moved to the fibula side,
+    # using the matrix of the segment and where the segment is displayed (see get_fibula_plane_matrix).
 
     objects_cutting_planes = dict()
     thickness_sf = bpy.context.scene.FFFGenPropertyGroup.cutting_plane_thickness
+    bpy.context.view_layer.update()
+
+    objects_fibula = object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT)
+    fibula_orig = object_registry.get_object(constants.ROLE_FIBULA_COPY)
+    matrices_fibula = dict()
+    for index, obj_fibula in objects_fibula.items():
+        matrices_fibula[index] = get_fibula_plane_matrix(obj_fibula, fibula_orig)
 
+    matrix_plane_start = mathutils.Matrix.LocRotScale(cutting_plane_start_orig.location, cutting_plane_start_orig.rotation_euler, None)
+    matrix_plane_end = mathutils.Matrix.LocRotScale(cutting_plane_end_orig.location, cutting_plane_end_orig.rotation_euler, None)
+
+    bone_count = len(armature.pose.bones)
     for index, bone in enumerate(armature.pose.bones):
-        # duplicate start and end cutting planes
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        cutting_plane_start_orig.select_set(True)
-        bpy.ops.object.duplicate()
-        cutting_plane_start_dupli = bpy.context.selected_objects[0]
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        cutting_plane_end_orig.select_set(True)
-        bpy.ops.object.duplicate()
-        cutting_plane_end_dupli = bpy.context.selected_objects[0]
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-
-        # for both cutting planes apply scale factor and add constraints
-        for cutting_plane_dupli in [cutting_plane_start_dupli, cutting_plane_end_dupli]:
-            # set scale for correct plane thickness and apply visuzal transform for scale
-            cutting_plane_dupli.scale[1] = thickness_sf
-            cutting_plane_dupli.select_set(True)
-            bpy.context.view_layer.objects.active = cutting_plane_dupli
-            bpy.ops.object.transform_apply(
-                location=False,
-                rotation=False,
-                scale=True
-            )
-            # add constraints
-            constraint_child_of = cutting_plane_dupli.constraints.new(
-                type="CHILD_OF"
-            )
-            constraint_child_of.target = armature
-            constraint_child_of.subtarget = bone.name
-            bpy.ops.constraint.childof_clear_inverse(constraint=constraint_child_of.name, owner="OBJECT")
-            cutting_plane_dupli.select_set(False)
-            bpy.context.view_layer.objects.active = None
-
-        # rename duplicated cutting planes
-        cutting_plane_start_dupli.name = "cutting_plane_fibula_start." + str(index)
-        cutting_plane_end_dupli.name = "cutting_plane_fibula_end." + str(index - 1)
+        matrix_bone = armature.matrix_world @ bone.matrix
+        cutting_plane_start = create_cutting_plane(cutting_plane_start_orig, thickness_sf)
+        cutting_plane_end = create_cutting_plane(cutting_plane_end_orig, thickness_sf)
+        cutting_plane_start.matrix_world = matrix_bone @ matrix_plane_start
+        cutting_plane_end.matrix_world = matrix_bone @ matrix_plane_end
+
+        # rename, register and place the planes
+        # the start plane of bone N starts segment N, the end plane of bone N ends segment N-1
+        # the start plane of the last bone and the end plane of the first bone stay on the mandible
+        if index == (bone_count-1):
+            start_key = register_cutting_plane(cutting_plane_start, constants.ROLE_CUTTING_PLANE_MANDIBLE_START)
+        else:
+            start_key = register_cutting_plane(cutting_plane_start, constants.ROLE_CUTTING_PLANE_FIBULA_START, index)
+            if index in matrices_fibula:
+                cutting_plane_start.matrix_world = matrices_fibula[index] @ cutting_plane_start.matrix_world
         if index == 0:
-            cutting_plane_end_dupli.name = "cutting_plane_mandible_end"
-        if index == (len(armature.pose.bones)-1):
-            cutting_plane_start_dupli.name = "cutting_plane_mandible_start"
+            end_key = register_cutting_plane(cutting_plane_end, constants.ROLE_CUTTING_PLANE_MANDIBLE_END)
+        else:
+            end_key = register_cutting_plane(cutting_plane_end, constants.ROLE_CUTTING_PLANE_FIBULA_END, index - 1)
+            if (index - 1) in matrices_fibula:
+                cutting_plane_end.matrix_world = matrices_fibula[index - 1] @ cutting_plane_end.matrix_world
 
-        # append to duplicated cutting planes to a dictionary
-        objects_cutting_planes[cutting_plane_start_dupli.name] = cutting_plane_start_dupli
-        objects_cutting_planes[cutting_plane_end_dupli.name] = cutting_plane_end_dupli
+        # append to created cutting planes to a dictionary
+        objects_cutting_planes[start_key] = cutting_plane_start
+        objects_cutting_planes[end_key] = cutting_plane_end
 
-    # return the correctly positioned duplicated cutting planes
+    # return the correctly positioned cutting planes
     return objects_cutting_planes
+
+
+def register_cutting_plane(obj_cutting_plane, role, index=-1):
+    # the object name is the same as the role key
+    key = object_registry.get_role_key(role, index)
+    obj_cutting_plane.name = key
+    object_registry.register_object(role, obj_cutting_plane, index)
+    return key
@@ -19,198 +19,259 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import bpy
+import concurrent.futures
 import os
 from bpy import context
+from . import bone_roi
 from . import constants
+from . import export_inputs
+from . import export_manifest
+from . import object_registry
+from . import reconstructed_mandible
+from . import stl_writer
 
-def export_mesh_stl(context, object, full_file_path):
-    # keep track of previously selected and active objects.
-    active_old = bpy.context.active_object
-    selected_old = bpy.context.selected_objects
-    # deselect all objects
-    for obj in bpy.data.objects:
-        obj.select_set(False)
-    # set object to export as active and selected
-    object.select_set(True)
-    bpy.context.view_layer.objects.active = object
-
-    # export object
-    bpy.ops.wm.stl_export(
-        filepath=full_file_path, 
-        check_existing=True,
-        export_selected_objects=True, 
-        global_scale=context.scene.FFFGenPropertyGroup.export_scale_factor, 
-        use_scene_unit=False, 
-        forward_axis="Y", 
-        up_axis="Z"
+# the export runs as a pipeline. the evaluated meshes are snapshotted into numpy arrays on the main thread,
+# one artefact at a time, and the arrays are cleaned up and written to the stl files in worker threads.
+# depsgraph evaluation (including the exact booleans of the reconstructed mandible) is only possible on the main thread,
+# so the snapshots stay serial, while the writing of earlier artefacts overlaps with the next snapshot.
+
+def snapshot_object(context, obj):
+    # world space triangles of the evaluated object, in export space, None if there is no object
+    if obj is None:
+        return None
+    return stl_writer.get_object_triangles(
+        obj,
+        context.evaluated_depsgraph_get(),
+        stl_writer.get_export_matrix(context.scene.FFFGenPropertyGroup.export_scale_factor)
     )
 
-    # deselect object to export
-    object.select_set(False)
-    # revert selection and active object to initial state.
-    bpy.context.view_layer.objects.active = active_old
-    for obj in selected_old:
-        obj.select_set(True)
-
-    return
-
-def export_fibula_guide(context, full_file_path):
-    if "fibula_guide" in bpy.data.objects.keys():
-        obj = bpy.data.objects["fibula_guide"]
-        export_mesh_stl(context, obj, full_file_path)
-    return
-
-def export_mandible_guide(context, full_file_path):
-    if "joined_mandible_guide" in bpy.data.objects.keys():
-        obj = bpy.data.objects["joined_mandible_guide"]
-        export_mesh_stl(context, obj, full_file_path)
-    return
-
-def export_mandible_positioning_aid(context, full_file_path):
-    if "positioning_aid_mesh" in bpy.data.objects.keys():
-        obj = bpy.data.objects["positioning_aid_mesh"]
-        export_mesh_stl(context, obj, full_file_path)
-    return
-
-# small helper function for object duplication
-# links everything to the scene collection so the new objects should be available to operators etc.
-# using bpy.ops.object.duplicate() has some issues here, i guess due to visibility, even with override context...
-def duplicate_object(object_to_duplicate, duplicated_object_name):
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    new_object = object_to_duplicate.copy()
-    new_object.data= object_to_duplicate.data.copy()
-    new_object.name = duplicated_object_name
-    bpy.context.collection.objects.link(new_object)
-    return new_object
-
-def export_reconstructed_mandible(context, full_file_path):
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-
-    # clone mandible object(cut one)
-    mandible_clone = duplicate_object(bpy.data.objects["mandible_copy.001"], "clone_mandible")
-    
-    # on cloned mandible apply all modifiers. the mandible has no constraints set...
-    for mandible_modifier in mandible_clone.modifiers:
-        bpy.context.view_layer.objects.active = mandible_clone
-        bpy.ops.object.modifier_apply(modifier=mandible_modifier.name, single_user=True)
-
-    # clone grafts after accumulating all present...
-    graft_originals = []
-    for obj in bpy.data.collections[constants.COLLECTION_FFF_GEN_MANDIBLE].objects:
-        if obj.name.startswith("fibula_object."):
-            graft_originals.append(obj)
-    graft_clones = []
-    for index, obj in enumerate(graft_originals):
-        graft_clone = duplicate_object(obj, "graft_clone." + str(index))
-        graft_clones.append(graft_clone)
-    
-    # on cloned grafts apply all modifiers and constraints,
-    # move origin to geometry,
-    # and scale each cloned graft on local y axis by a factor of 1.001 to avoid issues with co-planar faces in boolean.
-    for graft_clone in graft_clones:
-        # apply modifiers and constraints
-        for graft_clone_modifier in graft_clone.modifiers:
-            bpy.context.view_layer.objects.active = graft_clone
-            bpy.ops.object.modifier_apply(modifier=graft_clone_modifier.name, single_user=True)
-        for graft_clone_constraint in graft_clone.constraints:
-            bpy.context.view_layer.objects.active = graft_clone
-            bpy.ops.constraint.apply(constraint=graft_clone_constraint.name)
-        # origin to geometry.
-        graft_clone.select_set(True)
-        bpy.ops.object.origin_set(type="ORIGIN_GEOMETRY", center="MEDIAN")
-        graft_clone.select_set(False)
-        # scale cloned graft on local y by a factor of 1.001
-        graft_clone.scale.y = graft_clone.scale.y * 1.001
-
-    # add a boole union on the cloned mandible object for each graft
-    for graft_clone in graft_clones:
-        modifier_boolean = mandible_clone.modifiers.new(
-            name="boolean",
-            type="BOOLEAN"
-        )
-        modifier_boolean.operation = "UNION"
-        modifier_boolean.object = graft_clone
-        modifier_boolean.solver = "EXACT"
+def snapshot_fibula_guide(context):
+    return snapshot_object(context, object_registry.get_object(constants.ROLE_FIBULA_GUIDE))
+
+def snapshot_mandible_guide(context):
+    return snapshot_object(context, object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_JOINED))
+
+def snapshot_mandible_positioning_aid(context):
+    return snapshot_object(context, object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH))
+
+def get_registered_objects(roles):
+    objects = list()
+    for role in roles:
+        obj = object_registry.get_object(role)
+        if obj is not None:
+            objects.append(obj)
+    return objects
+
+def get_reconstructed_mandible_objects():
+    objects = get_registered_objects([constants.ROLE_MANDIBLE_RESECTED, constants.ROLE_ARMATURE])
+    objects.extend(object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT).values())
+    return objects
+
+def get_export_jobs(context):
+    # (file name, snapshot function, objects the artefact is built from) of the enabled artefacts
+    properties = context.scene.FFFGenPropertyGroup
+    jobs = []
+    if properties.export_toggle_fibula_guide:
+        jobs.append(("fibula_guide", snapshot_fibula_guide, get_registered_objects([constants.ROLE_FIBULA_GUIDE])))
+    if properties.export_toggle_mandible_guide:
+        jobs.append(("mandible_guide", snapshot_mandible_guide, get_registered_objects([constants.ROLE_MANDIBLE_GUIDE_JOINED])))
+    if properties.export_toggle_mandible_aid:
+        jobs.append(("positioning_aid", snapshot_mandible_positioning_aid, get_registered_objects([constants.ROLE_POSITIONING_AID_MESH])))
+    if properties.export_toggle_reconstructed_mandible:
+        jobs.append(("reconstructed_mandible", snapshot_reconstructed_mandible, get_reconstructed_mandible_objects()))
+    return jobs
 
-    # export the cloned mandible object with modifiers applied
-    export_mesh_stl(context, mandible_clone, full_file_path)
+def get_export_dir(context):
+    dir_path = context.scene.FFFGenPropertyGroup.export_dir_path
+    if (dir_path.startswith("//")):
+        dir_path = bpy.path.abspath(dir_path)
+    return dir_path
 
-    # delete all cloned objects as they are no longer required.
-    mandible_clone.select_set(True)
-    for graft_clone in graft_clones:
-        graft_clone.select_set(True)
-    bpy.ops.object.delete()
-    return
+def get_stl_abspath(context, filename):
+    return os.path.join(get_export_dir(context), filename + ".stl")
+
+def snapshot_reconstructed_mandible(context):
+    # built in world space and cached while the plan does not change, see reconstructed_mandible.py
+    triangles = reconstructed_mandible.build_reconstructed_mandible(context)
+    if triangles is None:
+        return None
+    return stl_writer.transform_triangles(
+        triangles,
+        stl_writer.get_export_matrix(context.scene.FFFGenPropertyGroup.export_scale_factor)
+    )
+
+# stale files found when the export dialog is opened, the inputs are hashed once instead of on every redraw
+# list of (file path, reason)
+dialog_state = {
+    "stale": list()
+}
+
+# events still passed to the viewport while exporting, navigation only changes the view, not the objects
+NAVIGATION_EVENTS = {
+    "MOUSEMOVE", "INBETWEEN_MOUSEMOVE", "MIDDLEMOUSE", "WHEELUPMOUSE", "WHEELDOWNMOUSE",
+    "TRACKPADPAN", "TRACKPADZOOM", "NDOF_MOTION"
+}
 
 class ExportGuides(bpy.types.Operator):
     bl_idname = "fff_gen.export_guides"
     bl_label = "Export FFF Gen objects"
     bl_description = "Exports the enabled fff gen objects (guides and positioning aids)"
-    bl_options = {'REGISTER', 'UNDO'}
-
-    def get_stl_abspath(self, context, filename):
-        properties = context.scene.FFFGenPropertyGroup
-        dir_path = properties.export_dir_path
-        if (dir_path.startswith("//")):
-            dir_path = bpy.path.abspath(dir_path)
-        path = os.path.join(dir_path, filename + ".stl")
-        return path
-
-    def find_path_check_exists(self, context, file):
-        full_file_path = self.get_stl_abspath(context, file)
-        exists = os.path.exists(full_file_path)
-        return (full_file_path, exists)
+    bl_options = {'REGISTER'}
 
     def draw(self, context):
         layout = self.layout
-        warn_paths = []
-        properties = context.scene.FFFGenPropertyGroup
-        
-        if properties.export_toggle_fibula_guide:
-            fibula_path_exists = self.find_path_check_exists(context, "fibula_guide")
-            if fibula_path_exists[1]:
-                warn_paths.append(fibula_path_exists[0])
-        
-        if properties.export_toggle_mandible_guide:
-            mandible_path_exists = self.find_path_check_exists(context, "mandible_guide")
-            if mandible_path_exists[1]:
-                warn_paths.append(mandible_path_exists[0])
-        
-        if properties.export_toggle_mandible_aid:
-            positioning_path_exists = self.find_path_check_exists(context, "positioning_aid")
-            if positioning_path_exists[1]:
-                warn_paths.append(positioning_path_exists[0])
-
-        if properties.export_toggle_reconstructed_mandible:
-            reconstructed_path_exists = self.find_path_check_exists(context, "reconstructed_mandible")
-            if reconstructed_path_exists[1]:
-                warn_paths.append(reconstructed_path_exists[0])
-        
-        if len(warn_paths) > 0:
-            layout.label(text="The following files exist.", icon="ERROR")
-            for path in warn_paths:
-                layout.label(text=path)
-            layout.label(text="They will be overwritten.", icon="ERROR")
-        
+        stale = dialog_state["stale"]
+        if len(stale) > 0:
+            layout.label(text="The following files are stale.", icon="ERROR")
+            for path, reason in stale:
+                layout.label(text=path + " - " + reason)
+            layout.label(text="They will be written, existing files are overwritten.", icon="ERROR")
+        else:
+            layout.label(text="No changes since the last export.")
+        layout.label(text="Files with unchanged content are skipped.")
         return
 
     def execute(self, context):
         properties = context.scene.FFFGenPropertyGroup
-        if properties.export_toggle_fibula_guide:
-            export_path = self.get_stl_abspath(context, "fibula_guide")
-            export_fibula_guide(context, export_path)
-        if properties.export_toggle_mandible_guide:
-            export_path = self.get_stl_abspath(context, "mandible_guide")
-            export_mandible_guide(context, export_path)
-        if properties.export_toggle_mandible_aid:
-            export_path = self.get_stl_abspath(context, "positioning_aid")
-            export_mandible_positioning_aid(context, export_path)
-        if properties.export_toggle_reconstructed_mandible:
-            export_path = self.get_stl_abspath(context, "reconstructed_mandible")
-            export_reconstructed_mandible(context, export_path)
+        # export is always done in the export quality, the previous profile is restored afterwards
+        self.quality_profile_old = properties.quality_profile
+        # the inputs are hashed in the current profile, same as in the export dialog
+        self.jobs = [
+            (name, get_stl_abspath(context, name), snapshot, export_inputs.get_inputs_hash(context.scene, objects))
+            for name, snapshot, objects in get_export_jobs(context)
+        ]
+        properties.quality_profile = "EXPORT"
+        # bone crops may still wait for their refresh timer
+        bone_roi.refresh_roi_crops()
+        self.dir_path = get_export_dir(context)
+        self.manifest = export_manifest.load_manifest(self.dir_path)
+        self.parameters = export_manifest.get_export_parameters(properties.export_scale_factor)
+
+        if context.window is None:
+            # no event loop when running in the background, export directly
+            try:
+                self.export_objects(context)
+            finally:
+                properties.quality_profile = self.quality_profile_old
+            return {"FINISHED"}
+
+        self.job_index = 0
+        self.states = {name: "waiting" for name, path, snapshot, inputs_hash in self.jobs}
+        self.futures = dict()
+        self.entries = dict()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, len(self.jobs)),
+            thread_name_prefix="fff_gen_export"
+        )
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(0.05, window=context.window)
+        window_manager.progress_begin(0, max(1, len(self.jobs)))
+        window_manager.modal_handler_add(self)
+        self.report_progress(context)
+        return {"RUNNING_MODAL"}
+
+    def snapshot_job(self, context, job):
+        # returns the state of the artefact and the triangles to write
+        # skipped - the artefact does not exist, unchanged - same content and parameters as the exported file.
+        # the artefact is always evaluated, the content hash alone decides what is written
+        # (the inputs hash only tells the export dialog which files are stale)
+        name, path, snapshot, inputs_hash = job
+        triangles = snapshot(context)
+        if triangles is None:
+            return "skipped", None
+        content_hash = export_manifest.get_content_hash(triangles)
+        if export_manifest.is_up_to_date(self.manifest, name, path, content_hash, self.parameters):
+            # only the inputs hash is refreshed
+            export_manifest.set_entry(self.manifest, name, content_hash, inputs_hash, self.parameters)
+            return "unchanged", None
+        # the old entry must not outlive the file it describes if the write fails or is cancelled
+        export_manifest.remove_entry(self.manifest, name)
+        export_manifest.save_manifest(self.dir_path, self.manifest)
+        self.entries[name] = content_hash
+        return "writing", triangles
+
+    def export_objects(self, context):
+        self.entries = dict()
+        for job in self.jobs:
+            name, path, snapshot, inputs_hash = job
+            state, triangles = self.snapshot_job(context, job)
+            if state == "writing":
+                stl_writer.write_stl(path, triangles)
+                export_manifest.set_entry(self.manifest, name, self.entries[name], inputs_hash, self.parameters)
+        export_manifest.save_manifest(self.dir_path, self.manifest)
+
+    def modal(self, context, event):
+        if event.type == "ESC" and event.value == "PRESS":
+            self.finish(context, cancel=True)
+            self.report({"WARNING"}, "Export cancelled")
+            return {"CANCELLED"}
+        if event.type != "TIMER":
+            # the export profile stays active until the export finishes, every edit would evaluate exact booleans and bevels.
+            # so only view navigation gets through, any other interaction is blocked while exporting
+            if event.type in NAVIGATION_EVENTS:
+                return {"PASS_THROUGH"}
+            return {"RUNNING_MODAL"}
+
+        if self.job_index < len(self.jobs):
+            # one snapshot per timer event, so progress is shown and escape is handled in between
+            job = self.jobs[self.job_index]
+            name, path, snapshot, inputs_hash = job
+            self.job_index += 1
+            try:
+                self.states[name], triangles = self.snapshot_job(context, job)
+            except Exception as exception:
+                # same cleanup as a cancel, files already being written are still completed
+                self.finish(context, cancel=True)
+                self.report({"ERROR"}, "Export of " + name + " failed: " + str(exception))
+                return {"CANCELLED"}
+            if triangles is not None:
+                self.futures[name] = self.executor.submit(stl_writer.write_stl, path, triangles)
+            self.report_progress(context)
+            return {"RUNNING_MODAL"}
+
+        for name, future in self.futures.items():
+            if future.done() and self.states[name] == "writing":
+                self.states[name] = "failed" if future.exception() is not None else "done"
+        self.report_progress(context)
+        if "writing" in self.states.values():
+            return {"RUNNING_MODAL"}
+
+        self.finish(context, cancel=False)
+        for name, future in self.futures.items():
+            if future.exception() is not None:
+                self.report({"ERROR"}, "Export of " + name + " failed: " + str(future.exception()))
         return {"FINISHED"}
 
+    def report_progress(self, context):
+        finished = [state for state in self.states.values() if state in ["done", "unchanged", "skipped", "failed"]]
+        context.window_manager.progress_update(len(finished))
+        text = ", ".join(name + ": " + state for name, state in self.states.items())
+        context.workspace.status_text_set("Exporting (ESC to cancel) - " + text)
+
+    def finish(self, context, cancel):
+        window_manager = context.window_manager
+        window_manager.event_timer_remove(self.timer)
+        window_manager.progress_end()
+        context.workspace.status_text_set(None)
+        # files which are already being written are completed, waiting ones are dropped on cancel
+        self.executor.shutdown(wait=not cancel, cancel_futures=cancel)
+        # only files which were written completely go into the manifest
+        for name, path, snapshot, inputs_hash in self.jobs:
+            future = self.futures.get(name)
+            if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+                export_manifest.set_entry(self.manifest, name, self.entries[name], inputs_hash, self.parameters)
+        export_manifest.save_manifest(self.dir_path, self.manifest)
+        context.scene.FFFGenPropertyGroup.quality_profile = self.quality_profile_old
+
     def invoke(self, context, event):
+        manifest = export_manifest.load_manifest(get_export_dir(context))
+        parameters = export_manifest.get_export_parameters(context.scene.FFFGenPropertyGroup.export_scale_factor)
+        stale = list()
+        for name, snapshot, objects in get_export_jobs(context):
+            path = get_stl_abspath(context, name)
+            inputs_hash = export_inputs.get_inputs_hash(context.scene, objects)
+            reason = export_manifest.get_stale_reason(manifest, name, path, inputs_hash, parameters)
+            if reason is not None:
+                stale.append((path, reason))
+        dialog_state["stale"] = stale
         return context.window_manager.invoke_props_dialog(self)
@@ -0,0 +1,146 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+import hashlib
+import numpy
+
+
+# hash of everything an exported artefact is built from, stored in the export manifest (see export_manifest.py).
+# only stable data is hashed (names, counts, coordinates, settings), so the hash holds across sessions.
+# it tells the export dialog which files are stale, whether a file is written is still decided by its content hash.
+
+# modifier and constraint property types included in the inputs hash
+VALUE_PROPERTY_TYPES = {"BOOLEAN", "INT", "FLOAT", "ENUM", "STRING"}
+# node properties which only change the node editor, not the result
+NODE_LAYOUT_PROPERTIES = {"location", "width", "height", "dimensions", "select", "show_options", "show_preview", "hide"}
+
+
+def get_value_key(value):
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, bpy.types.ID):
+        return value.name
+    try:
+        return tuple(get_value_key(item) for item in value)
+    except TypeError:
+        return repr(value)
+
+
+def get_struct_state(struct, objects_pending):
+    # settings of a modifier or constraint, referenced objects are queued to be included as well
+    state = [struct.name, struct.type]
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in ["rna_type", "name"]:
+            continue
+        value = getattr(struct, prop.identifier, None)
+        if isinstance(value, bpy.types.Object):
+            objects_pending.append(value)
+            state.append((prop.identifier, value.name))
+        elif isinstance(value, bpy.types.Collection):
+            objects_pending.extend(value.all_objects)
+            state.append((prop.identifier, value.name))
+        elif isinstance(value, bpy.types.NodeTree):
+            state.append((prop.identifier, get_node_tree_state(value, objects_pending)))
+        elif prop.type in VALUE_PROPERTY_TYPES and prop.identifier not in NODE_LAYOUT_PROPERTIES:
+            state.append((prop.identifier, get_value_key(value)))
+    # inputs of geometry nodes modifiers are id properties of the modifier
+    try:
+        keys = struct.keys()
+    except TypeError:
+        keys = list()
+    for key in keys:
+        value = struct[key]
+        if isinstance(value, bpy.types.Object):
+            objects_pending.append(value)
+        state.append((key, get_value_key(value)))
+    return state
+
+
+def get_node_tree_state(node_tree, objects_pending):
+    # nodes with their settings and unlinked input values, and the links between them.
+    # node groups used inside are included through the node_tree property of their group nodes
+    state = [node_tree.name]
+    for node in node_tree.nodes:
+        node_state = get_struct_state(node, objects_pending)
+        for socket in node.inputs:
+            node_state.append((socket.identifier, get_value_key(getattr(socket, "default_value", None))))
+        state.append(node_state)
+    for link in node_tree.links:
+        state.append((link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier))
+    return state
+
+
+def get_mesh_state(mesh):
+    co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", co)
+    return (mesh.name, len(mesh.vertices), len(mesh.polygons), hashlib.sha256(co.tobytes()).hexdigest())
+
+
+def get_curve_state(curve):
+    # control points and handles of all splines (eg. the positioning aid curve)
+    state = [curve.name]
+    for spline in curve.splines:
+        points_hash = hashlib.sha256()
+        for attribute in ["co", "handle_left", "handle_right"]:
+            values = numpy.empty(len(spline.bezier_points) * 3, dtype=numpy.float32)
+            spline.bezier_points.foreach_get(attribute, values)
+            points_hash.update(values.tobytes())
+        co = numpy.empty(len(spline.points) * 4, dtype=numpy.float32)
+        spline.points.foreach_get("co", co)
+        points_hash.update(co.tobytes())
+        state.append((spline.type, spline.use_cyclic_u, points_hash.hexdigest()))
+    return state
+
+
+def get_scene_state(scene):
+    # scene settings the artefacts depend on besides their objects.
+    # the quality profile is included as it changes the modifiers and the bone meshes
+    properties = scene.FFFGenPropertyGroup
+    return [properties.quality_profile, properties.segment_cut_method]
+
+
+def get_inputs_hash(scene, objects):
+    # hash of the transforms, meshes, modifiers and constraints of the objects and everything they reference
+    state = [repr(get_scene_state(scene))]
+    objects_pending = list(objects)
+    objects_done = set()
+    while len(objects_pending):
+        obj = objects_pending.pop()
+        if obj in objects_done:
+            continue
+        objects_done.add(obj)
+        obj_state = [obj.name, tuple(tuple(row) for row in obj.matrix_world)]
+        if obj.type == "MESH":
+            obj_state.append(get_mesh_state(obj.data))
+        if obj.type == "CURVE":
+            obj_state.append(get_curve_state(obj.data))
+        if obj.type == "ARMATURE" and obj.pose is not None:
+            obj_state.append(tuple((bone.name, tuple(tuple(row) for row in bone.matrix)) for bone in obj.pose.bones))
+        for modifier in obj.modifiers:
+            obj_state.append(get_struct_state(modifier, objects_pending))
+        for constraint in obj.constraints:
+            obj_state.append(get_struct_state(constraint, objects_pending))
+        if obj.parent is not None:
+            objects_pending.append(obj.parent)
+        state.append(repr(obj_state))
+    state.sort()
+    return hashlib.sha256("\n".join(state).encode()).hexdigest()
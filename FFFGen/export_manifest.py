@@ -0,0 +1,105 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import hashlib
+import json
+import numpy
+import os
+
+
+# the manifest is stored beside the exported files and records, per file name:
+# hash - content hash of the exported triangles (after the export matrix, in the precision written to the file)
+# inputs - hash of the state of the objects the artefact is built from, see export_inputs.py
+# parameters - export parameters the file was written with
+# the inputs hash is only used to list the stale files in the export dialog.
+# every artefact is evaluated on export and only written if its content hash or parameters differ from the manifest
+# or the file is missing.
+# the entry of a file is dropped before the file is written and recorded again once the write completed,
+# so an entry never describes a file that was not written completely.
+
+MANIFEST_NAME = "fffgen_export_manifest.json"
+
+# axes used by the stl writer, see stl_writer.get_export_matrix
+FORWARD_AXIS = "Y"
+UP_AXIS = "Z"
+
+
+def load_manifest(dir_path):
+    # an unreadable manifest is treated as empty, all files are written again
+    try:
+        with open(os.path.join(dir_path, MANIFEST_NAME), "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return dict()
+    if not isinstance(manifest, dict):
+        return dict()
+    return manifest
+
+
+def save_manifest(dir_path, manifest):
+    with open(os.path.join(dir_path, MANIFEST_NAME), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def get_export_parameters(scale_factor):
+    return {
+        "scale_factor": scale_factor,
+        "forward_axis": FORWARD_AXIS,
+        "up_axis": UP_AXIS
+    }
+
+
+def get_content_hash(triangles):
+    data = numpy.ascontiguousarray(triangles, dtype=numpy.float32)
+    return hashlib.sha256(data.tobytes()).hexdigest()
+
+
+def is_up_to_date(manifest, file_name, file_path, content_hash, parameters):
+    entry = manifest.get(file_name)
+    if not isinstance(entry, dict) or not os.path.exists(file_path):
+        return False
+    return entry.get("hash") == content_hash and entry.get("parameters") == parameters
+
+
+def get_stale_reason(manifest, file_name, file_path, inputs_hash, parameters):
+    # None if the inputs and parameters of the file did not change, otherwise why it has to be evaluated
+    entry = manifest.get(file_name)
+    if not os.path.exists(file_path):
+        return "not exported yet"
+    if not isinstance(entry, dict):
+        return "not in the export manifest"
+    if entry.get("parameters") != parameters:
+        return "export parameters changed"
+    if entry.get("inputs") != inputs_hash:
+        return "changed since the last export"
+    return None
+
+
+def remove_entry(manifest, file_name):
+    manifest.pop(file_name, None)
+
+
+def set_entry(manifest, file_name, content_hash, inputs_hash, parameters):
+    manifest[file_name] = {
+        "hash": content_hash,
+        "inputs": inputs_hash,
+        "parameters": parameters
+    }
@@ -21,86 +21,160 @@
 
 import bpy
 import os
+from . import constants
 
 
-def load_guide_cube():
+# template objects are loaded from the .blend files next to this file only once,
+# into a collection which is not linked to the scene. the loaders hand out copies of the templates,
+# so repeated guide and screw creation does no file i/o.
+# the collection has a fake user, so the templates are saved with every case file. this is intended:
+# the armature bones use the bone shape template directly, so it has to be saved anyway, the templates are a few small meshes,
+# and a reopened case does not load the files again.
+
+# custom property holding the name of the template in its file, the object name might get a suffix
+PROP_TEMPLATE = "fffgen_template"
+
+# file name : names of the template objects in the file
+TEMPLATE_FILES = {
+    "guide_cube.blend": ["guide_cube"],
+    "cutting_plane.blend": ["cutting_plane_start", "cutting_plane_end"],
+    "armature_bone_shape.blend": ["armature_bone_shape"],
+    "boolean_cube.blend": ["boolean_cube"],
+    "screw_hole.blend": ["screw_hole_mandible", "screw_hole_fibula"]
+}
+
+# file name : names of the node groups in the file
+NODE_GROUP_FILES = {
+    "geonodes_world_space_bevel.blend": ["geonode_object_to_world", "geonode_world_to_object"]
+}
+
+
+def get_file_path(file_name):
     directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "guide_cube.blend")
-    with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-        data_to.objects = [name for name in data_from.objects if name == "guide_cube"]
-    obj_guide_cube = data_to.objects[0]
-    bpy.context.scene.collection.objects.link(obj_guide_cube)
-    return obj_guide_cube
+    return os.path.join(directory, file_name)
+
+
+def get_templates_collection():
+    collection = bpy.data.collections.get(constants.COLLECTION_TEMPLATES)
+    if collection is None:
+        collection = bpy.data.collections.new(constants.COLLECTION_TEMPLATES)
+        collection.use_fake_user = True
+    return collection
+
+
+def get_loaded_templates():
+    templates = dict()
+    collection = bpy.data.collections.get(constants.COLLECTION_TEMPLATES)
+    if collection is not None:
+        for obj in collection.objects:
+            if PROP_TEMPLATE in obj.keys():
+                templates[obj[PROP_TEMPLATE]] = obj
+    return templates
+
+
+def load_templates():
+    # loads all templates which are not loaded yet, one library load per file
+    collection = get_templates_collection()
+    templates = get_loaded_templates()
+    for file_name, template_names in TEMPLATE_FILES.items():
+        names_missing = [name for name in template_names if name not in templates]
+        if not len(names_missing):
+            continue
+        with bpy.data.libraries.load(get_file_path(file_name), link=False) as (data_from, data_to):
+            data_to.objects = [name for name in data_from.objects if name in names_missing]
+            names = list(data_to.objects)
+        for name, obj in zip(names, data_to.objects):
+            if obj is not None:
+                obj[PROP_TEMPLATE] = name
+                collection.objects.link(obj)
+                templates[name] = obj
+    return templates
+
+
+def get_template(template_name):
+    # the template object itself, for callers which only read it. it must not be modified or linked to the scene
+    obj = get_loaded_templates().get(template_name)
+    if obj is None:
+        obj = load_templates()[template_name]
+    return obj
+
+
+def copy_template_object(template):
+    # a new object with its own copy of the template mesh, linked to the scene collection.
+    # the template property is removed, so the copy is not taken for a template
+    obj = template.copy()
+    if template.data is not None:
+        obj.data = template.data.copy()
+    if PROP_TEMPLATE in obj.keys():
+        del obj[PROP_TEMPLATE]
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+def copy_template(template_name):
+    return copy_template_object(get_template(template_name))
+
+
+def get_node_group(node_group_name):
+    # node groups are appended into the file directly, all missing groups of a file are loaded at once
+    node_group = bpy.data.node_groups.get(node_group_name)
+    if node_group is not None:
+        return node_group
+    for file_name, node_group_names in NODE_GROUP_FILES.items():
+        if node_group_name not in node_group_names:
+            continue
+        names_missing = [name for name in node_group_names if name not in bpy.data.node_groups.keys()]
+        with bpy.data.libraries.load(get_file_path(file_name), link=False) as (data_from, data_to):
+            data_to.node_groups = [name for name in data_from.node_groups if name in names_missing]
+            names = list(data_to.node_groups)
+        for name, loaded in zip(names, data_to.node_groups):
+            if name == node_group_name:
+                node_group = loaded
+    return node_group
+
+
+def load_guide_cube():
+    return copy_template("guide_cube")
 
 
 def load_cutting_planes():
-    cutting_plane_start = None
-    cutting_plane_end = None
-    directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "cutting_plane.blend")
-    with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-        data_to.objects = [name for name in data_from.objects if name.startswith("cutting_plane")]
-    for obj in data_to.objects:
-        if obj is not None:
-            bpy.context.scene.collection.objects.link(obj)
-            if obj.name == "cutting_plane_start":
-                cutting_plane_start = obj
-            if obj.name == "cutting_plane_end":
-                cutting_plane_end = obj
-    return [cutting_plane_start, cutting_plane_end]
+    # templates, the cutting planes are created as copies of these (see cutting_planes.setup_cutting_planes)
+    return [get_template("cutting_plane_start"), get_template("cutting_plane_end")]
 
 
 def load_armature_bone_shape():
-    directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "armature_bone_shape.blend")
-    with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-        data_to.objects = [name for name in data_from.objects if name == "armature_bone_shape"]
-    obj_bone_shape = data_to.objects[0]
-    bpy.context.scene.collection.objects.link(obj_bone_shape)
-    return obj_bone_shape
+    # template, only used as the custom shape of the armature bones
+    return get_template("armature_bone_shape")
 
 
 def load_boolean_cube():
-    # load cube with predefined vertex groups for use with boolean operation and armature parenting
-    directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "boolean_cube.blend")
-    with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-        data_to.objects = [name for name in data_from.objects if name == "boolean_cube"]
-    obj_boolean_cube = data_to.objects[0]
-    bpy.context.scene.collection.objects.link(obj_boolean_cube)
-    return obj_boolean_cube
+    # template cube with predefined vertex groups for use with boolean operation and armature parenting
+    # the boolean cubes are created as copies of it
+    return get_template("boolean_cube")
 
 
 def load_positioning_aid_objects():
     # loads the objects needed to construct the positioning aid
     # they are stored in the file with correct names...
-    directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "positioning_aid.blend")
+    # not cached as templates - the objects reference each other (curve, handles, hooks and constraints),
+    # copies of templates would still reference the templates, while a fresh load keeps the references between the new objects.
+    # it is loaded once per positioning aid, so this is not a hot path.
+    file_path = get_file_path("positioning_aid.blend")
 
+    # returns the loaded objects by their name in the file, the names in the scene might get a suffix
     with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
         data_to.objects = [name for name in data_from.objects]
+        names = list(data_to.objects)
 
-    for obj in data_to.objects:
+    objects_loaded = dict()
+    for name, obj in zip(names, data_to.objects):
         if obj is not None:
             bpy.context.scene.collection.objects.link(obj)
+            objects_loaded[name] = obj
+    return objects_loaded
 
 def load_screw_hole_mandible():
-    # loads the screw hole object.
-    directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "screw_hole.blend")
-    with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-        data_to.objects = [name for name in data_from.objects if name == "screw_hole_mandible"]
-    obj_screw_hole = data_to.objects[0]
-    bpy.context.scene.collection.objects.link(obj_screw_hole)
-    return obj_screw_hole
+    return copy_template("screw_hole_mandible")
 
 def load_screw_hole_fibula():
-    # loads the screw hole object.
-    directory = os.path.dirname(os.path.realpath(__file__))
-    file_path = os.path.join(directory, "screw_hole.blend")
-    with bpy.data.libraries.load(file_path, link=False) as (data_from, data_to):
-        data_to.objects = [name for name in data_from.objects if name == "screw_hole_fibula"]
-    obj_screw_hole = data_to.objects[0]
-    bpy.context.scene.collection.objects.link(obj_screw_hole)
-    return obj_screw_hole
-
+    return copy_template("screw_hole_fibula")
@@ -20,11 +20,16 @@
 
 
 import bpy
+import numpy
 from .move_object_to_collection import move_object_to_collection
 from .external_loading import load_guide_cube, load_screw_hole_fibula
 from .bevel_worldspace import create_bevel_modifier
+from .bone_roi import create_roi_crop
+from .half_space_clipping import get_mesh_arrays, set_mesh_arrays
+from .quality_profile import apply_quality_profile
 from . import constants
 from . import materials
+from . import object_registry
 import os
 import math
 
@@ -35,6 +40,16 @@ class CreateFibulaGuide(bpy.types.Operator):
     bl_description = "Creates the fibula guide, adds all necessary objects, modifiers and constraints"
 
     def invoke(self, context, event):
+        create_fibula_guide(context)
+        return {"FINISHED"}
+
+
+def create_fibula_guide(context):
+    # guides are created against the full resolution bone
+    properties = context.scene.FFFGenPropertyGroup
+    quality_profile_old = properties.quality_profile
+    properties.quality_profile = "EXPORT"
+    try:
         obj_fibula = bpy.context.scene.FFFGenPropertyGroup.fibula_object
         objects_cutting_planes = bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_FIBULA].objects
 
@@ -45,6 +60,14 @@ class CreateFibulaGuide(bpy.types.Operator):
         obj_boolean_difference_limit = create_boj_boolean_difference_limit(obj_fibula_guide)
 
         setup_fibula_guide_modifiers(obj_fibula_guide, obj_boolean_union, obj_boolean_difference, obj_boolean_union_limit, obj_boolean_difference_limit, obj_fibula)
+        # subtract only the part of the fibula around the guide, the union geometry is limited by the union limit object
+        obj_roi = create_roi_crop(
+            obj_fibula,
+            [obj_fibula_guide, obj_boolean_union_limit],
+            "roi_fibula_guide",
+            constants.COLLECTION_GUIDE_FIBULA
+        )
+        obj_fibula_guide.modifiers["boolean_difference_fibula"].object = obj_roi
         obj_boolean_union.hide_set(True)
         obj_boolean_difference.hide_set(True)
         #set material
@@ -52,15 +75,18 @@ class CreateFibulaGuide(bpy.types.Operator):
             obj_fibula_guide.data.materials[0] = materials.get_guide()
         else:
             obj_fibula_guide.data.materials.append(materials.get_guide())
-        
+    
         bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_FIBULA].hide_viewport = True
-
-        return {"FINISHED"}
+    finally:
+        # only switched for the creation, the session keeps the profile the user picked
+        properties.quality_profile = quality_profile_old
+    apply_quality_profile(context.scene)
 
 
 def create_obj_fibula_guide():
     obj_fibula_guide = load_guide_cube()
     obj_fibula_guide.name = "fibula_guide"
+    object_registry.register_object(constants.ROLE_FIBULA_GUIDE, obj_fibula_guide)
     move_object_to_collection(
         obj_to_move=obj_fibula_guide,
         collection_name="guide_fibula",
@@ -70,61 +96,39 @@ def create_obj_fibula_guide():
     return obj_fibula_guide
 
 
+def create_slab_mesh(mesh_name, objects_cutting_planes, scale, scale_about_center):
+    # merge scaled copies of all cutting planes (slabs) into one mesh, in world space.
+    # the slabs overlap, they are not joined here. the boolean using this mesh has self intersection enabled,
+    # which treats the overlapping slabs as their union, so one boolean replaces a chain of unions.
+    # scale_about_center - scale around the center of the plane geometry instead of the plane origin
+    co_all = list()
+    tris_all = list()
+    vertex_count = 0
+    for obj_cutting_plane in objects_cutting_planes:
+        co, tris = get_mesh_arrays(obj_cutting_plane.data)
+        center = co.mean(axis=0) if scale_about_center else numpy.zeros(3)
+        co = center + (co - center) * numpy.array(scale)
+        matrix = numpy.array(obj_cutting_plane.matrix_world)
+        co = co @ matrix[:3, :3].T + matrix[:3, 3]
+        co_all.append(co)
+        tris_all.append(tris + vertex_count)
+        vertex_count = vertex_count + len(co)
+
+    mesh = bpy.data.meshes.new(mesh_name)
+    if co_all:
+        set_mesh_arrays(mesh, numpy.concatenate(co_all), numpy.concatenate(tris_all))
+    return mesh
+
+
 def create_obj_boolean_union(objects_cutting_planes):
     geom_width = bpy.context.scene.FFFGenPropertyGroup.guide_around_width
     cutting_plane_width = bpy.context.scene.FFFGenPropertyGroup.cutting_plane_thickness
     scale_factor_y = geom_width/cutting_plane_width
 
-    # using list here for easier referencing during iteration
-    # create objects that are used for generating fibula gude geometry from exsiting cutting planes
-    objects_planes_geometry = list()
-
-    for index, obj_cutting_plane in enumerate(objects_cutting_planes):
-        print("insade enumerate cutting planes")
-        # duplicate the cutting plane and set origin to geometry so it scales properly
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        obj_cutting_plane.select_set(True)
-        bpy.ops.object.duplicate()
-        obj_plane_geom = bpy.context.selected_objects[0]
-        obj_cutting_plane.select_set(False)
-        bpy.ops.object.origin_set(
-            type="ORIGIN_GEOMETRY"
-        )
-        # TODO: this 4.0 is a value that I found appropriate during testing. People might want to change this...
-        # HACK - add 0.01 each time it is scaled to avoid boolean issues if the objects are rotated only on Z axis
-        # scale the guides using the given scale factors, push to list...
-        obj_plane_geom.scale = (4.0+(0.01*index), scale_factor_y, 4.0+(0.01*index))
-        objects_planes_geometry.append(obj_plane_geom)
-
-    # join all planes for fibula guide geometry
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    obj_boolean_union = objects_planes_geometry[0]
-    obj_boolean_union.select_set(True)
-    bpy.context.view_layer.objects.active = obj_boolean_union
-    for i in range(1, len(objects_planes_geometry)):
-        print("inside joining modifiers")
-        modifier_boolean = obj_boolean_union.modifiers.new(
-            name="boolean",
-            type="BOOLEAN"
-        )
-        modifier_boolean.operation = "UNION"
-        modifier_boolean.object = objects_planes_geometry[i]
-        bpy.ops.object.modifier_apply(
-            modifier=modifier_boolean.name
-        )
-
-    # delete unused objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    for i in range(1, len(objects_planes_geometry)):
-        print("deleting unused")
-        objects_planes_geometry[i].select_set(True)
-        bpy.ops.object.delete()
-    
-    # set sensible name and move to proper collection
-    obj_boolean_union.name = "fibula_guide_union"
+    # create the geometry used for generating fibula guide geometry from existing cutting planes
+    # TODO: this 4.0 is a value that I found appropriate during testing. People might want to change this...
+    mesh = create_slab_mesh("fibula_guide_union", objects_cutting_planes, (4.0, scale_factor_y, 4.0), True)
+    obj_boolean_union = bpy.data.objects.new("fibula_guide_union", mesh)
     move_object_to_collection(
         obj_to_move=obj_boolean_union,
         collection_name=constants.COLLECTION_GUIDE_FIBULA,
@@ -135,45 +139,9 @@ def create_obj_boolean_union(objects_cutting_planes):
 
 
 def create_obj_boolean_difference(objects_cutting_planes):
-    objects_planes_difference = list()
-
-    for index, obj_cutting_plane in enumerate(objects_cutting_planes):
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        obj_cutting_plane.select_set(True)
-        bpy.ops.object.duplicate()
-        plane_diff = bpy.context.selected_objects[0]
-        obj_cutting_plane.select_set(False)
-        # TODO: 4.0, same as above
-        # HACK - add 0.01 each time it is scaled to avoid boolean issues if the objects are rotated only on Z axis
-        plane_diff.scale = (4.0+(0.01*index), 1.0, 4.0+(0.01*index))
-        objects_planes_difference.append(plane_diff)
-
-    # join all planes for difference modifier
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    obj_boolean_difference = objects_planes_difference[0]
-    obj_boolean_difference.select_set(True)
-    bpy.context.view_layer.objects.active = obj_boolean_difference
-    for i in range(1, len(objects_planes_difference)):
-        modifier_union = obj_boolean_difference.modifiers.new(
-            name="boolean_union",
-            type="BOOLEAN"
-        )
-        modifier_union.operation = "UNION"
-        modifier_union.object = objects_planes_difference[i]
-        bpy.ops.object.modifier_apply(
-            modifier=modifier_union.name
-        )
-    
-    # delete unused objects
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    for i in range(1, len(objects_planes_difference)):
-        objects_planes_difference[i].select_set(True)
-    bpy.ops.object.delete()
-    # give proper name and move to proper collection
-    obj_boolean_difference.name = "fibula_guide_difference"
+    # TODO: 4.0, same as above
+    mesh = create_slab_mesh("fibula_guide_difference", objects_cutting_planes, (4.0, 1.0, 4.0), False)
+    obj_boolean_difference = bpy.data.objects.new("fibula_guide_difference", mesh)
     move_object_to_collection(
         obj_to_move=obj_boolean_difference,
         collection_name=constants.COLLECTION_GUIDE_FIBULA,
@@ -264,6 +232,9 @@ def setup_fibula_guide_modifiers(obj_fibula_guide, obj_boolean_union, obj_boolea
     )
     modifier_boolean_intersect.operation = "INTERSECT"
     modifier_boolean_intersect.object = obj_boolean_union_limit
+    # the union object holds overlapping slabs, self intersection merges them
+    modifier_boolean_intersect.solver = "EXACT"
+    modifier_boolean_intersect.use_self = True
     obj_boolean_union.select_set(False)
 
     create_bevel_modifier(obj_boolean_union, "fffgen_bevel_fibula_guide_union", bevel_seg, bevel_width)
@@ -276,6 +247,8 @@ def setup_fibula_guide_modifiers(obj_fibula_guide, obj_boolean_union, obj_boolea
     )
     modifier_boolean_intersect.operation = "INTERSECT"
     modifier_boolean_intersect.object = obj_boolean_difference_limit
+    modifier_boolean_intersect.solver = "EXACT"
+    modifier_boolean_intersect.use_self = True
     obj_boolean_difference.select_set(False)
 
     create_bevel_modifier(obj_fibula_guide, "fffgen_bevel_fibula_guide", bevel_seg, bevel_width)
@@ -311,34 +284,40 @@ class CreateFibulaScrew(bpy.types.Operator):
     bl_description = "Creates a screw for the fibula guide, and adds all neccesary objects, modifiers and constraints"
 
     def invoke(self, context, event):
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        obj_fibula_guide = bpy.data.objects["fibula_guide"]
-
-        obj_screw_hole = create_fibula_screw_cylinder()
-        # apply initial rotation on y axis 
-        bpy.context.view_layer.objects.active = obj_screw_hole
-        bpy.ops.object.transform_apply(
-            location=False,
-            rotation=True,
-            scale=False
-        )
+        create_fibula_screw(context)
+        return {"FINISHED"}
 
-        setup_screw_hole_constraint(obj_screw_hole, obj_fibula_guide)
-        setup_screw_hole_modifiers(obj_screw_hole, obj_fibula_guide)
 
-        # move to proper collection
-        obj_fibula_guide.select_set(False)
-        move_object_to_collection(
-            obj_to_move=obj_screw_hole,
-            collection_name=constants.COLLECTION_GUIDE_FIBULA,
-            remove_from_current=True
-        )
+def create_fibula_screw(context):
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    obj_fibula_guide = object_registry.get_object(constants.ROLE_FIBULA_GUIDE)
 
-        # select screw hole, make it active
-        obj_screw_hole.select_set(True)
-        bpy.context.view_layer.objects.active = obj_screw_hole
-        return {"FINISHED"}
+    obj_screw_hole = create_fibula_screw_cylinder()
+    # apply initial rotation on y axis 
+    bpy.context.view_layer.objects.active = obj_screw_hole
+    bpy.ops.object.transform_apply(
+        location=False,
+        rotation=True,
+        scale=False
+    )
+
+    setup_screw_hole_constraint(obj_screw_hole, obj_fibula_guide)
+    setup_screw_hole_modifiers(obj_screw_hole, obj_fibula_guide)
+
+    # move to proper collection
+    obj_fibula_guide.select_set(False)
+    move_object_to_collection(
+        obj_to_move=obj_screw_hole,
+        collection_name=constants.COLLECTION_GUIDE_FIBULA,
+        remove_from_current=True
+    )
+
+    # select screw hole, make it active
+    obj_screw_hole.select_set(True)
+    bpy.context.view_layer.objects.active = obj_screw_hole
+    apply_quality_profile(context.scene)
+    return obj_screw_hole
 
 
 def create_fibula_screw_cylinder():
@@ -346,6 +325,11 @@ def create_fibula_screw_cylinder():
     obj_screw_hole = load_screw_hole_fibula()
     bpy.context.view_layer.objects.active = obj_screw_hole
     obj_screw_hole.name = "fibula_guide_screw_hole"
+    object_registry.register_object(
+        constants.ROLE_FIBULA_GUIDE_SCREW_HOLE,
+        obj_screw_hole,
+        object_registry.get_next_index(constants.ROLE_FIBULA_GUIDE_SCREW_HOLE)
+    )
     obj_screw_hole.display_type = "WIRE"
     diameter = bpy.context.scene.FFFGenPropertyGroup.screw_hole_diameter
     obj_screw_hole.scale[1] = diameter
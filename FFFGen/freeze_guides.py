@@ -0,0 +1,144 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+from . import bone_roi
+from . import constants
+from . import object_registry
+from . import quality_profile
+
+
+# a finished guide is re-evaluated (booleans, bevels) on every depsgraph update that touches it or its operands.
+# freezing bakes the evaluated guide at export quality into a static mesh and hides its modifiers in the viewport,
+# thawing swaps the live mesh back in and shows the hidden modifiers again.
+# the live mesh and the names of the hidden modifiers are kept in custom properties of the guide.
+
+GUIDE_ROLES = [
+    constants.ROLE_FIBULA_GUIDE,
+    constants.ROLE_MANDIBLE_GUIDE_START,
+    constants.ROLE_MANDIBLE_GUIDE_END,
+    constants.ROLE_MANDIBLE_GUIDE_JOINED,
+    constants.ROLE_POSITIONING_AID_START,
+    constants.ROLE_POSITIONING_AID_END,
+    constants.ROLE_POSITIONING_AID_MESH
+]
+
+
+def is_frozen(obj):
+    return constants.PROP_LIVE_MESH in obj.keys()
+
+
+def get_guides():
+    guides = list()
+    for role in GUIDE_ROLES:
+        obj = object_registry.get_object(role)
+        if obj is not None and obj.type == "MESH":
+            guides.append(obj)
+    return guides
+
+
+def get_frozen_guides():
+    return [obj for obj in get_guides() if is_frozen(obj)]
+
+
+def freeze_object(obj, mesh_frozen):
+    modifier_names = [modifier.name for modifier in obj.modifiers if modifier.show_viewport]
+    obj[constants.PROP_LIVE_MESH] = obj.data
+    obj[constants.PROP_FROZEN_MODIFIERS] = modifier_names
+    for name in modifier_names:
+        obj.modifiers[name].show_viewport = False
+    mesh_frozen.name = obj.name + "_frozen"
+    obj.data = mesh_frozen
+    return
+
+
+def thaw_object(obj):
+    mesh_frozen = obj.data
+    mesh_live = obj[constants.PROP_LIVE_MESH]
+    if mesh_live is not None:
+        obj.data = mesh_live
+    for name in obj.get(constants.PROP_FROZEN_MODIFIERS, []):
+        # modifiers might have been removed while the guide was frozen
+        modifier = obj.modifiers.get(name)
+        if modifier is not None:
+            modifier.show_viewport = True
+    del obj[constants.PROP_LIVE_MESH]
+    if constants.PROP_FROZEN_MODIFIERS in obj.keys():
+        del obj[constants.PROP_FROZEN_MODIFIERS]
+    if mesh_frozen != obj.data and mesh_frozen.users == 0:
+        bpy.data.meshes.remove(mesh_frozen)
+    return
+
+
+def freeze_guides(context):
+    guides = [obj for obj in get_guides() if not is_frozen(obj)]
+    if not len(guides):
+        return 0
+    properties = context.scene.FFFGenPropertyGroup
+    quality_profile_old = properties.quality_profile
+    properties.quality_profile = "EXPORT"
+    try:
+        bone_roi.refresh_roi_crops()
+        depsgraph = context.evaluated_depsgraph_get()
+        # bake all guides before swapping any mesh, the joined guide is evaluated from the start and end guides
+        meshes_frozen = [
+            bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), preserve_all_data_layers=False, depsgraph=depsgraph)
+            for obj in guides
+        ]
+        for obj, mesh_frozen in zip(guides, meshes_frozen):
+            freeze_object(obj, mesh_frozen)
+    finally:
+        # frozen guides are skipped by the quality profile
+        properties.quality_profile = quality_profile_old
+    return len(guides)
+
+
+def thaw_guides(context):
+    guides = get_frozen_guides()
+    for obj in guides:
+        thaw_object(obj)
+    # the shown bevel modifiers and boolean solvers follow the current profile again
+    quality_profile.apply_quality_profile(context.scene)
+    return len(guides)
+
+
+class FreezeGuides(bpy.types.Operator):
+    bl_idname = "fff_gen.freeze_guides"
+    bl_label = "Freeze guides"
+    bl_description = "Bakes the finished guides into static meshes at export quality and disables their modifiers in the viewport"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        count = freeze_guides(context)
+        self.report({"INFO"}, "Froze " + str(count) + " guide objects")
+        return {"FINISHED"}
+
+
+class ThawGuides(bpy.types.Operator):
+    bl_idname = "fff_gen.thaw_guides"
+    bl_label = "Thaw guides"
+    bl_description = "Restores the live modifier stack of the frozen guides for editing"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        count = thaw_guides(context)
+        self.report({"INFO"}, "Thawed " + str(count) + " guide objects")
+        return {"FINISHED"}
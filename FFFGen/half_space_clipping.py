@@ -0,0 +1,344 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import numpy
+
+
+# a fibula segment is the part of the fibula between two cutting planes.
+# the boolean cube used for it is deformed only by the two bones at its ends,
+# so instead of a generic boolean the fibula is clipped against the two half spaces directly.
+# clipping works on a closed triangle mesh, and the cut is closed again with a triangulated cap
+# for each outer cut loop and the holes inside it.
+
+
+def get_mesh_arrays(mesh):
+    # read vertex coordinates and triangles of the mesh in bulk
+    mesh.calc_loop_triangles()
+    co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", co)
+    tris = numpy.empty(len(mesh.loop_triangles) * 3, dtype=numpy.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    return co.reshape(-1, 3).astype(numpy.float64), tris.reshape(-1, 3).astype(numpy.int64)
+
+
+def set_mesh_arrays(mesh, co, tris):
+    # replace the geometry of the mesh with the given triangles, in bulk
+    mesh.clear_geometry()
+    mesh.vertices.add(len(co))
+    mesh.loops.add(len(tris) * 3)
+    mesh.polygons.add(len(tris))
+    mesh.vertices.foreach_set("co", co.astype(numpy.float32).ravel())
+    mesh.loops.foreach_set("vertex_index", tris.astype(numpy.int32).ravel())
+    mesh.polygons.foreach_set("loop_start", numpy.arange(0, len(tris) * 3, 3, dtype=numpy.int32))
+    mesh.update(calc_edges=True)
+
+
+def rotate_first(tris, mask):
+    # rotate each triangle so the vertex marked in mask comes first, the winding is kept
+    first = numpy.argmax(mask, axis=1)
+    order = (first[:, None] + numpy.arange(3)) % 3
+    return numpy.take_along_axis(tris, order, axis=1)
+
+
+def get_cut_loops(cap_edges):
+    # chain the cut edges into loops of vertex indices
+    # an open chain (non manifold input) is closed by the triangulation
+    next_vertex = dict(zip(cap_edges[:, 0].tolist(), cap_edges[:, 1].tolist()))
+    visited = set()
+    loops = list()
+    for start in next_vertex.keys():
+        if start in visited:
+            continue
+        loop = list()
+        vertex = start
+        while vertex is not None and vertex not in visited:
+            visited.add(vertex)
+            loop.append(vertex)
+            vertex = next_vertex.get(vertex)
+        if len(loop) >= 3:
+            loops.append(numpy.array(loop, dtype=numpy.int64))
+    return loops
+
+
+def get_plane_basis(normal):
+    # u, v with u x v = -normal, counter clockwise polygons in (u, v) face away from the kept side
+    normal = normal / numpy.linalg.norm(normal)
+    axis = numpy.eye(3)[numpy.argmin(numpy.abs(normal))]
+    u = numpy.cross(axis, normal)
+    u = u / numpy.linalg.norm(u)
+    v = numpy.cross(-normal, u)
+    return u, v
+
+
+def get_signed_area(points):
+    points_next = numpy.roll(points, -1, axis=0)
+    return 0.5 * numpy.sum(points[:, 0] * points_next[:, 1] - points_next[:, 0] * points[:, 1])
+
+
+def is_inside_polygon(point, points):
+    # even-odd rule, ray towards +x
+    points_next = numpy.roll(points, -1, axis=0)
+    crossing = (points[:, 1] > point[1]) != (points_next[:, 1] > point[1])
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        x = points[:, 0] + (point[1] - points[:, 1]) * (points_next[:, 0] - points[:, 0]) / (points_next[:, 1] - points[:, 1])
+    return bool(numpy.count_nonzero(crossing & (x > point[0])) % 2)
+
+
+def get_cross(a, b, c):
+    # z of (b - a) x (c - a), positive for a counter clockwise turn
+    return (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+
+
+def is_visible(a, b, edges_start, edges_end, eps):
+    # the segment a-b does not properly cross any of the edges, edges touching a or b do not block it
+    touching = (
+        (numpy.linalg.norm(edges_start - a, axis=1) <= eps) | (numpy.linalg.norm(edges_end - a, axis=1) <= eps) |
+        (numpy.linalg.norm(edges_start - b, axis=1) <= eps) | (numpy.linalg.norm(edges_end - b, axis=1) <= eps)
+    )
+    d1 = get_cross(a, b, edges_start)
+    d2 = get_cross(a, b, edges_end)
+    d3 = get_cross(edges_start, edges_end, a)
+    d4 = get_cross(edges_start, edges_end, b)
+    crossing = (d1 * d2 < 0.0) & (d3 * d4 < 0.0)
+    return not numpy.any(crossing & ~touching)
+
+
+def get_polygon_edges(points, polygons):
+    edges_start = numpy.concatenate([points[polygon] for polygon in polygons])
+    edges_end = numpy.concatenate([points[numpy.roll(polygon, -1)] for polygon in polygons])
+    return edges_start, edges_end
+
+
+def merge_holes(points, outer, holes, eps):
+    # joins the holes (clockwise) into the outer polygon (counter clockwise) with a bridge each,
+    # the result is a single polygon which touches itself along the bridges.
+    # holes are merged rightmost first, each to the closest polygon vertex it can see
+    holes = sorted(holes, key=lambda hole: -points[hole, 0].max())
+    polygon = numpy.array(outer)
+    for hole_index, hole in enumerate(holes):
+        m = int(numpy.argmax(points[hole, 0]))
+        point_m = points[hole[m]]
+        edges_start, edges_end = get_polygon_edges(points, [polygon] + holes[hole_index:])
+        order = numpy.argsort(numpy.linalg.norm(points[polygon] - point_m, axis=1))
+        k = order[0]
+        for candidate in order:
+            if is_visible(point_m, points[polygon[candidate]], edges_start, edges_end, eps):
+                k = candidate
+                break
+        polygon = numpy.concatenate((polygon[:k + 1], numpy.roll(hole, -m), hole[m:m + 1], polygon[k:]))
+    return polygon
+
+
+def get_valid_ears(p_prev, p, p_next, reflex, eps):
+    # convex vertices whose triangle contains no reflex vertex, vertices at the corners of the ear (bridges) do not count.
+    # vertices on the diagonal block the ear as well, clipping it would leave overlapping edges (collinear cut vertices)
+    valid = ~reflex
+    test = p[reflex]
+    if not len(test):
+        return valid
+    for i in numpy.flatnonzero(valid):
+        a = p_prev[i]
+        b = p[i]
+        c = p_next[i]
+        inside = (get_cross(a, b, test) > eps) & (get_cross(b, c, test) > eps) & (get_cross(c, a, test) >= -eps)
+        if not numpy.any(inside):
+            continue
+        at_corner = (
+            (numpy.linalg.norm(test - a, axis=1) <= eps) |
+            (numpy.linalg.norm(test - b, axis=1) <= eps) |
+            (numpy.linalg.norm(test - c, axis=1) <= eps)
+        )
+        valid[i] = not numpy.any(inside & ~at_corner)
+    return valid
+
+
+def triangulate_polygon(points, polygon, eps):
+    # ear clipping of a counter clockwise polygon, returns triangles of the polygon entries.
+    # each pass clips many valid ears at once, ears which do not share a vertex do not overlap and can be clipped together
+    remaining = numpy.array(polygon)
+    tris = list()
+    while len(remaining) > 3:
+        count = len(remaining)
+        p = points[remaining]
+        p_prev = numpy.roll(p, 1, axis=0)
+        p_next = numpy.roll(p, -1, axis=0)
+        cross = get_cross(p_prev, p, p_next)
+        valid = get_valid_ears(p_prev, p, p_next, cross <= eps, eps)
+        # ears without a common vertex, the bridges of merged holes repeat vertices, so the vertices are compared and not the entries.
+        # at most the ears that leave a triangle
+        ears = list()
+        used = set()
+        for i in numpy.flatnonzero(valid).tolist():
+            if len(ears) >= count - 3:
+                break
+            corners = {remaining[i - 1], remaining[i], remaining[(i + 1) % count]}
+            if used.intersection(corners):
+                continue
+            used.update(corners)
+            ears.append(i)
+        ears = numpy.array(ears, dtype=numpy.int64)
+        if not len(ears):
+            # numerical dead end, clip the most convex vertex so the loop always ends
+            ears = numpy.array([numpy.argmax(cross)])
+        tris.extend(zip(remaining[(ears - 1) % count], remaining[ears], remaining[(ears + 1) % count]))
+        remaining = numpy.delete(remaining, ears)
+    tris.append(tuple(remaining))
+    return tris
+
+
+def cap_triangles(co, cap_edges, normal):
+    # closes the cut with triangles facing away from the kept side.
+    # the loops are projected onto the plane, grouped into outer loops and the holes inside them
+    # (eg. the medullary cavity) and each outer loop is triangulated together with its holes,
+    # so non-convex sections and sections with holes get proper caps
+    loops = get_cut_loops(cap_edges)
+    if not loops:
+        return numpy.empty((0, 3)), numpy.empty((0, 3), dtype=numpy.int64)
+    u, v = get_plane_basis(normal)
+    points = dict()
+    for loop in loops:
+        for index in loop.tolist():
+            points[index] = (co[index] @ u, co[index] @ v)
+    indices = numpy.array(list(points.keys()), dtype=numpy.int64)
+    points_2d = numpy.array(list(points.values()))
+    position = {index: position for position, index in enumerate(indices.tolist())}
+    loops = [numpy.array([position[index] for index in loop.tolist()], dtype=numpy.int64) for loop in loops]
+    extent = numpy.ptp(points_2d, axis=0).max()
+    eps = 1e-12 * max(extent, 1e-30) ** 2
+
+    # nesting depth of each loop, even depths are outer loops, odd depths are holes
+    areas = [get_signed_area(points_2d[loop]) for loop in loops]
+    containers = [
+        [other for other in range(len(loops)) if other != index and is_inside_polygon(points_2d[loop[0]], points_2d[loops[other]])]
+        for index, loop in enumerate(loops)
+    ]
+    depths = [len(container) for container in containers]
+    outers = dict()
+    holes = dict()
+    for index, loop in enumerate(loops):
+        if depths[index] % 2 == 0:
+            outers[index] = loop if areas[index] > 0.0 else loop[::-1]
+            holes.setdefault(index, list())
+    for index, loop in enumerate(loops):
+        if depths[index] % 2 == 1:
+            # the parent is the closest outer loop around the hole
+            parents = [other for other in containers[index] if depths[other] == depths[index] - 1]
+            if not parents:
+                continue
+            holes[parents[0]].append(loop if areas[index] < 0.0 else loop[::-1])
+
+    tris = list()
+    for index, outer in outers.items():
+        polygon = merge_holes(points_2d, outer, holes[index], eps) if holes[index] else outer
+        tris.extend(triangulate_polygon(points_2d, polygon, eps))
+    return numpy.empty((0, 3)), indices[numpy.array(tris, dtype=numpy.int64)]
+
+
+def clip_half_space(co, tris, point, normal):
+    # keep the part of the closed mesh on the side the normal points to
+    distance = (co - point) @ normal
+    inside = distance >= 0.0
+    inside_count = inside[tris].sum(axis=1)
+
+    tris_keep = tris[inside_count == 3]
+    # one vertex inside - it goes first, two vertices inside - the one outside goes first
+    # in both cases the edges (0, 1) and (0, 2) are the ones crossing the plane
+    tris_one = tris[inside_count == 1]
+    tris_one = rotate_first(tris_one, inside[tris_one])
+    tris_two = tris[inside_count == 2]
+    tris_two = rotate_first(tris_two, ~inside[tris_two])
+
+    # find unique crossing edges and create one new vertex for each of them
+    crossing = numpy.concatenate((
+        tris_one[:, [0, 1]],
+        tris_one[:, [0, 2]],
+        tris_two[:, [0, 1]],
+        tris_two[:, [0, 2]]
+    ))
+    crossing.sort(axis=1)
+    keys = crossing[:, 0] * len(co) + crossing[:, 1]
+    keys_unique, keys_index, keys_inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+    edges = crossing[keys_index]
+    distance_start = distance[edges[:, 0]]
+    distance_end = distance[edges[:, 1]]
+    factor = distance_start / (distance_start - distance_end)
+    co_new = co[edges[:, 0]] + factor[:, None] * (co[edges[:, 1]] - co[edges[:, 0]])
+    new_index = len(co) + keys_inverse.ravel()
+
+    count_one = len(tris_one)
+    count_two = len(tris_two)
+    one_01 = new_index[:count_one]
+    one_02 = new_index[count_one:2 * count_one]
+    two_01 = new_index[2 * count_one:2 * count_one + count_two]
+    two_02 = new_index[2 * count_one + count_two:]
+
+    tris_clipped = numpy.concatenate((
+        tris_keep,
+        numpy.column_stack((tris_one[:, 0], one_01, one_02)),
+        numpy.column_stack((two_01, tris_two[:, 1], tris_two[:, 2])),
+        numpy.column_stack((two_01, tris_two[:, 2], two_02))
+    ))
+    co_clipped = numpy.concatenate((co, co_new))
+
+    # close the cut
+    cap_edges = numpy.concatenate((
+        numpy.column_stack((one_02, one_01)),
+        numpy.column_stack((two_01, two_02))
+    ))
+    co_cap, tris_cap = cap_triangles(co_clipped, cap_edges, normal)
+    return numpy.concatenate((co_clipped, co_cap)), numpy.concatenate((tris_clipped, tris_cap))
+
+
+def compact(co, tris):
+    # remove vertices which are not used by any triangle
+    used, inverse = numpy.unique(tris, return_inverse=True)
+    return co[used], inverse.reshape(-1, 3)
+
+
+def clip_mesh(co, tris, planes):
+    # planes - list of (point, normal), the result is the intersection of all half spaces
+    for point, normal in planes:
+        if not len(tris):
+            break
+        co, tris = clip_half_space(co, tris, point, normal)
+    return compact(co, tris)
+
+
+def get_segment_planes(armature, index, matrix_world):
+    # half spaces of the segment in the local space of the segment object
+    # the segment starts at the head of bone.N and ends at the head of bone.N+1
+    # bones point along their local Y axis, which is also the normal of the cutting planes
+    matrix_inv = matrix_world.inverted()
+    matrix_normal = matrix_world.to_3x3().transposed()
+    planes = list()
+    for bone_name, direction in [("bone." + str(index), 1.0), ("bone." + str(index + 1), -1.0)]:
+        bone_matrix = armature.matrix_world @ armature.pose.bones[bone_name].matrix
+        point = matrix_inv @ bone_matrix.translation
+        normal = matrix_normal @ (bone_matrix.col[1].to_3d() * direction)
+        planes.append((numpy.array(point), numpy.array(normal.normalized())))
+    return planes
+
+
+def clip_fibula_segment(obj_fibula_segment, armature, index):
+    # returns vertices and triangles of the segment in the local space of obj_fibula_segment
+    co, tris = get_mesh_arrays(obj_fibula_segment.data)
+    planes = get_segment_planes(armature, index, obj_fibula_segment.matrix_world)
+    return clip_mesh(co, tris, planes)
@@ -22,6 +22,7 @@
 import bpy
 import os
 from . import constants
+from .clear import remove_objects
 
 
 # initializes the addon, creates collections, appends workspaces...
@@ -34,44 +35,49 @@ class InitializeAddon(bpy.types.Operator):
         # check if addon has aleady been initialized...
         if(bpy.context.scene.FFFGenPropertyGroup.is_initialized):
             return {"CANCELLED"}
-        
-        # set the property to indicate that the addon has been initialized
-        bpy.context.scene.FFFGenPropertyGroup.is_initialized = True
+        initialize_addon(context)
+        return {"FINISHED"}
+
+
+def initialize_addon(context):
+    # set the property to indicate that the addon has been initialized
+    bpy.context.scene.FFFGenPropertyGroup.is_initialized = True
 
-        remove_objects_and_collections()
-        create_collections()
+    remove_objects_and_collections()
+    create_collections()
+
+    # workspaces only exist with a window, not when running in the background
+    if context.window is not None:
         initialize_workspaces(context)
 
         # set active workspace to positioning
         bpy.context.window.workspace = bpy.data.workspaces[constants.WORKSPACE_POSITIONING]
 
-        # set up units and scale
-        bpy.context.scene.unit_settings.system = "METRIC"
-        bpy.context.scene.unit_settings.scale_length = 0.01
-        bpy.context.scene.unit_settings.length_unit = "CENTIMETERS"
-
-        # enable selection in both pose and object mode
-        bpy.context.scene.tool_settings.lock_object_mode = False
+    # set up units and scale
+    bpy.context.scene.unit_settings.system = "METRIC"
+    bpy.context.scene.unit_settings.scale_length = 0.01
+    bpy.context.scene.unit_settings.length_unit = "CENTIMETERS"
 
-        # make the transforms in local space by default. 
-        for idx in range(0, 4):
-            bpy.context.scene.transform_orientation_slots[idx].type = "LOCAL"
+    # enable selection in both pose and object mode
+    bpy.context.scene.tool_settings.lock_object_mode = False
 
-        return {"FINISHED"}
+    # make the transforms in local space by default. 
+    for idx in range(0, 4):
+        bpy.context.scene.transform_orientation_slots[idx].type = "LOCAL"
 
 
 def remove_objects_and_collections():
     # remove all collections and objects, effectivly clears the current scene
     scene = bpy.context.scene
-    for col in scene.collection.children:
-        for obj in col.objects:
-            bpy.data.objects.remove(obj)
+    remove_objects(scene.collection.all_objects)
+    for col in list(scene.collection.children):
         scene.collection.children.unlink(col)
-        for obj in scene.collection.objects:
-            bpy.data.objects.remove(obj)
-    for col in bpy.data.collections:
-        if not col.users:
-            bpy.data.collections.remove(col)
+    # removing a collection frees its children, repeat until no unused collections are left
+    while True:
+        orphans = [col for col in bpy.data.collections if not col.users]
+        if not len(orphans):
+            break
+        bpy.data.batch_remove(orphans)
 
 
 def create_collections():
@@ -20,10 +20,14 @@
 
 
 import bpy
+import mathutils
+import numpy
 from .move_object_to_collection import move_object_to_collection
-from .external_loading import load_armature_bone_shape, load_boolean_cube
+from .external_loading import load_armature_bone_shape, load_boolean_cube, copy_template_object
+from .quality_profile import apply_quality_profile
 from . import constants
 from . import materials
+from . import object_registry
 import os
 
 
@@ -32,170 +36,196 @@ class InitializeRig(bpy.types.Operator):
     bl_label = "Initialize FFF Gen Rig"
     bl_description = "Initializes the rigging(armature) and adds all necessary objects, modifiers and constraints"
 
-    # this one is a bit longer, but it does a lot of stuff which to me does not have much sense to separate
-    # and i won't do it just for the sake of separating stuff
     def invoke(self, context, event):
-        # decimate objects if option is checked
-        if(bpy.context.scene.FFFGenPropertyGroup.auto_decimate):
-            decimate_objects(context)
-        
-        # get original fibula and mandible object, store them in a separate collection...
-        obj_mandible = bpy.context.scene.FFFGenPropertyGroup.mandible_object
-        obj_fibula = bpy.context.scene.FFFGenPropertyGroup.fibula_object
-        move_object_to_collection(
-            obj_to_move=obj_mandible,
-            collection_name=constants.COLLECTION_ORIGINAL,
-            remove_from_current=True
-        )
-        move_object_to_collection(
-            obj_to_move=obj_fibula,
-            collection_name=constants.COLLECTION_ORIGINAL,
-            remove_from_current=True
-        )
-        
-        # duplicate fibula and mandible
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        override_context = {
-            "selected_objects":[obj_mandible]
-        }
-        with context.temp_override(**override_context):
-            bpy.ops.object.duplicate()
-        obj_mandible_copy = bpy.context.selected_objects[0]
-        obj_mandible_copy.name = "mandible_copy"
-        move_object_to_collection(
-            obj_to_move=obj_mandible_copy,
-            collection_name=constants.COLLECTION_FFF_GEN_MANDIBLE,
-            remove_from_current=True
-        )
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        override_context = {
-            "selected_objects":[obj_fibula]
-        }
-        with context.temp_override(**override_context):
-            bpy.ops.object.duplicate()
-        obj_fibula_copy = bpy.context.selected_objects[0]
-        obj_fibula_copy.name = "fibula_copy"
-        move_object_to_collection(
-            obj_to_move=obj_fibula_copy,
-            collection_name=constants.COLLECTION_FFF_GEN_FIBULA,
-            remove_from_current=True
-        )
-
-        # deselect all
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        
-        # initialize armature and the rig...
-        armature = initialize_armature()
-        boolean_objects = initialize_boolean_objects(armature)
-        
-        initialize_mandible_objects(
-            context=context,
-            armature=armature,
-            obj_mandible=obj_mandible_copy,
-            objects_boolean_cubes=boolean_objects
+        memory_shared, memory_separate = initialize_rig(context)
+        self.report(
+            {"INFO"},
+            "Fibula segment meshes: {:.1f} MB, separate copies would use {:.1f} MB".format(
+                memory_shared / 1048576, memory_separate / 1048576
+            )
         )
-        initialize_fibula_objects(
-            context=context,
-            armature=armature,
-            obj_fibula=obj_fibula,
-            objects_boolean_cubes=boolean_objects
-        )
-
-        # hide original collection
-        bpy.data.collections[constants.COLLECTION_ORIGINAL].hide_viewport = True
-
-        # set armature to pose mode...
-        bpy.context.view_layer.objects.active = armature
-        bpy.ops.object.mode_set(
-            mode="POSE"
-        )
-        bpy.context.view_layer.objects.active = None
-
-        #set materials
-        if len(obj_mandible_copy.data.materials):
-            obj_mandible_copy.data.materials[0] = materials.get_transparent()
-        else:
-            obj_mandible_copy.data.materials.append(materials.get_transparent())
-        if len(obj_fibula_copy.data.materials):
-            obj_fibula_copy.data.materials[0] = materials.get_transparent()
-        else:
-            obj_fibula_copy.data.materials.append(materials.get_transparent())
-        
-        # return
         return {"FINISHED"}
 
 
-def decimate_objects(context):
+# this one is a bit longer, but it does a lot of stuff which to me does not have much sense to separate
+# and i won't do it just for the sake of separating stuff
+def initialize_rig(context):
+    # returns the mesh memory used by the fibula segments, and what separate copies would use
+    # build decimated proxy meshes if option is checked, the original meshes are kept
+    if(bpy.context.scene.FFFGenPropertyGroup.auto_decimate):
+        build_proxy_meshes(context)
+    
+    # get original fibula and mandible object, store them in a separate collection...
     obj_mandible = bpy.context.scene.FFFGenPropertyGroup.mandible_object
     obj_fibula = bpy.context.scene.FFFGenPropertyGroup.fibula_object
+    move_object_to_collection(
+        obj_to_move=obj_mandible,
+        collection_name=constants.COLLECTION_ORIGINAL,
+        remove_from_current=True
+    )
+    move_object_to_collection(
+        obj_to_move=obj_fibula,
+        collection_name=constants.COLLECTION_ORIGINAL,
+        remove_from_current=True
+    )
+    
+    # linked duplicates of fibula and mandible, they share the mesh with the original objects
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    obj_mandible_copy = obj_mandible.copy()
+    obj_mandible_copy.name = "mandible_copy"
+    bpy.context.scene.collection.objects.link(obj_mandible_copy)
+    object_registry.register_object(constants.ROLE_MANDIBLE_COPY, obj_mandible_copy)
+    move_object_to_collection(
+        obj_to_move=obj_mandible_copy,
+        collection_name=constants.COLLECTION_FFF_GEN_MANDIBLE,
+        remove_from_current=True
+    )
+    obj_fibula_copy = obj_fibula.copy()
+    obj_fibula_copy.name = "fibula_copy"
+    bpy.context.scene.collection.objects.link(obj_fibula_copy)
+    object_registry.register_object(constants.ROLE_FIBULA_COPY, obj_fibula_copy)
+    move_object_to_collection(
+        obj_to_move=obj_fibula_copy,
+        collection_name=constants.COLLECTION_FFF_GEN_FIBULA,
+        remove_from_current=True
+    )
 
-    for obj in [obj_mandible, obj_fibula]:
-        modifier_decimate = obj.modifiers.new(
-            name="decimate",
-            type="DECIMATE"
-        )
-        modifier_decimate.decimate_type = "COLLAPSE"
-        ratio = 10000/len(obj.data.polygons)
-        if (ratio > 1):
-            ratio = 1
-        modifier_decimate.ratio = ratio
-        override_context = bpy.context.copy()
-        override_context["active_object"] = obj
-        override_context["selected_objects"] = [obj]
-        override_context["object"] = obj
-        with context.temp_override(**override_context):
-            bpy.ops.object.modifier_apply(modifier=modifier_decimate.name)
+    # deselect all
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    
+    # mesh memory of the fibula segments, if each segment had its own copy of the fibula mesh
+    memory_separate = get_mesh_memory(obj_fibula.data) * bpy.context.scene.FFFGenPropertyGroup.segment_count
+
+    # initialize armature and the rig...
+    bpy.context.scene.FFFGenPropertyGroup.bone_spacing = compute_bone_spacing(obj_fibula_copy)
+    armature = initialize_armature()
+    boolean_objects = initialize_boolean_objects(armature)
+    
+    initialize_mandible_objects(
+        context=context,
+        armature=armature,
+        obj_mandible=obj_mandible_copy,
+        objects_boolean_cubes=boolean_objects
+    )
+    initialize_fibula_objects(
+        context=context,
+        armature=armature,
+        obj_fibula=obj_fibula,
+        objects_boolean_cubes=boolean_objects
+    )
 
+    # report mesh memory used by the segments
+    meshes_segments = set()
+    for obj in object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT).values():
+        meshes_segments.add(obj.data)
+    memory_shared = sum(get_mesh_memory(mesh) for mesh in meshes_segments)
 
-def initialize_armature():
-    # add armature object, enter edit mode
-    bpy.context.scene.cursor.location = (0.0, 0.0, 0.0)
-    bpy.ops.object.armature_add()
-    armature = bpy.context.active_object
+    # hide original collection
+    bpy.data.collections[constants.COLLECTION_ORIGINAL].hide_viewport = True
+
+    # set armature to pose mode...
+    bpy.context.view_layer.objects.active = armature
     bpy.ops.object.mode_set(
-        mode="EDIT"
+        mode="POSE"
     )
+    bpy.context.view_layer.objects.active = None
+
+    #set materials, on the object since the mesh is shared
+    materials.set_object_material(obj_mandible_copy, materials.get_transparent())
+    materials.set_object_material(obj_fibula_copy, materials.get_transparent())
+    
+    # return
+    apply_quality_profile(context.scene)
+    return memory_shared, memory_separate
+
+
+def get_mesh_memory(mesh):
+    # rough estimate of the mesh size in bytes, blender does not expose memory usage per datablock
+    # vertex position (3 floats), edge (2 ints), loop vertex and edge (2 ints), polygon offset (1 int)
+    return len(mesh.vertices) * 12 + len(mesh.edges) * 8 + len(mesh.loops) * 8 + len(mesh.polygons) * 4
+
 
-    # delete default bone
-    bpy.ops.armature.select_all(
-        action="SELECT"
+def build_proxy_mesh(context, obj, face_count):
+    # bake a decimated copy of the mesh, the object and its mesh are not changed.
+    # collapse decimation is quadric error based. vertices in the "fffgen_detail" vertex group (eg. around the osteotomies)
+    # are decimated less, the group is inverted so that weighted vertices are the ones preserved.
+    modifier_decimate = obj.modifiers.new(
+        name="fffgen_proxy",
+        type="DECIMATE"
+    )
+    modifier_decimate.decimate_type = "COLLAPSE"
+    modifier_decimate.ratio = min(1.0, face_count/max(1, len(obj.data.polygons)))
+    if constants.VERTEX_GROUP_DETAIL in obj.vertex_groups.keys():
+        modifier_decimate.vertex_group = constants.VERTEX_GROUP_DETAIL
+        modifier_decimate.invert_vertex_group = True
+
+    depsgraph = context.evaluated_depsgraph_get()
+    mesh_proxy = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph))
+    mesh_proxy.name = obj.data.name + "_proxy"
+    # same slots as the full mesh, so swapping meshes keeps the materials of the objects
+    while len(mesh_proxy.materials) < len(obj.data.materials):
+        mesh_proxy.materials.append(obj.data.materials[len(mesh_proxy.materials)])
+    obj.modifiers.remove(modifier_decimate)
+    return mesh_proxy
+
+
+def build_proxy_meshes(context):
+    properties = bpy.context.scene.FFFGenPropertyGroup
+    obj_mandible = properties.mandible_object
+    obj_fibula = properties.fibula_object
+
+    properties.mandible_mesh_full = obj_mandible.data
+    properties.mandible_mesh_proxy = build_proxy_mesh(context, obj_mandible, properties.proxy_face_count)
+    properties.fibula_mesh_full = obj_fibula.data
+    properties.fibula_mesh_proxy = build_proxy_mesh(context, obj_fibula, properties.proxy_face_count)
+
+
+def compute_bone_spacing(obj_fibula):
+    # distance between the bones, the fibula segments are offset by the same distance.
+    # the segments together span half of the fibula length, whatever unit the fibula is modelled in.
+    # the rest of the rig (bones, bone shapes and boolean cubes) scales with the spacing, 3.0 was the fixed spacing before
+    segment_count = bpy.context.scene.FFFGenPropertyGroup.segment_count
+    fibula_length = max(obj_fibula.dimensions)
+    if fibula_length <= 0.0:
+        return 3.0
+    return 0.5 * fibula_length / segment_count
+
+
+def initialize_armature():
+    # create the armature object and its bones directly, one edit mode session for all bones
+    bone_spacing = bpy.context.scene.FFFGenPropertyGroup.bone_spacing
+    armature_data = bpy.data.armatures.new("Armature")
+    armature = bpy.data.objects.new("Armature", armature_data)
+    bpy.context.scene.collection.objects.link(armature)
+    object_registry.register_object(constants.ROLE_ARMATURE, armature)
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    armature.select_set(True)
+    bpy.context.view_layer.objects.active = armature
+    bpy.ops.object.mode_set(
+        mode="EDIT"
     )
-    bpy.ops.armature.delete()
 
     # add armature bones
+    # the bones were 1.0 long for the 3.0 spacing, they keep that proportion (the bone shapes scale with the bone length)
     segment_count = bpy.context.scene.FFFGenPropertyGroup.segment_count
+    bone_length = bone_spacing / 3.0
     for i in range(0, segment_count + 1):
-        # TODO: the value 3.0(distance between bones) is hard coded here.
-        bpy.context.scene.cursor.location = (0.0, i*3.0, 0.0)
-        bpy.context.scene.tool_settings.transform_pivot_point = "CURSOR"
-        bone_name = "bone." + str(i)
-        bpy.ops.armature.bone_primitive_add(
-            name=bone_name
-        )
-        bone = bpy.context.object.data.edit_bones[bone_name]
-        bone.tail = (0.0, i*3.0 + 1.0, 0.0)
-        bpy.ops.armature.select_all(
-            action="DESELECT"
-        )
-    
-    # back to object mode, deselect all objects
+        bone = armature_data.edit_bones.new("bone." + str(i))
+        bone.head = (0.0, i*bone_spacing, 0.0)
+        bone.tail = (0.0, i*bone_spacing + bone_length, 0.0)
+
+    # back to object mode, deselect
     bpy.ops.object.mode_set(
         mode="OBJECT"
     )
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-
-    # reset 3D cursor
-    bpy.context.scene.cursor.location = (0.0, 0.0, 0.0)
-    # reset transform pivot point back to median
-    bpy.context.scene.tool_settings.transform_pivot_point = "MEDIAN_POINT"
+    armature.select_set(False)
 
     # add custom bone shape to armature
+    # the template is used directly, it is not linked to the scene
     obj_bone_shape = load_armature_bone_shape()
-    obj_bone_shape.hide_set(True)
     for bone in armature.pose.bones:
         bone.custom_shape = obj_bone_shape
     
@@ -214,16 +244,17 @@ def initialize_boolean_objects(armature):
     # duplicate the loaded cubes, assign correct vertex group names and push them to a dictionary
     objects_boolean_cubes = dict()
     segment_count = bpy.context.scene.FFFGenPropertyGroup.segment_count
+    bone_spacing = bpy.context.scene.FFFGenPropertyGroup.bone_spacing
     for i in range(0, segment_count):
         for obj in bpy.context.selected_objects:
             obj.select_set(False)
-        obj_boolean_cube_dupli = obj_boolean_cube.copy()
-        obj_boolean_cube_dupli.data = obj_boolean_cube.data.copy()
+        obj_boolean_cube_dupli = copy_template_object(obj_boolean_cube)
         obj_boolean_cube_dupli.name = "boolean_cube." + str(i)
-        obj_boolean_cube_dupli.location.y = i*3.0
+        obj_boolean_cube_dupli.location.y = i*bone_spacing
+        # the cube spans the distance between two bones, it was made for the 3.0 spacing and keeps its proportions
+        obj_boolean_cube_dupli.scale = (bone_spacing / 3.0, bone_spacing / 3.0, bone_spacing / 3.0)
         obj_boolean_cube_dupli.vertex_groups[0].name = "bone." + str(i)
         obj_boolean_cube_dupli.vertex_groups[1].name = "bone." + str(i + 1)
-        bpy.context.scene.collection.objects.link(obj_boolean_cube_dupli)
         # move to collection
         move_object_to_collection(
             obj_to_move=obj_boolean_cube_dupli,
@@ -239,75 +270,126 @@ def initialize_boolean_objects(armature):
         # hide it
         obj_boolean_cube_dupli.hide_set(True)
         objects_boolean_cubes[obj_boolean_cube_dupli.name] = obj_boolean_cube_dupli
-    
-    # unlink the initial cube object
-    bpy.context.scene.collection.objects.unlink(obj_boolean_cube)
-        
+        object_registry.register_object(constants.ROLE_BOOLEAN_CUBE, obj_boolean_cube_dupli, i)
+
     return objects_boolean_cubes
 
 
+def get_cutter_arrays(objects_boolean_cubes, scale):
+    # vertices, polygons and vertex weights of all cubes, in the space of their armature parent.
+    # the cubes are scaled around their origin, only across the bone (x and z), they still end at the next bone
+    co_all = list()
+    polygons_all = list()
+    weights_all = list()
+    vertex_count = 0
+    for obj_boolean_cube in objects_boolean_cubes:
+        mesh = obj_boolean_cube.data
+        co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+        mesh.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3).astype(numpy.float64) * numpy.array(scale)
+        matrix = numpy.array(obj_boolean_cube.matrix_basis)
+        co_all.append(co @ matrix[:3, :3].T + matrix[:3, 3])
+        vertex_indices = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+        mesh.loops.foreach_get("vertex_index", vertex_indices)
+        for polygon in mesh.polygons:
+            polygons_all.append(vertex_indices[polygon.loop_start:polygon.loop_start + polygon.loop_total] + vertex_count)
+        group_names = [group.name for group in obj_boolean_cube.vertex_groups]
+        for vertex in mesh.vertices:
+            weights_all.append([(group_names[group.group], group.weight) for group in vertex.groups])
+        vertex_count = vertex_count + len(mesh.vertices)
+    return numpy.concatenate(co_all), polygons_all, weights_all
+
+
+def create_cutter_mesh(mesh_name, objects_boolean_cubes, scale):
+    # one closed mesh from the chain of cubes.
+    # neighbouring cubes touch at the bone between them, with the same vertices weighted to that bone.
+    # those vertices are merged and the two faces between the cubes are dropped, so nothing overlaps
+    # and the fast boolean solver can use the mesh
+    co, polygons, weights = get_cutter_arrays(objects_boolean_cubes, scale)
+    extent = max(float(numpy.ptp(co, axis=0).max()), 1e-6)
+    keys = numpy.round(co / (extent * 1e-5)).astype(numpy.int64)
+    _, first, merged = numpy.unique(keys, axis=0, return_index=True, return_inverse=True)
+    merged = merged.ravel()
+    polygons = [merged[polygon] for polygon in polygons]
+    face_keys = [frozenset(polygon.tolist()) for polygon in polygons]
+    face_counts = dict()
+    for key in face_keys:
+        face_counts[key] = face_counts.get(key, 0) + 1
+    polygons = [polygon for polygon, key in zip(polygons, face_keys) if face_counts[key] == 1]
+
+    mesh = bpy.data.meshes.new(mesh_name)
+    loop_totals = numpy.array([len(polygon) for polygon in polygons], dtype=numpy.int32)
+    mesh.vertices.add(len(first))
+    mesh.loops.add(int(loop_totals.sum()))
+    mesh.polygons.add(len(polygons))
+    mesh.vertices.foreach_set("co", co[first].astype(numpy.float32).ravel())
+    mesh.loops.foreach_set("vertex_index", numpy.concatenate(polygons).astype(numpy.int32))
+    mesh.polygons.foreach_set("loop_start", (numpy.cumsum(loop_totals) - loop_totals).astype(numpy.int32))
+    mesh.update(calc_edges=True)
+    return mesh, [weights[index] for index in first]
+
+
 def initialize_mandible_objects(context, armature, obj_mandible, objects_boolean_cubes):
-    objects_mandible_boolean_cubes = dict()
-    last_cube_name = "boolean_cube." + str(len(objects_boolean_cubes)-1)
-    for obj_boolean_cube in objects_boolean_cubes.values():
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        override_context = {
-            "selected_objects":[obj_boolean_cube]
-        }
-        with context.temp_override(**override_context):
-            bpy.ops.object.duplicate()
-        obj_boolean_cube_dupli = bpy.context.selected_objects[0]
-        # scale up to avoid artifacts with boolean modifiers
-        if obj_boolean_cube.name != last_cube_name:
-            obj_boolean_cube_dupli.scale = (1.2, 1.2, 1.2)
-        else:
-            obj_boolean_cube_dupli.scale = (1.2, 1.0, 1.2)
-        obj_boolean_cube_dupli.name = "mandible_" + obj_boolean_cube.name
-        objects_mandible_boolean_cubes[obj_boolean_cube_dupli.name] = obj_boolean_cube_dupli
-
-    # duplicate a mandible object for visualisation
+    # one cutter for all segments, so the mandible is cut by a single object operand boolean for any segment count.
+    # it is built from the boolean cubes through the data api (scaled up across the bones to avoid artifacts with the boolean),
+    # it keeps the bone vertex groups of the cubes and is deformed by the armature like them
+    mesh, weights = create_cutter_mesh("mandible_resection_cutter", objects_boolean_cubes.values(), (1.2, 1.0, 1.2))
+    obj_cutter = bpy.data.objects.new("mandible_resection_cutter", mesh)
+    bpy.context.scene.collection.objects.link(obj_cutter)
+    vertex_groups = dict()
+    for index, vertex_weights in enumerate(weights):
+        for name, weight in vertex_weights:
+            vertex_groups.setdefault((name, weight), list()).append(index)
+    for (name, weight), indices in vertex_groups.items():
+        if name not in obj_cutter.vertex_groups.keys():
+            obj_cutter.vertex_groups.new(name=name)
+        obj_cutter.vertex_groups[name].add(indices, weight, "REPLACE")
+    # same parenting as the cubes (parent_set type ARMATURE)
+    obj_boolean_cube = next(iter(objects_boolean_cubes.values()))
+    obj_cutter.parent = armature
+    obj_cutter.matrix_parent_inverse = obj_boolean_cube.matrix_parent_inverse.copy()
+    modifier_armature = obj_cutter.modifiers.new(
+        name="Armature",
+        type="ARMATURE"
+    )
+    modifier_armature.object = armature
+    object_registry.register_object(constants.ROLE_MANDIBLE_RESECTION_CUTTER, obj_cutter)
+    move_object_to_collection(
+        obj_to_move=obj_cutter,
+        collection_name=constants.COLLECTION_FFF_GEN_MANDIBLE,
+        remove_from_current=True
+    )
+    obj_cutter.hide_set(True)
+
+    # linked duplicate of the mandible for visualisation, the resection is done by its modifier
     for obj in bpy.context.selected_objects:
         obj.select_set(False)
-    override_context = {
-        "selected_objects":[obj_mandible]
-    }
-    with context.temp_override(**override_context):
-        bpy.ops.object.duplicate()
-    obj_mandible_dupli = bpy.context.selected_objects[0]
-    obj_mandible_dupli.select_set(False)
-
-    # add boolean modifiers...
-    for obj in objects_mandible_boolean_cubes.values():
-        modifier_boolean = obj_mandible_dupli.modifiers.new(
-            name="boolean_difference",
-            type="BOOLEAN"
-        )
-        modifier_boolean.operation = "DIFFERENCE"
-        modifier_boolean.object = obj
-        # move to proper collection, hide
-        move_object_to_collection(
-            obj_to_move=obj,
-            collection_name=constants.COLLECTION_FFF_GEN_MANDIBLE,
-            remove_from_current=True
-        )
-        obj.hide_set(True)
+    obj_mandible_dupli = obj_mandible.copy()
+    for collection in obj_mandible.users_collection:
+        collection.objects.link(obj_mandible_dupli)
+    object_registry.register_object(constants.ROLE_MANDIBLE_RESECTED, obj_mandible_dupli)
+
+    modifier_boolean = obj_mandible_dupli.modifiers.new(
+        name=constants.MODIFIER_MANDIBLE_RESECTION,
+        type="BOOLEAN"
+    )
+    modifier_boolean.operation = "DIFFERENCE"
+    modifier_boolean.object = obj_cutter
 
 
 def initialize_fibula_vectors(segment_count, armature):
     objects_vectors = dict()
+    bone_spacing = bpy.context.scene.FFFGenPropertyGroup.bone_spacing
     for i in range(0, segment_count):
         # get start and end points for this vector(empty objects)
         bone_start_name = "bone." + str(i)
         bone_end_name = "bone." + str(i+1)
 
         # create the empty which represents the vector
-        bpy.context.scene.cursor.location = (0.0, i * 3.0, 0.0)
-        bpy.ops.object.empty_add(
-            type="ARROWS"
-        )
-        obj_vector = bpy.context.active_object
-        obj_vector.name = "vector." + str(i)
+        obj_vector = bpy.data.objects.new("vector." + str(i), None)
+        obj_vector.empty_display_type = "ARROWS"
+        obj_vector.location = (0.0, i * bone_spacing, 0.0)
+        bpy.context.scene.collection.objects.link(obj_vector)
 
         # assign proper constraints
         constraint_child_of = obj_vector.constraints.new(
@@ -328,38 +410,28 @@ def initialize_fibula_vectors(segment_count, armature):
         )
         obj_vector.hide_set(True)
         objects_vectors[obj_vector.name] = obj_vector
-    
-    bpy.context.scene.cursor.location = (0.0, 0.0, 0.0)
+        object_registry.register_object(constants.ROLE_VECTOR, obj_vector, i)
+
     return objects_vectors
 
 
 def initialize_fibula_duplis(context, obj_fibula, objects_vectors, objects_boolean_cubes):
     objects_fibula_duplis = dict()
+    bone_spacing = bpy.context.scene.FFFGenPropertyGroup.bone_spacing
 
     for counter in range(0, len(objects_vectors.values())):
-        # duplicate the fibula object
+        # linked duplicate of the fibula object, all segments share the fibula mesh
+        # they only differ in their transform, constraints, modifiers and object level material
         obj_vector_empty = objects_vectors["vector." + str(counter)]
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
-        override_context = {
-            "selected_objects":[obj_fibula]
-        }
-        with context.temp_override(**override_context):
-            bpy.ops.object.duplicate()
-        obj_fibula_dupli = bpy.context.selected_objects[0]
-
-        # initial offset on y
-        bpy.context.view_layer.objects.active = obj_fibula_dupli
-        bpy.ops.transform.translate(
-            value=(0.0, counter * (-3.0), 0.0),
-            constraint_axis=(False, True, False),
-            orient_type='LOCAL'
-        )
-
+        obj_fibula_dupli = obj_fibula.copy()
         obj_fibula_dupli.name = "fibula_object." + str(counter)
+        bpy.context.scene.collection.objects.link(obj_fibula_dupli)
+
+        # initial offset on local y
+        offset = mathutils.Vector((0.0, counter * (-bone_spacing), 0.0))
+        obj_fibula_dupli.location = obj_fibula.location + obj_fibula.matrix_world.to_3x3().normalized() @ offset
 
         # init constraints
-        bpy.context.view_layer.objects.active = obj_fibula_dupli
         constraint_child_of = obj_fibula_dupli.constraints.new(
             type="CHILD_OF"
         )
@@ -382,12 +454,10 @@ def initialize_fibula_duplis(context, obj_fibula, objects_vectors, objects_boole
         )
 
         #set material
-        if len(obj_fibula_dupli.data.materials):
-            obj_fibula_dupli.data.materials[0] = materials.get_fibula(counter)
-        else:
-            obj_fibula_dupli.data.materials.append(materials.get_fibula(counter))
+        materials.set_object_material(obj_fibula_dupli, materials.get_fibula(counter))
 
         objects_fibula_duplis[obj_fibula_dupli.name] = obj_fibula_dupli
+        object_registry.register_object(constants.ROLE_FIBULA_SEGMENT, obj_fibula_dupli, counter)
     
     return objects_fibula_duplis
 
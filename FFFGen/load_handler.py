@@ -20,6 +20,7 @@
 
 import bpy
 from bpy.app.handlers import persistent
+from . import object_registry
 
 @persistent
 def on_load_post_handler(dummy):
@@ -30,3 +31,6 @@ def on_load_post_handler(dummy):
         # set the orientation to local by default on load (also will happen for old files)
         for idx in range(0, 4):
             bpy.context.scene.transform_orientation_slots[idx].type = "LOCAL"
+        # files from versions before the object registry, find the objects by name once
+        if not len(properties.object_registry):
+            object_registry.register_legacy_objects()
@@ -24,8 +24,11 @@ import mathutils
 from .move_object_to_collection import move_object_to_collection
 from .external_loading import load_guide_cube, load_positioning_aid_objects, load_screw_hole_mandible
 from .bevel_worldspace import create_bevel_modifier
+from .bone_roi import create_roi_crop
+from .quality_profile import apply_quality_profile
 from . import constants
 from . import materials
+from . import object_registry
 import os
 import math
 
@@ -36,19 +39,32 @@ class CreateMandibleGuides(bpy.types.Operator):
     bl_description = "Creates mandible guides and all necessary objects, modifiers and constraints"
 
     def invoke(self, context, event):
+        create_mandible_guides(context)
+        return {"FINISHED"}
+
+
+def create_mandible_guides(context):
+    # guides are created against the full resolution bone
+    properties = context.scene.FFFGenPropertyGroup
+    quality_profile_old = properties.quality_profile
+    properties.quality_profile = "EXPORT"
+    try:
         create_mandible_visualisation_copy(context)
 
         # get mandible planes
-        cutting_plane_mandible_end = bpy.data.objects["cutting_plane_mandible_end"]
-        cutting_plane_mandible_start = bpy.data.objects["cutting_plane_mandible_start"]
+        cutting_plane_mandible_end = object_registry.get_object(constants.ROLE_CUTTING_PLANE_MANDIBLE_END)
+        cutting_plane_mandible_start = object_registry.get_object(constants.ROLE_CUTTING_PLANE_MANDIBLE_START)
 
         # call the function
-        create_mandible_guide(cutting_plane_mandible_start)
-        create_mandible_guide(cutting_plane_mandible_end)
+        create_mandible_guide(cutting_plane_mandible_start, "start")
+        create_mandible_guide(cutting_plane_mandible_end, "end")
 
         # hide cutting plane collection
         bpy.data.collections[constants.COLLECTION_CUTTING_PLANES_MANDIBLE].hide_viewport = True
-        return {"FINISHED"}
+    finally:
+        # only switched for the creation, the session keeps the profile the user picked
+        properties.quality_profile = quality_profile_old
+    apply_quality_profile(context.scene)
 
 
 def create_mandible_guide_diff_obj(obj_cutting_plane, name):
@@ -142,17 +158,15 @@ def setup_mandible_guide_modifiers(obj_mandible, obj_mandible_guide, obj_boolean
     modifier_difference.object = obj_mandible
 
 
-def create_mandible_guide(obj_cutting_plane):
+def create_mandible_guide(obj_cutting_plane, name):
+    # name is either start or end
     obj_mandible = bpy.context.scene.FFFGenPropertyGroup.mandible_object
     for obj in bpy.context.selected_objects:
         obj.select_set(False)
-    
-    # name is cutting_plane_mandible_end, or cutting_plane_mandible_start
-    # len(cutting_plane_mandible_) = 23
-    name = obj_cutting_plane.name[23:]
 
     # set up obj for boolean diff operation
     obj_boolean_diff = create_mandible_guide_diff_obj(obj_cutting_plane, name)
+    object_registry.register_object("mandible_guide_" + name + "_difference", obj_boolean_diff)
     move_object_to_collection(
         obj_to_move=obj_boolean_diff,
         collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
@@ -162,6 +176,7 @@ def create_mandible_guide(obj_cutting_plane):
     # load the cube, set correct name and move to proper collection
     obj_mandible_guide = load_guide_cube()
     obj_mandible_guide.name = "mandible_guide_" + name
+    object_registry.register_object("mandible_guide_" + name, obj_mandible_guide)
     setup_main_mandible_guide(obj_mandible_guide)
 
     # set uo obj for boolean union operation
@@ -170,6 +185,7 @@ def create_mandible_guide(obj_cutting_plane):
     bpy.ops.object.duplicate()
     obj_boolean_union = bpy.context.selected_objects[0]
     obj_boolean_union.name = "mandible_guide_" + name + "_union"
+    object_registry.register_object("mandible_guide_" + name + "_union", obj_boolean_union)
     setup_union_mandible_guide(obj_boolean_union, obj_mandible_guide)
     obj_boolean_union.select_set(False)
 
@@ -179,6 +195,15 @@ def create_mandible_guide(obj_cutting_plane):
     obj_mandible_guide.location = obj_cutting_plane.location.copy()
     obj_mandible_guide.rotation_euler = obj_cutting_plane.rotation_euler.copy()
 
+    # subtract only the part of the mandible around the guide
+    obj_roi = create_roi_crop(
+        obj_mandible,
+        [obj_mandible_guide, obj_boolean_union],
+        "roi_mandible_guide_" + name,
+        constants.COLLECTION_GUIDE_MANDIBLE
+    )
+    obj_mandible_guide.modifiers["boolean_difference_mandible"].object = obj_roi
+
     #set material
     if len(obj_mandible_guide.data.materials):
         obj_mandible_guide.data.materials[0] = materials.get_guide()
@@ -188,29 +213,22 @@ def create_mandible_guide(obj_cutting_plane):
 
 def create_mandible_visualisation_copy(context):
     # create mandible copies used for better visualisation in the guide creation process
-    obj_mandible = bpy.data.objects["mandible_copy"]
-    obj_mandible_copy = bpy.data.objects["mandible_copy.001"]
-    for obj in bpy.context.selected_objects:
-        obj.select_set(False)
-    override_context = {
-        "selected_objects":[obj_mandible, obj_mandible_copy]
-    }
-
-    # HACK: should make this better, not to reference objects using names(or at least better names...)
-    with context.temp_override(**override_context):
-        bpy.ops.object.duplicate()
-    move_object_to_collection(
-        obj_to_move=bpy.data.objects["mandible_copy.002"],
-        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-        remove_from_current=True
-    )
-    move_object_to_collection(
-        obj_to_move=bpy.data.objects["mandible_copy.003"],
-        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-        remove_from_current=True
-    )
-    for selected in bpy.context.selected_objects:
-        selected.select_set(False)
+    # these are linked duplicates, they share the mesh and only differ in their modifiers and materials
+    obj_mandible = object_registry.get_object(constants.ROLE_MANDIBLE_COPY)
+    obj_mandible_resected = object_registry.get_object(constants.ROLE_MANDIBLE_RESECTED)
+
+    for obj_source, role in [
+        (obj_mandible, constants.ROLE_MANDIBLE_VISUALISATION),
+        (obj_mandible_resected, constants.ROLE_MANDIBLE_RESECTED_VISUALISATION)
+    ]:
+        obj_visualisation = obj_source.copy()
+        bpy.context.scene.collection.objects.link(obj_visualisation)
+        object_registry.register_object(role, obj_visualisation)
+        move_object_to_collection(
+            obj_to_move=obj_visualisation,
+            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+            remove_from_current=True
+        )
 
 
 class CreateMandibleStartScrew(bpy.types.Operator):
@@ -219,52 +237,70 @@ class CreateMandibleStartScrew(bpy.types.Operator):
     bl_description = "Creates a screw on the start side, and adds all neccesary objects, modifiers and constraints"
 
     def invoke(self, context, event):
-        mandible_guide_start = bpy.data.objects["mandible_guide_start"]
-        if "positioning_aid_start" in bpy.data.objects.keys():
-            mandible_positioning_aid = bpy.data.objects["positioning_aid_start"]
-        else:
-            mandible_positioning_aid = None
-        create_mandible_screw(mandible_guide_start, mandible_positioning_aid, "start")
+        create_mandible_start_screw(context)
         return {"FINISHED"}
 
 
+def create_mandible_start_screw(context):
+    mandible_guide_start = object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_START)
+    mandible_positioning_aid = object_registry.get_object(constants.ROLE_POSITIONING_AID_START)
+    obj_screw_hole = create_mandible_screw(mandible_guide_start, mandible_positioning_aid, "start")
+    apply_quality_profile(context.scene)
+    return obj_screw_hole
+
+
 class CreateMandibleEndScrew(bpy.types.Operator):
     bl_idname = "fff_gen.create_mandible_end_screw"
     bl_label = "Create Mandible End Screw"
     bl_description = "Creates a screw on the end side, and adds all neccesary objects, modifiers and constraints"
 
     def invoke(self, context, event):
-        mandible_guide_end = bpy.data.objects["mandible_guide_end"]
-        if "positioning_aid_end" in bpy.data.objects.keys():
-            mandible_positioning_aid = bpy.data.objects["positioning_aid_end"]
-        else:
-            mandible_positioning_aid = None
-        create_mandible_screw(mandible_guide_end, mandible_positioning_aid, "end")
+        create_mandible_end_screw(context)
         return {"FINISHED"}
 
 
+def create_mandible_end_screw(context):
+    mandible_guide_end = object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_END)
+    mandible_positioning_aid = object_registry.get_object(constants.ROLE_POSITIONING_AID_END)
+    obj_screw_hole = create_mandible_screw(mandible_guide_end, mandible_positioning_aid, "end")
+    apply_quality_profile(context.scene)
+    return obj_screw_hole
+
+
 class JoinMandibleGuides(bpy.types.Operator):
     bl_idname = "fff_gen.join_mandible_guides"
     bl_label = "Join mandible guides"
     bl_description = "Connects start and end mandible guides with a simple objects and merges them together"
 
     def invoke(self, context, event):
-        obj_guide_start = bpy.data.objects["mandible_guide_start"]
-        obj_guide_end = bpy.data.objects["mandible_guide_end"]
-        obj_mandible = bpy.context.scene.FFFGenPropertyGroup.mandible_object
-
-        obj_guide = create_mandible_guide_join_cube(obj_guide_start, obj_guide_end)
-        setup_mandible_joined_modifiers(obj_guide_start, obj_guide_end, obj_mandible, obj_guide)
-
-        # set material
-        if len(obj_guide.data.materials):
-            obj_guide.data.materials[0] = materials.get_guide()
-        else:
-            obj_guide.data.materials.append(materials.get_guide())
-        
+        join_mandible_guides(context)
         return {"FINISHED"}
 
 
+def join_mandible_guides(context):
+    obj_guide_start = object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_START)
+    obj_guide_end = object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_END)
+    obj_mandible = bpy.context.scene.FFFGenPropertyGroup.mandible_object
+
+    obj_guide = create_mandible_guide_join_cube(obj_guide_start, obj_guide_end)
+    # the start and end guides already subtract the mandible, the join cube only needs the part around it
+    obj_roi = create_roi_crop(
+        obj_mandible,
+        [obj_guide],
+        "roi_joined_mandible_guide",
+        constants.COLLECTION_GUIDE_MANDIBLE
+    )
+    setup_mandible_joined_modifiers(obj_guide_start, obj_guide_end, obj_roi, obj_guide)
+
+    # set material
+    if len(obj_guide.data.materials):
+        obj_guide.data.materials[0] = materials.get_guide()
+    else:
+        obj_guide.data.materials.append(materials.get_guide())
+    
+    apply_quality_profile(context.scene)
+
+
 def compute_positioning_aid_matrix(cutting_plane_obj, mandible_guide_obj):
     cutting_plane_mat_norm = cutting_plane_obj.matrix_world.normalized()
     guide_obj_pos = mandible_guide_obj.matrix_world.translation
@@ -296,124 +332,147 @@ class CreateMandiblePositioningAid(bpy.types.Operator):
     bl_description = "Creates the mandible positioning aid using the existing mandible guide objects"
 
     def invoke(self, context, event):
-        # get the needed collections
-        collection_mandible_guide = bpy.data.collections[constants.COLLECTION_GUIDE_MANDIBLE]
-
-        # load the required objects from the scene
-        load_positioning_aid_objects()
-        obj_positioning_aid_curve = bpy.data.objects["positioning_aid_curve"]
-        obj_positioning_aid_curve_handle_start = bpy.data.objects["positioning_aid_curve_handle_start"]
-        obj_positioning_aid_curve_handle_end = bpy.data.objects["positioning_aid_curve_handle_end"]
-        obj_positioning_aid_start = bpy.data.objects["positioning_aid_start"]
-        obj_positioning_aid_end = bpy.data.objects["positioning_aid_end"]
-        obj_positioning_aid = bpy.data.objects["positioning_aid_mesh"]
-
-        # move loaded objects to collections...
-        move_object_to_collection(
-            obj_to_move=obj_positioning_aid_curve,
-            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-            remove_from_current=True
-        )
-        move_object_to_collection(
-            obj_to_move=obj_positioning_aid_start,
-            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-            remove_from_current=True
-        )
-        move_object_to_collection(
-            obj_to_move=obj_positioning_aid_end,
-            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-            remove_from_current=True
-        )
-        move_object_to_collection(
-            obj_to_move=obj_positioning_aid_curve_handle_start,
-            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-            remove_from_current=True
-        )
-        move_object_to_collection(
-            obj_to_move=obj_positioning_aid_curve_handle_end,
-            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-            remove_from_current=True
-        )
-        move_object_to_collection(
-            obj_to_move=obj_positioning_aid,
-            collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
-            remove_from_current=True
-        )
+        create_mandible_positioning_aid(context)
+        return {"FINISHED"}
+
+
+def create_mandible_positioning_aid(context):
+    # load the required objects from the scene
+    # the objects are stored in the file under the same names as their roles
+    objects_loaded = load_positioning_aid_objects()
+    for role in [
+        constants.ROLE_POSITIONING_AID_CURVE,
+        constants.ROLE_POSITIONING_AID_CURVE_HANDLE_START,
+        constants.ROLE_POSITIONING_AID_CURVE_HANDLE_END,
+        constants.ROLE_POSITIONING_AID_START,
+        constants.ROLE_POSITIONING_AID_END,
+        constants.ROLE_POSITIONING_AID_MESH
+    ]:
+        object_registry.register_object(role, objects_loaded[role])
+    obj_positioning_aid_curve = objects_loaded[constants.ROLE_POSITIONING_AID_CURVE]
+    obj_positioning_aid_curve_handle_start = objects_loaded[constants.ROLE_POSITIONING_AID_CURVE_HANDLE_START]
+    obj_positioning_aid_curve_handle_end = objects_loaded[constants.ROLE_POSITIONING_AID_CURVE_HANDLE_END]
+    obj_positioning_aid_start = objects_loaded[constants.ROLE_POSITIONING_AID_START]
+    obj_positioning_aid_end = objects_loaded[constants.ROLE_POSITIONING_AID_END]
+    obj_positioning_aid = objects_loaded[constants.ROLE_POSITIONING_AID_MESH]
+
+    # move loaded objects to collections...
+    move_object_to_collection(
+        obj_to_move=obj_positioning_aid_curve,
+        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+        remove_from_current=True
+    )
+    move_object_to_collection(
+        obj_to_move=obj_positioning_aid_start,
+        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+        remove_from_current=True
+    )
+    move_object_to_collection(
+        obj_to_move=obj_positioning_aid_end,
+        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+        remove_from_current=True
+    )
+    move_object_to_collection(
+        obj_to_move=obj_positioning_aid_curve_handle_start,
+        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+        remove_from_current=True
+    )
+    move_object_to_collection(
+        obj_to_move=obj_positioning_aid_curve_handle_end,
+        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+        remove_from_current=True
+    )
+    move_object_to_collection(
+        obj_to_move=obj_positioning_aid,
+        collection_name=constants.COLLECTION_GUIDE_MANDIBLE,
+        remove_from_current=True
+    )
+
+    # compute the matrix for positioning aid start/end parts
+    # it will have the scale/translation/rotation components set in such a way that it aligns well with existing objects.
+    pos_aid_matrix_start = compute_positioning_aid_matrix(
+        object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_START_DIFFERENCE),
+        object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_START)
+    )
+    pos_aid_matrix_end = compute_positioning_aid_matrix(
+        object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_END_DIFFERENCE),
+        object_registry.get_object(constants.ROLE_MANDIBLE_GUIDE_END)
+    )
+
+    # set the matrix for start/end
+    obj_positioning_aid_start.matrix_world = pos_aid_matrix_start
+    obj_positioning_aid_end.matrix_world = pos_aid_matrix_end
+
+    # set the matrix for curve handles...
+    obj_positioning_aid_curve_handle_start.matrix_world = pos_aid_matrix_start
+    obj_positioning_aid_curve_handle_end.matrix_world = pos_aid_matrix_end
+
+    # add bevel to positioning aid
+    bevel_seg = bpy.context.scene.FFFGenPropertyGroup.bevel_segmentcount
+    bevel_width = bpy.context.scene.FFFGenPropertyGroup.bevel_width
+    create_bevel_modifier(obj_positioning_aid_start, "fffgen_bevel_" + obj_positioning_aid_start.name, bevel_seg, bevel_width)
+    create_bevel_modifier(obj_positioning_aid_end, "fffgen_bevel_" + obj_positioning_aid_end.name, bevel_seg, bevel_width)
+
+    # add boolean modifiers with the mandible objects where necessary (for start and end of positioning aid)
+    # the rest of the booleans to merge the positioning aid together already exist on the curve object.
+    modifier_difference_start = obj_positioning_aid_start.modifiers.new(
+        name="boolean_difference_mandible",
+        type="BOOLEAN"
+    )
+    modifier_difference_start.operation = "DIFFERENCE"
+    modifier_difference_start.object = create_roi_crop(
+        bpy.context.scene.FFFGenPropertyGroup.mandible_object,
+        [obj_positioning_aid_start],
+        "roi_positioning_aid_start",
+        constants.COLLECTION_GUIDE_MANDIBLE
+    )
+    
+    modifier_difference_end = obj_positioning_aid_end.modifiers.new(
+        name="boolean_difference_mandible",
+        type="BOOLEAN"
+    )
+    modifier_difference_end.operation = "DIFFERENCE"
+    modifier_difference_end.object = create_roi_crop(
+        bpy.context.scene.FFFGenPropertyGroup.mandible_object,
+        [obj_positioning_aid_end],
+        "roi_positioning_aid_end",
+        constants.COLLECTION_GUIDE_MANDIBLE
+    )
+
 
-        # compute the matrix for positioning aid start/end parts
-        # it will have the scale/translation/rotation components set in such a way that it aligns well with existing objects.
-        pos_aid_matrix_start = compute_positioning_aid_matrix(bpy.data.objects["mandible_guide_start_difference"], bpy.data.objects["mandible_guide_start"])
-        pos_aid_matrix_end = compute_positioning_aid_matrix(bpy.data.objects["mandible_guide_end_difference"], bpy.data.objects["mandible_guide_end"])
-
-        # set the matrix for start/end
-        obj_positioning_aid_start.matrix_world = pos_aid_matrix_start
-        obj_positioning_aid_end.matrix_world = pos_aid_matrix_end
-
-        # set the matrix for curve handles...
-        obj_positioning_aid_curve_handle_start.matrix_world = pos_aid_matrix_start
-        obj_positioning_aid_curve_handle_end.matrix_world = pos_aid_matrix_end
-
-        # add bevel to positioning aid
-        bevel_seg = bpy.context.scene.FFFGenPropertyGroup.bevel_segmentcount
-        bevel_width = bpy.context.scene.FFFGenPropertyGroup.bevel_width
-        create_bevel_modifier(obj_positioning_aid_start, "fffgen_bevel_" + obj_positioning_aid_start.name, bevel_seg, bevel_width)
-        create_bevel_modifier(obj_positioning_aid_end, "fffgen_bevel_" + obj_positioning_aid_end.name, bevel_seg, bevel_width)
-
-        # add boolean modifiers with the mandible objects where necessary (for start and end of positioning aid)
-        # the rest of the booleans to merge the positioning aid together already exist on the curve object.
-        modifier_difference_start = obj_positioning_aid_start.modifiers.new(
-            name="boolean_difference_mandible",
+    # TODO: (Luka) add constraint, copy location, y axis, both target and owner in local_space. 
+    # this makes sure that the positioning aid will remain aligned with the guide when translated.
+    # scaling will not misalign it, as the origin is on the cutting plane.
+
+    # find existing screws for start, end 
+    objects_screw_start = object_registry.get_indexed_objects(constants.ROLE_MANDIBLE_GUIDE_START_SCREW_HOLE).values()
+    objects_screw_end = object_registry.get_indexed_objects(constants.ROLE_MANDIBLE_GUIDE_END_SCREW_HOLE).values()
+
+    # init the boolean modifiers for start using the existing screws
+    for screw_start_obj in objects_screw_start:
+        obj_positioning_aid_start.select_set(True)
+        bpy.context.view_layer.objects.active = obj_positioning_aid_start
+        modifier_mandible_aid_screw = obj_positioning_aid_start.modifiers.new(
+            name="boolean_difference_screw",
             type="BOOLEAN"
         )
-        modifier_difference_start.operation = "DIFFERENCE"
-        modifier_difference_start.object = bpy.context.scene.FFFGenPropertyGroup.mandible_object
-        
-        modifier_difference_end = obj_positioning_aid_end.modifiers.new(
-            name="boolean_difference_mandible",
+        modifier_mandible_aid_screw.operation = "DIFFERENCE"
+        modifier_mandible_aid_screw.object = screw_start_obj
+        obj_positioning_aid_start.select_set(False)
+    
+    # init the boolean modifiers for end using the existing screws
+    for screw_end_obj in objects_screw_end:
+        obj_positioning_aid_end.select_set(True)
+        bpy.context.view_layer.objects.active = obj_positioning_aid_end
+        modifier_mandible_aid_screw = obj_positioning_aid_end.modifiers.new(
+            name="boolean_difference_screw",
             type="BOOLEAN"
         )
-        modifier_difference_end.operation = "DIFFERENCE"
-        modifier_difference_end.object = bpy.context.scene.FFFGenPropertyGroup.mandible_object
-
-
-        # TODO: (Luka) add constraint, copy location, y axis, both target and owner in local_space. 
-        # this makes sure that the positioning aid will remain aligned with the guide when translated.
-        # scaling will not misalign it, as the origin is on the cutting plane.
-
-        # find existing screws for start, end 
-        objects_screw_start = []
-        objects_screw_end = []
-        for obj in collection_mandible_guide.objects:
-            if obj.name_full.startswith("mandible_guide_start_screw_hole"):
-                objects_screw_start.append(obj)
-            elif obj.name_full.startswith("mandible_guide_end_screw_hole"):
-                objects_screw_end.append(obj)
-
-        # init the boolean modifiers for start using the existing screws
-        for screw_start_obj in objects_screw_start:
-            obj_positioning_aid_start.select_set(True)
-            bpy.context.view_layer.objects.active = obj_positioning_aid_start
-            modifier_mandible_aid_screw = obj_positioning_aid_start.modifiers.new(
-                name="boolean_difference_screw",
-                type="BOOLEAN"
-            )
-            modifier_mandible_aid_screw.operation = "DIFFERENCE"
-            modifier_mandible_aid_screw.object = screw_start_obj
-            obj_positioning_aid_start.select_set(False)
-        
-        # init the boolean modifiers for end using the existing screws
-        for screw_end_obj in objects_screw_end:
-            obj_positioning_aid_end.select_set(True)
-            bpy.context.view_layer.objects.active = obj_positioning_aid_end
-            modifier_mandible_aid_screw = obj_positioning_aid_end.modifiers.new(
-                name="boolean_difference_screw",
-                type="BOOLEAN"
-            )
-            modifier_mandible_aid_screw.operation = "DIFFERENCE"
-            modifier_mandible_aid_screw.object = screw_end_obj
-            obj_positioning_aid_end.select_set(False)
+        modifier_mandible_aid_screw.operation = "DIFFERENCE"
+        modifier_mandible_aid_screw.object = screw_end_obj
+        obj_positioning_aid_end.select_set(False)
 
-        return {"FINISHED"}
+    apply_quality_profile(context.scene)
 
 
 def create_mandible_screw_cylinder(obj_mandible_guide, name):
@@ -421,6 +480,8 @@ def create_mandible_screw_cylinder(obj_mandible_guide, name):
     obj_screw_hole = load_screw_hole_mandible()
     bpy.context.view_layer.objects.active = obj_screw_hole
     obj_screw_hole.name = "mandible_guide_" + name + "_screw_hole"
+    role = "mandible_guide_" + name + "_screw_hole"
+    object_registry.register_object(role, obj_screw_hole, object_registry.get_next_index(role))
     obj_screw_hole.display_type = "WIRE"
     obj_screw_hole.location = obj_mandible_guide.location
     diameter = bpy.context.scene.FFFGenPropertyGroup.screw_hole_diameter
@@ -492,6 +553,7 @@ def create_mandible_screw(obj_mandible_guide, obj_positioning_aid, name):
     )
     obj_screw_hole.select_set(True)
     bpy.context.view_layer.objects.active = obj_screw_hole
+    return obj_screw_hole
 
 
 def create_mandible_guide_join_cube(obj_guide_start, obj_guide_end):
@@ -500,6 +562,7 @@ def create_mandible_guide_join_cube(obj_guide_start, obj_guide_end):
     bpy.ops.mesh.primitive_cube_add(size=1.0, enter_editmode=False, location=co)
     obj_guide = bpy.context.active_object
     obj_guide.name = "joined_mandible_guide"
+    object_registry.register_object(constants.ROLE_MANDIBLE_GUIDE_JOINED, obj_guide)
     # offset it on z axis lower
     z_dist = (obj_guide_start.dimensions[2] + obj_guide_end.dimensions[2]) / 4
     obj_guide.location[2] -= z_dist
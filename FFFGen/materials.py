@@ -23,6 +23,15 @@ import bpy
 import mathutils
 
 
+def set_object_material(obj, mat):
+    # the material is linked to the object instead of the mesh,
+    # so objects sharing one mesh (eg. fibula segments) can each have their own material
+    if not len(obj.material_slots):
+        obj.data.materials.append(None)
+    obj.material_slots[0].link = "OBJECT"
+    obj.material_slots[0].material = mat
+
+
 def get_transparent():
     mat = bpy.data.materials.get("Transparent")
     if mat is None:
@@ -0,0 +1,176 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+from . import constants
+
+
+# the registry maps object roles (eg. fibula segment 2, start cutting plane of segment 0...)
+# to the objects created by the add-on. it is stored in FFFGenPropertyGroup.object_registry,
+# each entry is named by its role key, so lookups do not depend on object names or the number of objects in the file.
+# lookups never write to the registry, so they are safe to use in panels, property getters and handlers.
+
+# roles with a single object, and roles with an index (role.index)
+SINGLE_ROLES = [
+    constants.ROLE_ARMATURE,
+    constants.ROLE_FIBULA_COPY,
+    constants.ROLE_MANDIBLE_COPY,
+    constants.ROLE_MANDIBLE_RESECTED,
+    constants.ROLE_MANDIBLE_VISUALISATION,
+    constants.ROLE_MANDIBLE_RESECTED_VISUALISATION,
+    constants.ROLE_MANDIBLE_RESECTION_CUTTER,
+    constants.ROLE_CUTTING_PLANE_MANDIBLE_START,
+    constants.ROLE_CUTTING_PLANE_MANDIBLE_END,
+    constants.ROLE_FIBULA_GUIDE,
+    constants.ROLE_MANDIBLE_GUIDE_START,
+    constants.ROLE_MANDIBLE_GUIDE_END,
+    constants.ROLE_MANDIBLE_GUIDE_START_DIFFERENCE,
+    constants.ROLE_MANDIBLE_GUIDE_END_DIFFERENCE,
+    constants.ROLE_MANDIBLE_GUIDE_START_UNION,
+    constants.ROLE_MANDIBLE_GUIDE_END_UNION,
+    constants.ROLE_MANDIBLE_GUIDE_JOINED,
+    constants.ROLE_POSITIONING_AID_CURVE,
+    constants.ROLE_POSITIONING_AID_CURVE_HANDLE_START,
+    constants.ROLE_POSITIONING_AID_CURVE_HANDLE_END,
+    constants.ROLE_POSITIONING_AID_START,
+    constants.ROLE_POSITIONING_AID_END,
+    constants.ROLE_POSITIONING_AID_MESH
+]
+INDEXED_ROLES = [
+    constants.ROLE_BOOLEAN_CUBE,
+    constants.ROLE_MANDIBLE_BOOLEAN_CUBE,
+    constants.ROLE_VECTOR,
+    constants.ROLE_FIBULA_SEGMENT,
+    constants.ROLE_FIBULA_DUPLI,
+    constants.ROLE_CUTTING_PLANE_FIBULA_START,
+    constants.ROLE_CUTTING_PLANE_FIBULA_END
+]
+
+# objects created by older versions are not registered, they are registered by name when such a file is loaded.
+# these roles used names which do not follow the role.index pattern
+LEGACY_NAMES = {
+    constants.ROLE_MANDIBLE_RESECTED: "mandible_copy.001",
+    constants.ROLE_MANDIBLE_VISUALISATION: "mandible_copy.002",
+    constants.ROLE_MANDIBLE_RESECTED_VISUALISATION: "mandible_copy.003"
+}
+
+
+def get_registry():
+    return bpy.context.scene.FFFGenPropertyGroup.object_registry
+
+
+def get_role_key(role, index=-1):
+    if index < 0:
+        return role
+    return role + "." + str(index)
+
+
+def is_valid(obj):
+    # objects deleted with bpy.ops.object.delete are only unlinked while the registry still references them
+    return obj is not None and len(obj.users_collection) > 0
+
+
+def register_object(role, obj, index=-1):
+    registry = get_registry()
+    key = get_role_key(role, index)
+    entry = registry.get(key)
+    if entry is None:
+        entry = registry.add()
+        entry.name = key
+        entry.role = role
+        entry.index = index
+    entry.obj = obj
+    return obj
+
+
+def get_next_index(role):
+    # next free index for roles with a variable number of objects (eg. screw holes)
+    indices = get_indexed_objects(role).keys()
+    if not indices:
+        return 0
+    return max(indices) + 1
+
+
+def get_object(role, index=-1):
+    # returns the object with the given role or None
+    entry = get_registry().get(get_role_key(role, index))
+    if entry is not None and is_valid(entry.obj):
+        return entry.obj
+    return None
+
+
+def get_indexed_objects(role):
+    # returns a dictionary index -> object for all objects with the given role
+    objects = dict()
+    for entry in get_registry():
+        if entry.role == role and is_valid(entry.obj):
+            objects[entry.index] = entry.obj
+    return objects
+
+
+def get_registered_objects(scene, roles):
+    # set of all objects with any of the given roles
+    objects = set()
+    for entry in scene.FFFGenPropertyGroup.object_registry:
+        if entry.role in roles and entry.obj is not None:
+            objects.add(entry.obj)
+    return objects
+
+
+def remove_stale_entries():
+    # drop entries of objects which were deleted
+    registry = get_registry()
+    for index in reversed(range(len(registry))):
+        if not is_valid(registry[index].obj):
+            registry.remove(index)
+
+
+def clear_registry():
+    get_registry().clear()
+
+
+def register_legacy_objects():
+    # registers objects of a file created before the registry existed, using their names
+    for role in SINGLE_ROLES:
+        if get_object(role) is None:
+            obj = bpy.data.objects.get(LEGACY_NAMES.get(role, role))
+            if is_valid(obj):
+                register_object(role, obj)
+    for role in INDEXED_ROLES:
+        if get_indexed_objects(role):
+            continue
+        prefix = role + "."
+        for obj in bpy.data.objects:
+            if obj.name.startswith(prefix) and obj.name[len(prefix):].isdigit() and is_valid(obj):
+                register_object(role, obj, int(obj.name[len(prefix):]))
+    # screw holes were only distinguished by the suffix added by blender
+    for role in [
+        constants.ROLE_FIBULA_GUIDE_SCREW_HOLE,
+        constants.ROLE_MANDIBLE_GUIDE_START_SCREW_HOLE,
+        constants.ROLE_MANDIBLE_GUIDE_END_SCREW_HOLE
+    ]:
+        if get_indexed_objects(role):
+            continue
+        index = 0
+        for obj in bpy.data.objects:
+            if obj.name.startswith(role) and is_valid(obj):
+                register_object(role, obj, index)
+                index = index + 1
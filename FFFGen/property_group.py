@@ -21,7 +21,30 @@
 
 import bpy
 from bpy.types import PropertyGroup, Panel
-from bpy.props import BoolProperty, FloatProperty, IntProperty, PointerProperty, StringProperty, EnumProperty
+from bpy.props import BoolProperty, CollectionProperty, FloatProperty, IntProperty, PointerProperty, StringProperty, EnumProperty
+from . import bone_roi
+from . import constants
+from . import object_registry
+from . import quality_profile
+from . import update
+
+
+class FFFGenObjectRole(PropertyGroup):
+    # entry of the object registry, the name is the role key (eg. fibula_object.2)
+    role: StringProperty(
+        name="Role",
+        default=""
+    )
+
+    index: IntProperty(
+        name="Index",
+        default=-1
+    )
+
+    obj: PointerProperty(
+        type=bpy.types.Object,
+        name="Object"
+    )
 
 
 class FFFGenPropertyGroup(PropertyGroup):
@@ -62,46 +85,122 @@ class FFFGenPropertyGroup(PropertyGroup):
         # and the API does not provide a nice way to access the local collection data...
         is_guide = self.positioning_aid_toggle == "GUIDE"
 
-        guide_object_names = [
-            "joined_mandible_guide",
-            "mandible_guide_end",
-            "mandible_guide_end_union",
-            "mandible_guide_start",
-            "mandible_guide_start_union"
+        guide_object_roles = [
+            constants.ROLE_MANDIBLE_GUIDE_JOINED,
+            constants.ROLE_MANDIBLE_GUIDE_END,
+            constants.ROLE_MANDIBLE_GUIDE_END_UNION,
+            constants.ROLE_MANDIBLE_GUIDE_START,
+            constants.ROLE_MANDIBLE_GUIDE_START_UNION
         ]
-        positioning_aid_object_names = [
-            "positioning_aid_curve",
-            "positioning_aid_curve_handle_start",
-            "positioning_aid_curve_handle_end",
-            "positioning_aid_start",
-            "positioning_aid_end",
-            "positioning_aid_mesh"
+        positioning_aid_object_roles = [
+            constants.ROLE_POSITIONING_AID_CURVE,
+            constants.ROLE_POSITIONING_AID_CURVE_HANDLE_START,
+            constants.ROLE_POSITIONING_AID_CURVE_HANDLE_END,
+            constants.ROLE_POSITIONING_AID_START,
+            constants.ROLE_POSITIONING_AID_END,
+            constants.ROLE_POSITIONING_AID_MESH
         ]
 
         # common objects (eg screws, plane, etc... remain visible all the time and are not toggled)
-        for obj_name in guide_object_names:
-            if obj_name in bpy.data.objects.keys():
-                bpy.data.objects[obj_name].hide_set(not is_guide)
-        for obj_name in positioning_aid_object_names:
-            if obj_name in bpy.data.objects.keys():
-                bpy.data.objects[obj_name].hide_set(is_guide)
+        for role in guide_object_roles:
+            obj = object_registry.get_object(role)
+            if obj is not None:
+                obj.hide_set(not is_guide)
+        for role in positioning_aid_object_roles:
+            obj = object_registry.get_object(role)
+            if obj is not None:
+                obj.hide_set(is_guide)
+        return
+
+    def roi_margin_update(self, context):
+        bone_roi.refresh_roi_crops(force=True)
+        return
+
+    def quality_profile_update(self, context):
+        quality_profile.apply_quality_profile(context.scene)
         return
 
     def on_auto_update_toggle(self, context):
         if self.auto_update_toggle == True:
-            bpy.ops.fff_gen.auto_update_modal("INVOKE_DEFAULT")
+            update.start_auto_update()
         return
 
+    object_registry: CollectionProperty(
+        type=FFFGenObjectRole,
+        name="Object registry",
+        description="Objects created by the add-on, by their role"
+    )
+
     auto_decimate: BoolProperty(
         default=False,
-        description="Decimate objects on initialization",
+        description="Build decimated proxy meshes on initialization, used while positioning. The original meshes are kept for guides and export",
         name="Auto Decimate"
     )
 
+    mandible_mesh_full: PointerProperty(
+        type=bpy.types.Mesh,
+        name="Mandible mesh"
+    )
+
+    mandible_mesh_proxy: PointerProperty(
+        type=bpy.types.Mesh,
+        name="Mandible proxy mesh"
+    )
+
+    fibula_mesh_full: PointerProperty(
+        type=bpy.types.Mesh,
+        name="Fibula mesh"
+    )
+
+    fibula_mesh_proxy: PointerProperty(
+        type=bpy.types.Mesh,
+        name="Fibula proxy mesh"
+    )
+
     auto_update_toggle: BoolProperty(
         default=False,
         update=on_auto_update_toggle,
-        description="Toggle auto update function on or off"
+        description="Toggle auto update function on or off.\nFibula objects are updated whenever the bones are moved"
+    )
+
+    update_rate_auto: BoolProperty(
+        default=True,
+        name="Adaptive update rate",
+        description="Choose the auto update delay based on how long updating the fibula objects takes"
+    )
+
+    update_rate: FloatProperty(
+        name="Update delay(seconds)",
+        default=0.2,
+        min=0.0,
+        description="Minimum time between two updates of the fibula objects while they are being moved.\nUsed when the adaptive update rate is off"
+    )
+
+    update_cpu_budget: FloatProperty(
+        name="CPU budget",
+        default=0.5,
+        min=0.05,
+        max=1.0,
+        subtype="FACTOR",
+        description="Largest fraction of time spent updating fibula objects while the bones are being moved"
+    )
+
+    update_rate_current: FloatProperty(
+        name="Current update delay(seconds)",
+        default=0.02,
+        description="Update delay chosen by the adaptive update rate"
+    )
+
+    update_cost: FloatProperty(
+        name="Update time(seconds)",
+        default=0.0,
+        description="Measured time needed to update the fibula objects"
+    )
+
+    update_in_background: BoolProperty(
+        default=False,
+        name="Update in background",
+        description="Compute fibula segments in background threads while auto update is on.\nOnly used with the half space segment cut method"
     )
 
     cutting_plane_thickness: FloatProperty(
@@ -151,6 +250,42 @@ class FFFGenPropertyGroup(PropertyGroup):
         default=3.0
     )
 
+    quality_profile: EnumProperty(
+        items=[
+            ("INTERACTIVE", "Interactive", "Fast booleans, no bevels and decimated bone objects, for positioning", 1),
+            ("EXPORT", "Export", "Exact booleans, full bevels and full resolution bone objects, as exported", 2)
+        ],
+        name="Quality",
+        description="Quality of the modifiers created by the add-on. Export always uses the export quality",
+        default="INTERACTIVE",
+        update=quality_profile_update
+    )
+
+    proxy_face_count: IntProperty(
+        name="Proxy face count",
+        description="Number of faces of the proxy meshes built on initialization",
+        default=20000,
+        min=1000
+    )
+
+    roi_margin: FloatProperty(
+        name="Bone crop margin",
+        description="Margin around the guides, only the bone inside the guide bounds and this margin is subtracted from the guides",
+        default=5.0,
+        min=0.0,
+        update=roi_margin_update
+    )
+
+    segment_cut_method: EnumProperty(
+        items=[
+            ("HALF_SPACE", "Half Space", "Clip the fibula directly against the two cutting planes of each segment", 1),
+            ("BOOLEAN", "Boolean", "Apply the boolean modifier of each segment", 2)
+        ],
+        name="Segment cut method",
+        description="How the fibula segments are computed for visualisation and export",
+        default="HALF_SPACE"
+    )
+
     segment_count: IntProperty(
         name="Fibula segment count",
         description="Number of individual fibula segments.",
@@ -158,12 +293,6 @@ class FFFGenPropertyGroup(PropertyGroup):
         min=1
     )
 
-    update_rate: FloatProperty(
-        name="Update rate(seconds)",
-        default=0.2,
-        description="How often to update fibula objects when auto update is running.\nChange this based on your system performance"
-    )
-
     positioning_aid_toggle: EnumProperty(
         items=[
             ("GUIDE", "Guide", "Editing the mandible guide", 1),
@@ -176,24 +305,24 @@ class FFFGenPropertyGroup(PropertyGroup):
     )
 
     def positioning_aid_size_x_set_val(self, value):
-        if "positioning_aid_mesh" in bpy.data.objects.keys():
-            obj = bpy.data.objects["positioning_aid_mesh"]
+        obj = object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH)
+        if obj is not None:
             obj.scale[0] = value
 
     def positioning_aid_size_z_set_val(self, value):
-        if "positioning_aid_mesh" in bpy.data.objects.keys():
-            obj = bpy.data.objects["positioning_aid_mesh"]
+        obj = object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH)
+        if obj is not None:
             obj.scale[2] = value
 
     def positioning_aid_size_x_get_val(self):
-        if "positioning_aid_mesh" in bpy.data.objects.keys():
-            obj = bpy.data.objects["positioning_aid_mesh"]
+        obj = object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH)
+        if obj is not None:
             return obj.scale[0]
         return 0.0
     
     def positioning_aid_size_z_get_val(self):
-        if "positioning_aid_mesh" in bpy.data.objects.keys():
-            obj = bpy.data.objects["positioning_aid_mesh"]
+        obj = object_registry.get_object(constants.ROLE_POSITIONING_AID_MESH)
+        if obj is not None:
             return obj.scale[2]
         return 0.0
 
@@ -271,6 +400,13 @@ class FFFGenPropertyGroup(PropertyGroup):
                     mod.width = val
         return
 
+    bone_spacing: FloatProperty(
+        name="Bone spacing",
+        description="Distance between the armature bones, computed from the fibula length on initialization",
+        default=3.0,
+        min=0.0
+    )
+
     bevel_segmentcount: IntProperty(
         name="Bevel segment count",
         description="Number of bevel segments.",
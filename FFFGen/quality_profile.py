@@ -0,0 +1,148 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+from . import constants
+from . import object_registry
+
+
+# the quality profile retargets all modifiers created by the add-on.
+# INTERACTIVE - fast boolean solver, no bevels, proxy bone meshes. used while positioning.
+# EXPORT - exact boolean solver, full bevels, full resolution bone meshes. used for guide creation and the final stl files.
+# the proxy meshes are built on initialization (see initialize_rig.build_proxy_meshes),
+# the bone objects share either the full or the proxy mesh, the original objects always keep the full mesh.
+
+# live decimate modifier, replaced by the proxy meshes. removed if still present in a file
+PROXY_DECIMATE_NAME = "fffgen_proxy_decimate"
+
+# collections with the objects created by the add-on
+FFF_GEN_COLLECTIONS = [
+    constants.COLLECTION_FFF_GEN_FIBULA,
+    constants.COLLECTION_FFF_GEN_MANDIBLE,
+    constants.COLLECTION_GUIDE_FIBULA,
+    constants.COLLECTION_GUIDE_MANDIBLE,
+    constants.COLLECTION_CUTTING_PLANES_FIBULA,
+    constants.COLLECTION_CUTTING_PLANES_MANDIBLE
+]
+
+# bone objects which switch between the full and the proxy mesh
+FIBULA_PROXY_ROLES = [
+    constants.ROLE_FIBULA_SEGMENT,
+    constants.ROLE_FIBULA_COPY
+]
+MANDIBLE_PROXY_ROLES = [
+    constants.ROLE_MANDIBLE_COPY,
+    constants.ROLE_MANDIBLE_RESECTED,
+    constants.ROLE_MANDIBLE_VISUALISATION,
+    constants.ROLE_MANDIBLE_RESECTED_VISUALISATION
+]
+
+# the world space bevel is made of a bevel between two geometry node modifiers, see bevel_worldspace.py
+BEVEL_MODIFIER_PREFIXES = [
+    "fffgen_bevel",
+    "geo_object_to_world",
+    "geo_world_to_object"
+]
+
+
+def get_fff_gen_objects():
+    objects = set()
+    for collection_name in FFF_GEN_COLLECTIONS:
+        collection = bpy.data.collections.get(collection_name)
+        if collection is not None:
+            objects.update(collection.objects)
+    return objects
+
+
+def get_proxy_objects(roles):
+    objects = set()
+    for role in roles:
+        objects.update(object_registry.get_indexed_objects(role).values())
+        obj = object_registry.get_object(role)
+        if obj is not None:
+            objects.add(obj)
+    return objects
+
+
+def is_bevel_modifier(modifier):
+    for prefix in BEVEL_MODIFIER_PREFIXES:
+        if modifier.name.startswith(prefix):
+            return True
+    return False
+
+
+def set_bone_mesh(objects, mesh_full, mesh_proxy, use_proxy):
+    # objects without proxies (auto decimate off) keep the mesh they have
+    mesh = mesh_proxy if use_proxy else mesh_full
+    if mesh is None:
+        return
+    for obj in objects:
+        modifier = obj.modifiers.get(PROXY_DECIMATE_NAME)
+        if modifier is not None:
+            obj.modifiers.remove(modifier)
+        if obj.data != mesh:
+            swap_mesh(obj, mesh)
+
+
+def swap_mesh(obj, mesh):
+    # blender resizes the material array of the object to the slot count of the new mesh,
+    # which would drop the object linked materials (see materials.set_object_material).
+    # the new mesh gets at least as many slots and the object linked materials are set again after the swap
+    slots = [(slot.link, slot.material) for slot in obj.material_slots]
+    while len(mesh.materials) < len(slots):
+        mesh.materials.append(None)
+    obj.data = mesh
+    for slot, (link, material) in zip(obj.material_slots, slots):
+        if link == "OBJECT":
+            slot.link = "OBJECT"
+            slot.material = material
+
+
+def apply_quality_profile(scene):
+    properties = scene.FFFGenPropertyGroup
+    is_interactive = properties.quality_profile == "INTERACTIVE"
+
+    for obj in get_fff_gen_objects():
+        # frozen guides keep their baked mesh and hidden modifiers until thawed
+        if constants.PROP_LIVE_MESH in obj.keys():
+            continue
+        for modifier in obj.modifiers:
+            if modifier.type == "BOOLEAN":
+                # self intersection and collection operands (files made before the joined cutter) are only supported by the exact solver
+                if is_interactive and not modifier.use_self and modifier.operand_type == "OBJECT":
+                    modifier.solver = "FAST"
+                else:
+                    modifier.solver = "EXACT"
+            elif is_bevel_modifier(modifier):
+                modifier.show_viewport = not is_interactive
+
+    set_bone_mesh(
+        get_proxy_objects(FIBULA_PROXY_ROLES),
+        properties.fibula_mesh_full,
+        properties.fibula_mesh_proxy,
+        is_interactive
+    )
+    set_bone_mesh(
+        get_proxy_objects(MANDIBLE_PROXY_ROLES),
+        properties.mandible_mesh_full,
+        properties.mandible_mesh_proxy,
+        is_interactive
+    )
@@ -0,0 +1,145 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import bpy
+import numpy
+from .half_space_clipping import clip_fibula_segment, get_mesh_arrays, set_mesh_arrays
+from . import constants
+from . import export_inputs
+from . import object_registry
+from . import stl_writer
+
+
+# builds the reconstructed mandible - the resected mandible united with the fibula grafts.
+# the mandible and the grafts are read from the depsgraph (or the half space clipping engine) as numpy arrays,
+# all grafts are merged into one mesh and united with the mandible in a single exact boolean with self intersection,
+# which also fuses the grafts where they overlap at the joints.
+# the result is cached in world space until anything defining the plan changes, so exporting an unchanged plan is instant.
+
+# scale of the grafts on their local y axis, avoids co-planar faces between neighbouring grafts in the boolean
+GRAFT_SCALE = numpy.array((1.0, 1.001, 1.0))
+
+builder_state = {
+    "key": None,
+    "triangles": None
+}
+
+
+def get_builder_key(scene):
+    # content hash of everything the reconstructed mandible depends on: the resected mandible and its resection cutter,
+    # the bones which drive the cutter and the segments, and the segments with their meshes (full or proxy).
+    # same hash as the export manifest uses, see export_inputs.py
+    objects = [
+        object_registry.get_object(constants.ROLE_MANDIBLE_RESECTED),
+        object_registry.get_object(constants.ROLE_MANDIBLE_RESECTION_CUTTER),
+        object_registry.get_object(constants.ROLE_ARMATURE)
+    ]
+    objects.extend(object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT).values())
+    return export_inputs.get_inputs_hash(scene, [obj for obj in objects if obj is not None])
+
+
+def get_evaluated_arrays(obj, depsgraph):
+    # local space arrays of the evaluated mesh and the evaluated world matrix
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        co, tris = get_mesh_arrays(mesh)
+    finally:
+        obj_eval.to_mesh_clear()
+    return co, tris, numpy.array(obj_eval.matrix_world)
+
+
+def to_world(co, matrix):
+    return co @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def get_graft_arrays(context, depsgraph):
+    # world space arrays of all grafts merged into one mesh, the grafts are scaled around their center
+    armature = object_registry.get_object(constants.ROLE_ARMATURE)
+    use_half_space = context.scene.FFFGenPropertyGroup.segment_cut_method == "HALF_SPACE"
+    co_all = list()
+    tris_all = list()
+    vertex_count = 0
+    for index, obj in sorted(object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT).items()):
+        if use_half_space:
+            co, tris = clip_fibula_segment(obj, armature, index)
+            matrix = numpy.array(obj.matrix_world)
+        else:
+            co, tris, matrix = get_evaluated_arrays(obj, depsgraph)
+        if not len(tris):
+            continue
+        center = co.mean(axis=0)
+        co = center + (co - center) * GRAFT_SCALE
+        co_all.append(to_world(co, matrix))
+        tris_all.append(tris + vertex_count)
+        vertex_count += len(co)
+    if not len(co_all):
+        return numpy.empty((0, 3)), numpy.empty((0, 3), dtype=numpy.int64)
+    return numpy.concatenate(co_all), numpy.concatenate(tris_all)
+
+
+def create_temporary_object(context, name, co, tris):
+    # the exact boolean is only available as a modifier (bmesh has no boolean operator), and modifiers are only evaluated
+    # by the depsgraph for objects in the view layer. so the mandible and the grafts need two objects linked to the scene
+    # until the result is read, they are removed right after
+    mesh = bpy.data.meshes.new(name)
+    set_mesh_arrays(mesh, co, tris)
+    obj = bpy.data.objects.new(name, mesh)
+    context.scene.collection.objects.link(obj)
+    return obj
+
+
+def build_reconstructed_mandible(context):
+    # world space triangles (n, 3, 3) of the reconstructed mandible, None if there is no resected mandible
+    obj_mandible = object_registry.get_object(constants.ROLE_MANDIBLE_RESECTED)
+    if obj_mandible is None:
+        return None
+    key = get_builder_key(context.scene)
+    if builder_state["key"] == key:
+        return builder_state["triangles"]
+
+    depsgraph = context.evaluated_depsgraph_get()
+    co_mandible, tris_mandible, matrix_mandible = get_evaluated_arrays(obj_mandible, depsgraph)
+    co_grafts, tris_grafts = get_graft_arrays(context, depsgraph)
+    obj_result = create_temporary_object(context, "reconstructed_mandible", to_world(co_mandible, matrix_mandible), tris_mandible)
+    obj_grafts = create_temporary_object(context, "reconstructed_mandible_grafts", co_grafts, tris_grafts)
+    try:
+        modifier_boolean = obj_result.modifiers.new(
+            name="boolean_union",
+            type="BOOLEAN"
+        )
+        modifier_boolean.operation = "UNION"
+        modifier_boolean.object = obj_grafts
+        modifier_boolean.solver = "EXACT"
+        # the grafts overlap at the joints
+        modifier_boolean.use_self = True
+        triangles = stl_writer.get_object_triangles(obj_result, context.evaluated_depsgraph_get())
+    finally:
+        bpy.data.batch_remove([obj_result, obj_grafts, obj_result.data, obj_grafts.data])
+
+    builder_state["key"] = key
+    builder_state["triangles"] = triangles
+    return triangles
+
+
+def clear_cache():
+    builder_state["key"] = None
+    builder_state["triangles"] = None
@@ -0,0 +1,110 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+import numpy
+import os
+
+
+# binary stl writer working on the evaluated meshes directly, so exports do not depend on selection or context.
+# a binary stl file is an 80 byte header, the triangle count and 50 bytes per triangle:
+# the normal, the three vertices (all float32) and an unused uint16 attribute.
+
+STL_HEADER = b"Binary STL written by FFF Gen"
+
+STL_TRIANGLE = numpy.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute", "<u2")
+])
+
+
+def get_export_matrix(global_scale, forward_axis="Y", up_axis="Z"):
+    # same axis convention as bpy.ops.wm.stl_export, blender space is Y forward, Z up
+    # imported here, the rest of the writer does not need blender and is tested without it
+    from bpy_extras.io_utils import axis_conversion
+    matrix_axis = axis_conversion(to_forward=forward_axis, to_up=up_axis).to_4x4()
+    return numpy.array(matrix_axis) * numpy.array((global_scale, global_scale, global_scale, 1.0))[:, None]
+
+
+def get_object_triangles(obj, depsgraph, matrix=None):
+    # world space triangles (n, 3, 3) of the evaluated object, transformed by matrix
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        mesh.calc_loop_triangles()
+        co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float64)
+        mesh.vertices.foreach_get("co", co)
+        tris = numpy.empty(len(mesh.loop_triangles) * 3, dtype=numpy.int32)
+        mesh.loop_triangles.foreach_get("vertices", tris)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    matrix_world = numpy.array(obj_eval.matrix_world)
+    if matrix is not None:
+        matrix_world = matrix @ matrix_world
+    co = co.reshape(-1, 3) @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+    tris = tris.reshape(-1, 3)
+    # a mirroring matrix turns the triangles inside out, flip the winding back
+    if numpy.linalg.det(matrix_world[:3, :3]) < 0.0:
+        tris = tris[:, ::-1]
+    return co[tris]
+
+
+def transform_triangles(triangles, matrix):
+    triangles = triangles @ matrix[:3, :3].T + matrix[:3, 3]
+    # a mirroring matrix turns the triangles inside out, flip the winding back
+    if numpy.linalg.det(matrix[:3, :3]) < 0.0:
+        triangles = triangles[:, ::-1]
+    return triangles
+
+
+def get_triangle_normals(triangles):
+    # unit normals and the doubled areas of the triangles
+    normals = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = numpy.linalg.norm(normals, axis=1)
+    return normals / numpy.where(lengths > 0.0, lengths, 1.0)[:, None], lengths
+
+
+def write_stl(file_path, triangles):
+    # does not use blender data, can run in a worker thread
+    # the file is written beside the target and moved over it once complete,
+    # so a failed or cancelled write never leaves a truncated file behind
+    normals, lengths = get_triangle_normals(triangles)
+    # drop degenerate triangles left by the booleans, they only produce invalid normals in the file
+    valid = numpy.isfinite(lengths) & (lengths > 0.0)
+    data = numpy.zeros(numpy.count_nonzero(valid), dtype=STL_TRIANGLE)
+    data["normal"] = normals[valid]
+    data["vertices"] = triangles[valid]
+    temp_path = file_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(STL_HEADER.ljust(80, b" "))
+            file.write(numpy.uint32(len(data)).tobytes())
+            file.write(data.tobytes())
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def export_object_stl(obj, depsgraph, file_path, global_scale=1.0):
+    triangles = get_object_triangles(obj, depsgraph, get_export_matrix(global_scale))
+    write_stl(file_path, triangles)
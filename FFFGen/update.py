@@ -20,48 +20,202 @@
 
 
 import bpy
+import concurrent.futures
+import os
+import time
+from bpy.app.handlers import persistent
 from .move_object_to_collection import move_object_to_collection
+from .half_space_clipping import clip_fibula_segment, clip_mesh, get_mesh_arrays, get_segment_planes, set_mesh_arrays
 from . import constants
+from . import materials
+from . import object_registry
 
 
-class AutoUpdateOperator(bpy.types.Operator):
-    bl_idname = "fff_gen.auto_update_modal"
-    bl_label = "FFF Gen Auto Update"
-    bl_description = "Updates fibula objects to fit the current positioning automatically"
-    _timer = None
-    old_data = None
-
-    def modal(self, context, event):
-        if event.type == "TIMER":
-            if not context.scene.FFFGenPropertyGroup.auto_update_toggle:
-                self.cancel(context)
-                return {"FINISHED"}
-            else:
-                data = list()
-                for obj in bpy.context.scene.objects:
-                    if (obj.name.startswith("vector.") or
-                            obj.name.startswith("fibula_object.")):
-                        data.append(obj.matrix_world.copy())
-                if self.old_data != data:
-                    print("Change detected")
-                    self.old_data = data.copy()
-                    modal_invoke(context)
-                else:
-                    print("No change detected")
-        return {"PASS_THROUGH"}
-
-    def execute(self, context):
-        print("Auto update modal execute")
-        wm = context.window_manager
-        update_rate = bpy.context.scene.FFFGenPropertyGroup.update_rate
-        self._timer = wm.event_timer_add(update_rate, window=context.window)
-        wm.modal_handler_add(self)
-        return {"RUNNING_MODAL"}
-
-    def cancel(self, context):
-        print("Auto update modal cancel")
-        wm = context.window_manager
-        wm.event_timer_remove(self._timer)
+# last known segment state, used to detect which segments need to be rebuilt
+# dirty - the segments changed since the last run of the update timer
+auto_update_state = {
+    "segment_state": None,
+    "dirty": False
+}
+
+# state of the background segment computation
+# generation - latest requested generation per segment index, older results are discarded
+# pending - segment index -> (generation, future)
+# mesh_arrays - cached vertex/triangle arrays of the current fibula mesh, keyed by mesh and a sample of its vertices
+# time_submitted - time of the latest submission, the rebuild cost is measured from it until all results are applied
+background_state = {
+    "executor": None,
+    "generation": dict(),
+    "pending": dict(),
+    "mesh_arrays": dict(),
+    "time_submitted": 0.0
+}
+
+
+@persistent
+def on_depsgraph_update_post(scene, depsgraph):
+    # react only to transform changes of the armature and the objects which define the segments
+    # the rebuild itself is deferred to a timer, as modifying data inside a depsgraph handler is not allowed
+    if not scene.FFFGenPropertyGroup.auto_update_toggle:
+        return
+    if not is_segment_update(scene, depsgraph):
+        return
+    # throttle - the first change schedules the update, later changes only mark the state dirty without pushing it back.
+    # while the bones keep moving the timer runs again after each delay, so the delay limits the update rate during a drag
+    auto_update_state["dirty"] = True
+    if not bpy.app.timers.is_registered(run_auto_update):
+        bpy.app.timers.register(run_auto_update, first_interval=get_update_delay(scene.FFFGenPropertyGroup))
+
+
+def get_update_delay(properties):
+    if properties.update_rate_auto:
+        return properties.update_rate_current
+    return properties.update_rate
+
+
+def measure_update_cost(properties, cost):
+    # smooth the measured rebuild time and choose the delay so that rebuilding
+    # takes at most the given fraction of the time while the bones are being moved
+    # rebuild / (rebuild + delay) <= budget
+    if properties.update_cost > 0.0:
+        cost = 0.5 * properties.update_cost + 0.5 * cost
+    properties.update_cost = cost
+    delay = cost * (1.0 / properties.update_cpu_budget - 1.0)
+    properties.update_rate_current = min(max(delay, 0.02), 2.0)
+
+
+def is_segment_update(scene, depsgraph):
+    # the registry is only read here, data must not be written from a depsgraph handler
+    objects_armature = object_registry.get_registered_objects(scene, [constants.ROLE_ARMATURE])
+    objects_watched = object_registry.get_registered_objects(scene, [constants.ROLE_VECTOR, constants.ROLE_FIBULA_SEGMENT])
+    for update in depsgraph.updates:
+        if not isinstance(update.id, bpy.types.Object):
+            continue
+        obj = update.id.original
+        # pose changes are tagged as geometry updates on the armature object
+        if obj in objects_armature and (update.is_updated_transform or update.is_updated_geometry):
+            return True
+        if obj in objects_watched and update.is_updated_transform:
+            return True
+    return False
+
+
+def run_auto_update():
+    # timer callback, runs after the update delay as long as there were changes since its last run
+    if not bpy.context.scene.FFFGenPropertyGroup.auto_update_toggle or not auto_update_state["dirty"]:
+        return None
+    auto_update_state["dirty"] = False
+    state = get_segment_state()
+    dirty_indices = find_dirty_segments(auto_update_state["segment_state"], state)
+    if dirty_indices:
+        auto_update_state["segment_state"] = state
+        properties = bpy.context.scene.FFFGenPropertyGroup
+        if properties.update_in_background and properties.segment_cut_method == "HALF_SPACE":
+            # the cost is measured once the results are applied, see apply_background_results
+            delete_old_duplis(bpy.context, dirty_indices)
+            submit_background_update(dirty_indices)
+        else:
+            time_start = time.perf_counter()
+            modal_invoke(bpy.context, dirty_indices)
+            measure_update_cost(properties, time.perf_counter() - time_start)
+    # run again after the delay, changes made meanwhile are picked up then
+    return get_update_delay(bpy.context.scene.FFFGenPropertyGroup)
+
+
+def start_auto_update():
+    # forget the previous state so every segment is rebuilt once when auto update is turned on
+    auto_update_state["segment_state"] = None
+    auto_update_state["dirty"] = True
+    if not bpy.app.timers.is_registered(run_auto_update):
+        bpy.app.timers.register(run_auto_update, first_interval=0.0)
+
+
+def get_background_executor():
+    if background_state["executor"] is None:
+        background_state["executor"] = concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count(),
+            thread_name_prefix="fff_gen_segment"
+        )
+    return background_state["executor"]
+
+
+def stop_background_update():
+    # called on unregister, drops everything that has not finished yet
+    if background_state["executor"] is not None:
+        background_state["executor"].shutdown(wait=False, cancel_futures=True)
+        background_state["executor"] = None
+    background_state["pending"].clear()
+    background_state["mesh_arrays"].clear()
+    for timer in [run_auto_update, apply_background_results]:
+        if bpy.app.timers.is_registered(timer):
+            bpy.app.timers.unregister(timer)
+
+
+def get_mesh_sample(mesh, count=64):
+    # coordinates of a few vertices spread over the mesh, a cheap check that the mesh was not edited
+    step = max(1, len(mesh.vertices) // count)
+    return tuple(tuple(mesh.vertices[index].co) for index in range(0, len(mesh.vertices), step))
+
+
+def get_cached_mesh_arrays(mesh):
+    # the fibula mesh does not change while positioning, read it only once
+    # only the latest mesh is kept, so switching between the full and the proxy mesh does not accumulate arrays
+    key = (mesh.as_pointer(), len(mesh.vertices), len(mesh.polygons), get_mesh_sample(mesh))
+    if key not in background_state["mesh_arrays"]:
+        background_state["mesh_arrays"].clear()
+        background_state["mesh_arrays"][key] = get_mesh_arrays(mesh)
+    return background_state["mesh_arrays"][key]
+
+
+def submit_background_update(indices):
+    # snapshot the fibula arrays and the segment planes on the main thread
+    # and clip the segments in the worker threads.
+    # only numpy arrays are passed to the workers, blender data is never touched outside the main thread
+    armature = object_registry.get_object(constants.ROLE_ARMATURE)
+    executor = get_background_executor()
+    background_state["time_submitted"] = time.perf_counter()
+    for index in indices:
+        obj_fibula = object_registry.get_object(constants.ROLE_FIBULA_SEGMENT, index)
+        if obj_fibula is None:
+            continue
+        co, tris = get_cached_mesh_arrays(obj_fibula.data)
+        planes = get_segment_planes(armature, index, obj_fibula.matrix_world)
+        generation = background_state["generation"].get(index, 0) + 1
+        background_state["generation"][index] = generation
+        background_state["pending"][index] = (generation, executor.submit(clip_mesh, co, tris, planes))
+    if not bpy.app.timers.is_registered(apply_background_results):
+        bpy.app.timers.register(apply_background_results, first_interval=0.0)
+
+
+def apply_background_results():
+    # timer callback, swaps finished segments into the scene
+    # results for a segment which was requested again in the meantime are discarded
+    fibula_orig = object_registry.get_object(constants.ROLE_FIBULA_COPY)
+
+    for index, (generation, future) in list(background_state["pending"].items()):
+        if not future.done():
+            continue
+        del background_state["pending"][index]
+        if generation != background_state["generation"].get(index):
+            continue
+        if future.exception() is not None:
+            # the segment keeps its previous shape
+            print("Warning: background update of fibula segment " + str(index) + " failed: " + repr(future.exception()))
+            continue
+        obj_fibula = object_registry.get_object(constants.ROLE_FIBULA_SEGMENT, index)
+        if obj_fibula is None:
+            continue
+        co, tris = future.result()
+        obj_fibula_dupli = get_fibula_dupli(obj_fibula, index)
+        set_mesh_arrays(obj_fibula_dupli.data, co, tris)
+        set_fibula_dupli_transform(obj_fibula_dupli, obj_fibula, fibula_orig)
+
+    if background_state["pending"]:
+        return 0.05
+    # the cost includes the time waiting in the queue and up to one timer interval,
+    # which is what the delay of the next update has to make room for
+    measure_update_cost(bpy.context.scene.FFFGenPropertyGroup, time.perf_counter() - background_state["time_submitted"])
+    return None
 
 
 class Update(bpy.types.Operator):
@@ -74,92 +228,124 @@ class Update(bpy.types.Operator):
         return {"FINISHED"}
 
 
-def modal_invoke(context):
-    # preserve/track selected and active objects before modal execution
-    obj_active_before = bpy.context.active_object
-    mode_before = None
-    if bpy.context.active_object:
-        mode_before = bpy.context.active_object.mode
-        bpy.ops.object.mode_set(
-            mode="OBJECT"
-        )
-    objects_selected_before = list()
-    for obj in bpy.context.selected_objects:
-        objects_selected_before.append(obj)
-        obj.select_set(False)
-
-    # delete old duplicate objects and add new ones to proper locations
-    delete_old_duplis(context)
-    update_duplis(context)
-
-    # reset selection and mode to previous state
-    for obj in objects_selected_before:
-        obj.select_set(True)
-    bpy.context.view_layer.objects.active = obj_active_before
-    if mode_before:
-        bpy.ops.object.mode_set(
-            mode=mode_before
-        )
+def get_segment_state():
+    # snapshot of everything that defines the shape and placement of each fibula segment
+    # keyed by segment index
+    # the segment depends on its vector empty, its own transform and the two bones that deform its boolean cube.
+    # bone matrices are included since moving the end bone along the vector direction changes the cube,
+    # but does not change the vector orientation.
+    objects_vectors = object_registry.get_indexed_objects(constants.ROLE_VECTOR)
+    objects_fibula = object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT)
+
+    pose_bones = None
+    armature = object_registry.get_object(constants.ROLE_ARMATURE)
+    if armature is not None and armature.pose is not None:
+        pose_bones = armature.pose.bones
+
+    state = dict()
+    for index, obj_fibula in objects_fibula.items():
+        matrices = [obj_fibula.matrix_world.copy()]
+        if index in objects_vectors:
+            matrices.append(objects_vectors[index].matrix_world.copy())
+        if pose_bones is not None:
+            for bone_name in ["bone." + str(index), "bone." + str(index + 1)]:
+                if bone_name in pose_bones.keys():
+                    matrices.append(pose_bones[bone_name].matrix.copy())
+        state[index] = tuple(matrices)
+    return state
+
+
+def find_dirty_segments(old_state, state):
+    # returns the set of segment indices which have to be rebuilt
+    # segments which no longer exist are also returned, so their duplicates get removed
+    if old_state is None:
+        return set(state.keys())
+    dirty_indices = set()
+    for index, matrices in state.items():
+        if old_state.get(index) != matrices:
+            dirty_indices.add(index)
+    for index in old_state.keys():
+        if index not in state:
+            dirty_indices.add(index)
+    return dirty_indices
+
 
+def modal_invoke(context, indices=None):
+    # indices - set of segment indices to rebuild, None rebuilds all segments
+    # everything is done through the data API, so selection, active object and mode are left untouched
+    delete_old_duplis(context, indices)
+    update_duplis(context, indices)
 
-def delete_old_duplis(context):
-    # delete old fibula duplicates used for visualisation
+
+def delete_old_duplis(context, indices=None):
+    # delete fibula duplicates whose segment (fibula_object.N) no longer exists
+    # the duplicates of existing segments are kept and their meshes are updated in place
     objects_to_delete = []
-    for obj in bpy.data.objects:
-        if obj.name.startswith("fibula_dupli."):
+    for index, obj in object_registry.get_indexed_objects(constants.ROLE_FIBULA_DUPLI).items():
+        if indices is not None and index not in indices:
+            continue
+        if object_registry.get_object(constants.ROLE_FIBULA_SEGMENT, index) is None:
             objects_to_delete.append(obj)
-    override_context = {
-        "selected_objects":objects_to_delete
-    }
-    with context.temp_override(**override_context):
-        bpy.ops.object.delete()
+    for obj in objects_to_delete:
+        mesh = obj.data
+        bpy.data.objects.remove(obj)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
 
 
-def update_duplis(context):
+def update_duplis(context, indices=None):
     # update fibula duplicates for visualisation
-    # get all fibula graft objects
-    objects_fibula = list()
-    for obj in bpy.data.objects:
-        if obj.name.startswith("fibula_object."):
-            objects_fibula.append(obj)
-
-    if "fibula_copy" in bpy.data.objects.keys():
-        fibula_orig = bpy.data.objects["fibula_copy"]
+    # get fibula graft objects for given segment indices, or all of them if indices is None
+    objects_fibula = dict()
+    for index, obj in object_registry.get_indexed_objects(constants.ROLE_FIBULA_SEGMENT).items():
+        if indices is None or index in indices:
+            objects_fibula[index] = obj
+
+    fibula_orig = object_registry.get_object(constants.ROLE_FIBULA_COPY)
+
+    if bpy.context.scene.FFFGenPropertyGroup.segment_cut_method == "HALF_SPACE":
+        armature = object_registry.get_object(constants.ROLE_ARMATURE)
+        for index, obj_fibula in objects_fibula.items():
+            co, tris = clip_fibula_segment(obj_fibula, armature, index)
+            obj_fibula_dupli = get_fibula_dupli(obj_fibula, index)
+            set_mesh_arrays(obj_fibula_dupli.data, co, tris)
+            set_fibula_dupli_transform(obj_fibula_dupli, obj_fibula, fibula_orig)
     else:
-        fibula_orig = None
-
-    for obj_fibula in objects_fibula:
-        # duplicate fibula obj.
-        override_context = {
-            "selected_objects":[obj_fibula]
-        }
-        with context.temp_override(**override_context):
-            bpy.ops.object.duplicate()
-        obj_fibula_dupli = bpy.context.selected_objects[0]
-
-        # apply modifiers to obj_fibula_dupli
-        bpy.context.view_layer.objects.active = obj_fibula_dupli
-        bpy.ops.object.modifier_apply(
-            modifier=obj_fibula_dupli.modifiers[0].name
-        )
-        # remove constraints from dupli and reset location and rotation
-        bpy.ops.object.constraints_clear()
-        if fibula_orig is not None:
-            obj_fibula_dupli.location = fibula_orig.location
-            obj_fibula_dupli.rotation_euler = fibula_orig.rotation_euler
-        else:
-            obj_fibula_dupli.location = (0.0, 0.0, 0.0)
-            obj_fibula_dupli.rotation_euler = (0.0, 0.0, 0.0)
-        fibula_dupli_name = "fibula_dupli." + obj_fibula.name[14:]
-        obj_fibula_dupli.name = fibula_dupli_name
-
-        # move ob_dupli to proper layer
-        move_object_to_collection(
-            obj_to_move=obj_fibula_dupli,
-            collection_name=constants.COLLECTION_FFF_GEN_FIBULA,
-            remove_from_current=True
-        )
+        # bake the result of the boolean modifier from the evaluated object
+        depsgraph = context.evaluated_depsgraph_get()
+        for index, obj_fibula in objects_fibula.items():
+            obj_fibula_eval = obj_fibula.evaluated_get(depsgraph)
+            co, tris = get_mesh_arrays(obj_fibula_eval.to_mesh())
+            obj_fibula_eval.to_mesh_clear()
+            obj_fibula_dupli = get_fibula_dupli(obj_fibula, index)
+            set_mesh_arrays(obj_fibula_dupli.data, co, tris)
+            set_fibula_dupli_transform(obj_fibula_dupli, obj_fibula, fibula_orig)
 
-        # deselect all
-        for obj in bpy.context.selected_objects:
-            obj.select_set(False)
+
+def get_fibula_dupli(obj_fibula, index):
+    # the visualisation object of a segment and its mesh are created once, and then reused for every update
+    obj_fibula_dupli = object_registry.get_object(constants.ROLE_FIBULA_DUPLI, index)
+    if obj_fibula_dupli is not None:
+        return obj_fibula_dupli
+
+    dupli_name = "fibula_dupli." + str(index)
+    mesh = bpy.data.meshes.new(dupli_name)
+    mesh.materials.append(materials.get_fibula(index))
+    obj_fibula_dupli = bpy.data.objects.new(dupli_name, mesh)
+    move_object_to_collection(
+        obj_to_move=obj_fibula_dupli,
+        collection_name=constants.COLLECTION_FFF_GEN_FIBULA,
+        remove_from_current=True
+    )
+    return object_registry.register_object(constants.ROLE_FIBULA_DUPLI, obj_fibula_dupli, index)
+
+
+def set_fibula_dupli_transform(obj_fibula_dupli, obj_fibula, fibula_orig):
+    # duplicates are displayed at the location and rotation of the fibula copy
+    if fibula_orig is not None:
+        obj_fibula_dupli.location = fibula_orig.location
+        obj_fibula_dupli.rotation_euler = fibula_orig.rotation_euler
+    else:
+        obj_fibula_dupli.location = (0.0, 0.0, 0.0)
+        obj_fibula_dupli.rotation_euler = (0.0, 0.0, 0.0)
+    obj_fibula_dupli.scale = obj_fibula.scale
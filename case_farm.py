@@ -0,0 +1,315 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+# runs many FFF Gen cases in parallel background blender processes.
+# guide generation is single threaded per case, so one process per core uses the whole workstation.
+# plain python, does not need blender to run itself.
+#
+# python case_farm.py add case1.json case2.toml ...
+# python case_farm.py run --workers 8 --blender /path/to/blender
+# python case_farm.py status
+#
+# the queue is a sqlite file, so it survives restarts and cases can be added while the farm is running.
+# each job runs run_case.py with one case spec, its output goes to a log file in the log directory,
+# a summary line per finished attempt is appended to farm.log in the same directory.
+# failed and timed out jobs are queued again until they run out of attempts.
+# several farms (also on other machines sharing the file) can run the same queue, a job is claimed by one farm only.
+# each running job records the host and process id of its farm, a farm which starts queues again
+# the running jobs of farms on its host whose process is gone.
+
+import argparse
+import datetime
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_CASE_PATH = os.path.join(SCRIPT_DIR, "run_case.py")
+DEFAULT_DATABASE = "fffgen_farm.sqlite"
+DEFAULT_LOG_DIR = "fffgen_farm_logs"
+FARM_LOG_NAME = "farm.log"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# seconds between checks of the running processes
+POLL_INTERVAL = 0.5
+
+
+def get_timestamp():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def open_database(file_path):
+    connection = sqlite3.connect(file_path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spec_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            timeout REAL,
+            return_code INTEGER,
+            seconds REAL,
+            log_path TEXT,
+            added TEXT NOT NULL,
+            finished TEXT,
+            owner_host TEXT,
+            owner_pid INTEGER
+        )
+    """)
+    # queues made before the owner columns
+    columns = [row["name"] for row in connection.execute("PRAGMA table_info(jobs)")]
+    if "owner_host" not in columns:
+        connection.execute("ALTER TABLE jobs ADD COLUMN owner_host TEXT")
+    if "owner_pid" not in columns:
+        connection.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+    connection.commit()
+    return connection
+
+
+def get_owner():
+    return socket.gethostname(), os.getpid()
+
+
+def is_process_alive(pid):
+    if os.name == "nt":
+        # os.kill would terminate the process on windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        # STILL_ACTIVE
+        return exit_code.value == 259
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # exists, owned by another user
+        return True
+    return True
+
+
+def add_jobs(connection, spec_paths, max_attempts, timeout):
+    for spec_path in spec_paths:
+        connection.execute(
+            "INSERT INTO jobs (spec_path, status, max_attempts, timeout, added) VALUES (?, ?, ?, ?, ?)",
+            (os.path.abspath(spec_path), STATUS_QUEUED, max_attempts, timeout, get_timestamp())
+        )
+    connection.commit()
+
+
+def reset_interrupted_jobs(connection, owner):
+    # jobs left running by a farm that was killed, on this host and with the farm process gone.
+    # jobs of farms on other hosts are left alone, their processes can not be checked from here
+    host, pid = owner
+    jobs = connection.execute(
+        "SELECT id, owner_host, owner_pid FROM jobs WHERE status = ?",
+        (STATUS_RUNNING,)
+    ).fetchall()
+    for job in jobs:
+        if job["owner_host"] is not None and job["owner_host"] != host:
+            continue
+        # this farm has no jobs yet, a job with its process id was left by an earlier process with the same id
+        if job["owner_pid"] is not None and job["owner_pid"] != pid and is_process_alive(job["owner_pid"]):
+            continue
+        connection.execute(
+            "UPDATE jobs SET status = ?, owner_host = NULL, owner_pid = NULL WHERE id = ? AND status = ?",
+            (STATUS_QUEUED, job["id"], STATUS_RUNNING)
+        )
+    connection.commit()
+
+
+def take_next_job(connection, owner):
+    # the job is selected and claimed in one write transaction, so two farms never take the same job
+    host, pid = owner
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        job = connection.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1",
+            (STATUS_QUEUED,)
+        ).fetchone()
+        if job is not None:
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, owner_host = ?, owner_pid = ? WHERE id = ?",
+                (STATUS_RUNNING, host, pid, job["id"])
+            )
+            job = connection.execute("SELECT * FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    return job
+
+
+def finish_job(connection, job, return_code, seconds):
+    if return_code == 0:
+        status = STATUS_DONE
+    elif job["attempts"] < job["max_attempts"]:
+        status = STATUS_QUEUED
+    else:
+        status = STATUS_FAILED
+    connection.execute(
+        "UPDATE jobs SET status = ?, return_code = ?, seconds = ?, finished = ? WHERE id = ?",
+        (status, return_code, seconds, get_timestamp(), job["id"])
+    )
+    connection.commit()
+    return status
+
+
+def get_blender_command(blender_path, spec_path, threads):
+    # -t limits the threads of each process, so the processes do not fight over the cores.
+    # without --python-exit-code blender exits with 0 when the script raises (eg. the add-on fails to import)
+    command = [blender_path, "-b", "--factory-startup"]
+    if threads > 0:
+        command += ["-t", str(threads)]
+    return command + ["--python-exit-code", "1", "--python", RUN_CASE_PATH, "--", spec_path]
+
+
+def start_job(job, blender_path, threads, log_dir):
+    log_path = os.path.join(log_dir, "job_" + str(job["id"]) + "_attempt_" + str(job["attempts"]) + ".log")
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(
+        get_blender_command(blender_path, job["spec_path"], threads),
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        cwd=os.path.dirname(job["spec_path"])
+    )
+    return {
+        "job": job,
+        "process": process,
+        "log_file": log_file,
+        "log_path": log_path,
+        "time_start": time.perf_counter()
+    }
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def append_farm_log(log_dir, line):
+    with open(os.path.join(log_dir, FARM_LOG_NAME), "a") as file:
+        file.write(get_timestamp() + " " + line + "\n")
+    print(line)
+
+
+def run_farm(connection, blender_path, workers, log_dir):
+    os.makedirs(log_dir, exist_ok=True)
+    owner = get_owner()
+    reset_interrupted_jobs(connection, owner)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    running = list()
+    try:
+        while True:
+            while len(running) < workers:
+                job = take_next_job(connection, owner)
+                if job is None:
+                    break
+                running.append(start_job(job, blender_path, threads, log_dir))
+                append_farm_log(log_dir, "started job " + str(job["id"]) + " attempt " + str(job["attempts"]) + " " + job["spec_path"])
+            if not running:
+                break
+
+            time.sleep(POLL_INTERVAL)
+            for run in list(running):
+                job = run["job"]
+                seconds = time.perf_counter() - run["time_start"]
+                return_code = run["process"].poll()
+                timed_out = return_code is None and job["timeout"] is not None and seconds > job["timeout"]
+                if return_code is None and not timed_out:
+                    continue
+                if timed_out:
+                    stop_process(run["process"])
+                    # a timeout is reported as a failure, distinct from the exit codes of blender
+                    return_code = -1
+                run["log_file"].close()
+                running.remove(run)
+                connection.execute("UPDATE jobs SET log_path = ? WHERE id = ?", (run["log_path"], job["id"]))
+                status = finish_job(connection, job, return_code, seconds)
+                append_farm_log(log_dir, "job " + str(job["id"]) + (" timed out" if timed_out else " exited with " + str(return_code))
+                    + " after " + format(seconds, ".1f") + "s, " + status + ", log " + run["log_path"])
+    finally:
+        # interrupted, the jobs of the killed processes are queued again by the next farm on this host
+        for run in running:
+            stop_process(run["process"])
+            run["log_file"].close()
+
+
+def print_status(connection):
+    for row in connection.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status ORDER BY status"):
+        print(row["status"] + ": " + str(row["count"]))
+    for job in connection.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (STATUS_FAILED,)):
+        print("failed job " + str(job["id"]) + " " + job["spec_path"] + ", log " + str(job["log_path"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs FFF Gen case specs in parallel background Blender processes.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="sqlite file with the job queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_add = subparsers.add_parser("add", help="queue case specs")
+    parser_add.add_argument("specs", nargs="+", help="case spec files (.json or .toml)")
+    parser_add.add_argument("--attempts", type=int, default=2, help="attempts before a job is marked as failed")
+    parser_add.add_argument("--timeout", type=float, default=None, help="seconds before a job is killed")
+
+    parser_run = subparsers.add_parser("run", help="run the queued jobs")
+    parser_run.add_argument("--blender", default="blender", help="blender executable")
+    parser_run.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of parallel blender processes")
+    parser_run.add_argument("--log-dir", default=DEFAULT_LOG_DIR, help="directory for the job logs")
+
+    subparsers.add_parser("status", help="print the job counts and failed jobs")
+
+    args = parser.parse_args()
+    connection = open_database(args.database)
+    if args.command == "add":
+        add_jobs(connection, args.specs, max(1, args.attempts), args.timeout)
+    elif args.command == "run":
+        # the jobs run in the directory of their spec, so the executable path has to be absolute
+        blender_path = shutil.which(args.blender)
+        if blender_path is None:
+            parser.error("Blender executable " + args.blender + " not found")
+        run_farm(connection, os.path.abspath(blender_path), max(1, args.workers), os.path.abspath(args.log_dir))
+        print_status(connection)
+    elif args.command == "status":
+        print_status(connection)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
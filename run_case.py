@@ -0,0 +1,64 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  FFF Gen Add-on
+#  Copyright (C) 2020 Luka Simic
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+# runs FFF Gen cases without the user interface
+# blender -b --python run_case.py -- case.json [case2.toml ...]
+# each case starts from an empty file, see FFFGen/batch_case.py for the case spec.
+# exits with 1 if any of the cases failed
+
+import bpy
+import json
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import FFFGen
+from FFFGen.batch_case import run_case_file
+
+
+def get_case_paths():
+    # arguments after -- are left to the script
+    if "--" not in sys.argv:
+        return list()
+    return sys.argv[sys.argv.index("--") + 1:]
+
+
+def main():
+    # the add-on may already be enabled in the user preferences
+    if not hasattr(bpy.types.Scene, "FFFGenPropertyGroup"):
+        FFFGen.register()
+
+    failed = False
+    for file_path in get_case_paths():
+        bpy.ops.wm.read_homefile(use_empty=True)
+        try:
+            report = run_case_file(file_path)
+            print(json.dumps(report, indent=2))
+        except Exception:
+            traceback.print_exc()
+            print("Case " + file_path + " failed")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+main()
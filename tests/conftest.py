@@ -0,0 +1,14 @@
+import os
+import sys
+import types
+
+# the add-on package imports bpy when it is imported, the modules tested here do not need blender.
+# the package is registered without running its __init__, so its submodules can be imported on their own
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+if "FFFGen" not in sys.modules:
+    package = types.ModuleType("FFFGen")
+    package.__path__ = [os.path.join(REPO_DIR, "FFFGen")]
+    sys.modules["FFFGen"] = package
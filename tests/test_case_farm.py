@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import stat
+import subprocess
+import threading
+import case_farm
+
+
+def create_blender(tmp_path, script):
+    # executable standing in for blender, the farm only relies on its exit code
+    file_path = tmp_path / "blender"
+    file_path.write_text("#!/bin/sh\n" + script + "\n")
+    file_path.chmod(file_path.stat().st_mode | stat.S_IEXEC)
+    return str(file_path)
+
+
+def create_spec(tmp_path, name="case.json"):
+    file_path = tmp_path / name
+    file_path.write_text("{}")
+    return str(file_path)
+
+
+def get_jobs(connection):
+    return connection.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+
+
+def test_blender_command_fails_on_script_errors():
+    command = case_farm.get_blender_command("blender", "/cases/case.json", 4)
+    assert command.index("--python-exit-code") < command.index("--python")
+    assert command[command.index("--python-exit-code") + 1] == "1"
+    assert command[command.index("-t") + 1] == "4"
+    assert command[-2:] == ["--", "/cases/case.json"]
+
+
+def test_successful_job_is_done(tmp_path):
+    connection = case_farm.open_database(str(tmp_path / "farm.sqlite"))
+    case_farm.add_jobs(connection, [create_spec(tmp_path)], 2, None)
+    case_farm.run_farm(connection, create_blender(tmp_path, "exit 0"), 2, str(tmp_path / "logs"))
+    job = get_jobs(connection)[0]
+    assert job["status"] == case_farm.STATUS_DONE
+    assert job["attempts"] == 1
+    assert os.path.exists(job["log_path"])
+    assert os.path.exists(str(tmp_path / "logs" / case_farm.FARM_LOG_NAME))
+
+
+def test_failed_job_is_retried(tmp_path):
+    connection = case_farm.open_database(str(tmp_path / "farm.sqlite"))
+    case_farm.add_jobs(connection, [create_spec(tmp_path)], 3, None)
+    case_farm.run_farm(connection, create_blender(tmp_path, "exit 1"), 1, str(tmp_path / "logs"))
+    job = get_jobs(connection)[0]
+    assert job["status"] == case_farm.STATUS_FAILED
+    assert job["attempts"] == 3
+    assert job["return_code"] == 1
+
+
+def test_timed_out_job_is_stopped(tmp_path):
+    connection = case_farm.open_database(str(tmp_path / "farm.sqlite"))
+    case_farm.add_jobs(connection, [create_spec(tmp_path)], 1, 0.5)
+    case_farm.run_farm(connection, create_blender(tmp_path, "sleep 30"), 1, str(tmp_path / "logs"))
+    job = get_jobs(connection)[0]
+    assert job["status"] == case_farm.STATUS_FAILED
+    assert job["return_code"] == -1
+    assert job["seconds"] < 30.0
+
+
+def get_dead_pid():
+    # process id of a process which already exited
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_jobs_are_claimed_once(tmp_path):
+    database_path = str(tmp_path / "farm.sqlite")
+    connection = case_farm.open_database(database_path)
+    case_farm.add_jobs(connection, [create_spec(tmp_path, str(i) + ".json") for i in range(40)], 1, None)
+    claimed = list()
+
+    def take_jobs(index):
+        # one connection per farm
+        connection_farm = case_farm.open_database(database_path)
+        while True:
+            job = case_farm.take_next_job(connection_farm, ("host", index))
+            if job is None:
+                break
+            claimed.append(job["id"])
+        connection_farm.close()
+
+    threads = [threading.Thread(target=take_jobs, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == [job["id"] for job in get_jobs(connection)]
+    assert all(job["status"] == case_farm.STATUS_RUNNING and job["attempts"] == 1 for job in get_jobs(connection))
+
+
+def test_interrupted_jobs_are_queued_again(tmp_path):
+    connection = case_farm.open_database(str(tmp_path / "farm.sqlite"))
+    case_farm.add_jobs(connection, [create_spec(tmp_path, "a.json"), create_spec(tmp_path, "b.json")], 1, None)
+    host, pid = case_farm.get_owner()
+    job = case_farm.take_next_job(connection, (host, get_dead_pid()))
+    assert job["status"] == case_farm.STATUS_RUNNING
+    assert job["owner_host"] == host
+    case_farm.reset_interrupted_jobs(connection, (host, pid))
+    assert [job["status"] for job in get_jobs(connection)] == [case_farm.STATUS_QUEUED, case_farm.STATUS_QUEUED]
+    assert get_jobs(connection)[0]["owner_pid"] is None
+
+
+def test_jobs_of_live_farms_keep_running(tmp_path):
+    connection = case_farm.open_database(str(tmp_path / "farm.sqlite"))
+    case_farm.add_jobs(connection, [create_spec(tmp_path, "a.json"), create_spec(tmp_path, "b.json")], 1, None)
+    host, pid = case_farm.get_owner()
+    # a farm on this host which is still running (the parent of the test process) and one on another host
+    case_farm.take_next_job(connection, (host, os.getppid()))
+    case_farm.take_next_job(connection, ("other_host", get_dead_pid()))
+    case_farm.reset_interrupted_jobs(connection, (host, pid))
+    assert [job["status"] for job in get_jobs(connection)] == [case_farm.STATUS_RUNNING, case_farm.STATUS_RUNNING]
+
+
+def test_queue_without_owner_columns_is_upgraded(tmp_path):
+    database_path = str(tmp_path / "farm.sqlite")
+    connection = sqlite3.connect(database_path)
+    connection.execute("""
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spec_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            timeout REAL,
+            return_code INTEGER,
+            seconds REAL,
+            log_path TEXT,
+            added TEXT NOT NULL,
+            finished TEXT
+        )
+    """)
+    connection.execute(
+        "INSERT INTO jobs (spec_path, status, max_attempts, added) VALUES (?, ?, ?, ?)",
+        ("case.json", case_farm.STATUS_RUNNING, 1, case_farm.get_timestamp())
+    )
+    connection.commit()
+    connection.close()
+    connection = case_farm.open_database(database_path)
+    # running jobs of farms from before the owner columns can only be interrupted ones
+    case_farm.reset_interrupted_jobs(connection, case_farm.get_owner())
+    assert get_jobs(connection)[0]["status"] == case_farm.STATUS_QUEUED
@@ -0,0 +1,65 @@
+import numpy
+from FFFGen import export_manifest
+
+
+def get_parameters():
+    return export_manifest.get_export_parameters(1.0)
+
+
+def test_missing_manifest_is_empty(tmp_path):
+    assert export_manifest.load_manifest(str(tmp_path)) == dict()
+
+
+def test_corrupt_manifest_is_empty(tmp_path):
+    (tmp_path / export_manifest.MANIFEST_NAME).write_text("{not json")
+    assert export_manifest.load_manifest(str(tmp_path)) == dict()
+    (tmp_path / export_manifest.MANIFEST_NAME).write_text("[]")
+    assert export_manifest.load_manifest(str(tmp_path)) == dict()
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = dict()
+    export_manifest.set_entry(manifest, "fibula_guide", "content", "inputs", get_parameters())
+    export_manifest.save_manifest(str(tmp_path), manifest)
+    assert export_manifest.load_manifest(str(tmp_path)) == manifest
+
+
+def test_content_hash_uses_written_precision():
+    triangles = numpy.random.default_rng(0).random((4, 3, 3))
+    # differences below float32 precision do not change the written file
+    assert export_manifest.get_content_hash(triangles) == export_manifest.get_content_hash(triangles + 1e-12)
+    assert export_manifest.get_content_hash(triangles) != export_manifest.get_content_hash(triangles + 1e-3)
+
+
+def test_up_to_date_needs_file_hash_and_parameters(tmp_path):
+    file_path = tmp_path / "fibula_guide.stl"
+    manifest = dict()
+    export_manifest.set_entry(manifest, "fibula_guide", "content", "inputs", get_parameters())
+    assert not export_manifest.is_up_to_date(manifest, "fibula_guide", str(file_path), "content", get_parameters())
+    file_path.write_bytes(b"")
+    assert export_manifest.is_up_to_date(manifest, "fibula_guide", str(file_path), "content", get_parameters())
+    assert not export_manifest.is_up_to_date(manifest, "fibula_guide", str(file_path), "other", get_parameters())
+    assert not export_manifest.is_up_to_date(manifest, "fibula_guide", str(file_path), "content", export_manifest.get_export_parameters(2.0))
+
+
+def test_stale_reason(tmp_path):
+    file_path = tmp_path / "fibula_guide.stl"
+    manifest = dict()
+    assert export_manifest.get_stale_reason(manifest, "fibula_guide", str(file_path), "inputs", get_parameters()) == "not exported yet"
+    file_path.write_bytes(b"")
+    assert export_manifest.get_stale_reason(manifest, "fibula_guide", str(file_path), "inputs", get_parameters()) == "not in the export manifest"
+    export_manifest.set_entry(manifest, "fibula_guide", "content", "inputs", get_parameters())
+    assert export_manifest.get_stale_reason(manifest, "fibula_guide", str(file_path), "inputs", get_parameters()) is None
+    assert export_manifest.get_stale_reason(manifest, "fibula_guide", str(file_path), "other", get_parameters()) == "changed since the last export"
+    assert export_manifest.get_stale_reason(manifest, "fibula_guide", str(file_path), "inputs", export_manifest.get_export_parameters(2.0)) == "export parameters changed"
+
+
+def test_removed_entry_is_never_up_to_date(tmp_path):
+    file_path = tmp_path / "fibula_guide.stl"
+    file_path.write_bytes(b"")
+    manifest = dict()
+    export_manifest.set_entry(manifest, "fibula_guide", "content", "inputs", get_parameters())
+    export_manifest.remove_entry(manifest, "fibula_guide")
+    export_manifest.remove_entry(manifest, "fibula_guide")
+    assert not export_manifest.is_up_to_date(manifest, "fibula_guide", str(file_path), "content", get_parameters())
+    assert export_manifest.get_stale_reason(manifest, "fibula_guide", str(file_path), "inputs", get_parameters()) is not None
@@ -0,0 +1,198 @@
+import numpy
+from FFFGen.half_space_clipping import clip_half_space, clip_mesh, compact
+
+
+def get_cube():
+    # closed unit cube around the origin, triangles wound counter clockwise seen from outside
+    co = numpy.array([
+        (-0.5, -0.5, -0.5), (0.5, -0.5, -0.5), (0.5, 0.5, -0.5), (-0.5, 0.5, -0.5),
+        (-0.5, -0.5, 0.5), (0.5, -0.5, 0.5), (0.5, 0.5, 0.5), (-0.5, 0.5, 0.5)
+    ])
+    quads = [(0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]
+    tris = list()
+    for a, b, c, d in quads:
+        tris.append((a, b, c))
+        tris.append((a, c, d))
+    return co, numpy.array(tris, dtype=numpy.int64)
+
+
+def get_prism(cells, height=1.0):
+    # closed prism over unit grid cells (x, y), eg. non-convex shapes or shapes with holes
+    cells = set(cells)
+    vertices = dict()
+
+    def get_vertex(x, y, z):
+        if (x, y, z) not in vertices:
+            vertices[(x, y, z)] = len(vertices)
+        return vertices[(x, y, z)]
+
+    tris = list()
+    for x, y in cells:
+        bottom = [get_vertex(x, y, 0.0), get_vertex(x + 1, y, 0.0), get_vertex(x + 1, y + 1, 0.0), get_vertex(x, y + 1, 0.0)]
+        top = [get_vertex(x, y, height), get_vertex(x + 1, y, height), get_vertex(x + 1, y + 1, height), get_vertex(x, y + 1, height)]
+        tris += [(bottom[0], bottom[2], bottom[1]), (bottom[0], bottom[3], bottom[2])]
+        tris += [(top[0], top[1], top[2]), (top[0], top[2], top[3])]
+        # walls on the cell edges without a neighbour, counter clockwise around the cell seen from above
+        for (dx, dy), (x0, y0), (x1, y1) in [
+            ((0, -1), (x, y), (x + 1, y)),
+            ((1, 0), (x + 1, y), (x + 1, y + 1)),
+            ((0, 1), (x + 1, y + 1), (x, y + 1)),
+            ((-1, 0), (x, y + 1), (x, y))
+        ]:
+            if (x + dx, y + dy) in cells:
+                continue
+            a = get_vertex(x0, y0, 0.0)
+            b = get_vertex(x1, y1, 0.0)
+            c = get_vertex(x1, y1, height)
+            d = get_vertex(x0, y0, height)
+            tris += [(a, b, c), (a, c, d)]
+    co = numpy.array(list(vertices.keys()), dtype=numpy.float64)
+    return co, numpy.array(tris, dtype=numpy.int64)
+
+
+def get_volume(co, tris):
+    triangles = co[tris]
+    return numpy.einsum("ij,ij->i", triangles[:, 0], numpy.cross(triangles[:, 1], triangles[:, 2])).sum() / 6.0
+
+
+def is_closed(tris):
+    # every directed edge has exactly one opposite edge
+    edges = numpy.concatenate((tris[:, [0, 1]], tris[:, [1, 2]], tris[:, [2, 0]]))
+    directed = set(map(tuple, edges.tolist()))
+    return len(directed) == len(edges) and all((end, start) in directed for start, end in directed)
+
+
+def test_cube_is_closed():
+    co, tris = get_cube()
+    assert is_closed(tris)
+    assert numpy.isclose(get_volume(co, tris), 1.0)
+
+
+def test_clip_half_space_keeps_side_of_normal():
+    co, tris = get_cube()
+    co, tris = compact(*clip_half_space(co, tris, numpy.array((0.0, 0.25, 0.0)), numpy.array((0.0, 1.0, 0.0))))
+    assert is_closed(tris)
+    assert numpy.isclose(get_volume(co, tris), 0.25)
+    assert numpy.all(co[:, 1] >= 0.25 - 1e-9)
+
+
+def test_clip_oblique_plane_is_closed():
+    co, tris = get_cube()
+    normal = numpy.array((1.0, 1.0, 1.0)) / numpy.sqrt(3.0)
+    co, tris = compact(*clip_half_space(co, tris, numpy.zeros(3), normal))
+    assert is_closed(tris)
+    # the plane through the center splits the cube in halves
+    assert numpy.isclose(get_volume(co, tris), 0.5)
+
+
+def test_clip_mesh_intersects_half_spaces():
+    co, tris = get_cube()
+    planes = [
+        (numpy.array((0.0, -0.25, 0.0)), numpy.array((0.0, 1.0, 0.0))),
+        (numpy.array((0.0, 0.25, 0.0)), numpy.array((0.0, -1.0, 0.0)))
+    ]
+    co, tris = clip_mesh(co, tris, planes)
+    assert is_closed(tris)
+    assert numpy.isclose(get_volume(co, tris), 0.5)
+
+
+def test_clip_mesh_outside_is_empty():
+    co, tris = get_cube()
+    co, tris = clip_mesh(co, tris, [(numpy.array((0.0, 2.0, 0.0)), numpy.array((0.0, 1.0, 0.0)))])
+    assert len(tris) == 0
+    assert len(co) == 0
+
+
+def test_clip_mesh_inside_is_unchanged():
+    co, tris = get_cube()
+    co_clipped, tris_clipped = clip_mesh(co, tris, [(numpy.array((0.0, -2.0, 0.0)), numpy.array((0.0, 1.0, 0.0)))])
+    assert len(tris_clipped) == len(tris)
+    assert numpy.isclose(get_volume(co_clipped, tris_clipped), 1.0)
+
+
+def check_cap(co, tris, point, normal, area):
+    # the cap triangles face away from the kept side and do not overlap, their areas add up to the section area
+    triangles = co[tris]
+    distance = (triangles - point) @ normal
+    cap = numpy.all(numpy.abs(distance) < 1e-9, axis=1)
+    normals = numpy.cross(triangles[cap, 1] - triangles[cap, 0], triangles[cap, 2] - triangles[cap, 0]) / 2.0
+    assert numpy.all(normals @ normal <= 1e-12)
+    assert numpy.isclose(numpy.linalg.norm(normals, axis=1).sum(), area)
+
+
+def get_l_cells():
+    return [(0, 0), (1, 0), (2, 0), (0, 1), (0, 2)]
+
+
+def get_c_cells():
+    return [(x, y) for x in range(3) for y in range(3) if (x, y) not in [(1, 1), (2, 1)]]
+
+
+def get_tube_cells():
+    # a square tube, the section has a hole like the medullary cavity
+    return [(x, y) for x in range(4) for y in range(4) if (x, y) not in [(1, 1), (2, 1), (1, 2), (2, 2)]]
+
+
+def get_tilted_volume(cells, point, normal, height=1.0):
+    # volume of the prism above the plane, the plane stays within the prism over every cell
+    volume = 0.0
+    for x, y in cells:
+        center = numpy.array((x + 0.5, y + 0.5))
+        z = point[2] - ((center - point[:2]) @ normal[:2]) / normal[2]
+        volume += height - z
+    return volume
+
+
+def test_prisms_are_closed():
+    for cells in [get_l_cells(), get_c_cells(), get_tube_cells()]:
+        co, tris = get_prism(cells)
+        assert is_closed(tris)
+        assert numpy.isclose(get_volume(co, tris), len(cells))
+
+
+def test_clip_non_convex_section():
+    for cells in [get_l_cells(), get_c_cells()]:
+        co, tris = get_prism(cells)
+        point = numpy.array((0.0, 0.0, 0.4))
+        normal = numpy.array((0.0, 0.0, 1.0))
+        co, tris = clip_mesh(co, tris, [(point, normal)])
+        assert is_closed(tris)
+        assert numpy.isclose(get_volume(co, tris), 0.6 * len(cells))
+        check_cap(co, tris, point, normal, len(cells))
+
+
+def test_clip_section_with_hole():
+    cells = get_tube_cells()
+    co, tris = get_prism(cells)
+    point = numpy.array((0.0, 0.0, 0.4))
+    normal = numpy.array((0.0, 0.0, -1.0))
+    co, tris = clip_mesh(co, tris, [(point, normal)])
+    assert is_closed(tris)
+    assert numpy.isclose(get_volume(co, tris), 0.4 * len(cells))
+    check_cap(co, tris, point, normal, len(cells))
+
+
+def test_clip_tilted_sections():
+    point = numpy.array((1.5, 1.5, 0.5))
+    normal = numpy.array((0.05, 0.03, 1.0))
+    normal = normal / numpy.linalg.norm(normal)
+    for cells in [get_l_cells(), get_c_cells(), get_tube_cells()]:
+        co, tris = get_prism(cells)
+        co, tris = clip_mesh(co, tris, [(point, normal)])
+        assert is_closed(tris)
+        assert numpy.isclose(get_volume(co, tris), get_tilted_volume(cells, point, normal))
+        # the section is the cell area stretched by the tilt
+        check_cap(co, tris, point, normal, len(cells) / normal[2])
+
+
+def test_clip_nested_tubes():
+    # a tube inside the hole of another tube, two outer loops and two holes
+    cells = [(x, y) for x in range(7) for y in range(7) if x in [0, 6] or y in [0, 6]]
+    cells += [(x, y) for x in range(2, 5) for y in range(2, 5) if (x, y) != (3, 3)]
+    co, tris = get_prism(cells)
+    point = numpy.array((0.0, 0.0, 0.5))
+    normal = numpy.array((0.0, 0.0, 1.0))
+    co, tris = clip_mesh(co, tris, [(point, normal)])
+    assert is_closed(tris)
+    assert numpy.isclose(get_volume(co, tris), 0.5 * len(cells))
+    check_cap(co, tris, point, normal, len(cells))
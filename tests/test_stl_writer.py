@@ -0,0 +1,71 @@
+import numpy
+import os
+from FFFGen.stl_writer import STL_TRIANGLE, get_triangle_normals, transform_triangles, write_stl
+
+
+def get_triangles():
+    return numpy.array([
+        ((0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)),
+        ((0.0, 0.0, 1.0), (0.0, 2.0, 1.0), (2.0, 0.0, 1.0))
+    ])
+
+
+def read_stl(file_path):
+    with open(file_path, "rb") as file:
+        data = file.read()
+    count = numpy.frombuffer(data[80:84], dtype="<u4")[0]
+    return data[:80], count, numpy.frombuffer(data[84:], dtype=STL_TRIANGLE)
+
+
+def test_triangle_normals():
+    normals, lengths = get_triangle_normals(get_triangles())
+    assert numpy.allclose(normals, ((0.0, 0.0, 1.0), (0.0, 0.0, -1.0)))
+    assert numpy.allclose(lengths, (1.0, 4.0))
+
+
+def test_mirror_keeps_normals_outwards():
+    matrix = numpy.diag((-1.0, 1.0, 1.0, 1.0))
+    triangles = transform_triangles(get_triangles(), matrix)
+    normals, lengths = get_triangle_normals(triangles)
+    assert numpy.allclose(normals, ((0.0, 0.0, 1.0), (0.0, 0.0, -1.0)))
+
+
+def test_transform_translates_and_scales():
+    matrix = numpy.diag((2.0, 2.0, 2.0, 1.0))
+    matrix[:3, 3] = (1.0, 0.0, 0.0)
+    triangles = transform_triangles(get_triangles(), matrix)
+    assert numpy.allclose(triangles[0, 1], (3.0, 0.0, 0.0))
+
+
+def test_write_stl(tmp_path):
+    file_path = str(tmp_path / "guide.stl")
+    write_stl(file_path, get_triangles())
+    header, count, data = read_stl(file_path)
+    assert header.startswith(b"Binary STL")
+    assert count == 2
+    assert os.path.getsize(file_path) == 84 + 50 * 2
+    assert numpy.allclose(data["vertices"], get_triangles())
+    assert numpy.allclose(data["normal"][0], (0.0, 0.0, 1.0))
+    assert os.listdir(str(tmp_path)) == ["guide.stl"]
+
+
+def test_write_stl_drops_degenerate_triangles(tmp_path):
+    file_path = str(tmp_path / "guide.stl")
+    degenerate = numpy.array([((0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (2.0, 2.0, 2.0))])
+    write_stl(file_path, numpy.concatenate((get_triangles(), degenerate)))
+    header, count, data = read_stl(file_path)
+    assert count == 2
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path):
+    # the target can not be replaced by the written file
+    file_path = tmp_path / "guide.stl"
+    file_path.mkdir()
+    try:
+        write_stl(str(file_path), get_triangles())
+    except OSError:
+        pass
+    else:
+        raise AssertionError("a directory was replaced by the stl file")
+    assert os.listdir(str(tmp_path)) == ["guide.stl"]
+    assert file_path.is_dir()